@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2022-2026 The Project Contributors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# For a detailed list of copyright holders and contribution history,
+# please refer to the CONTRIBUTORS.md file in the project root.
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+from ansible.module_utils.common.text.converters import to_bytes
+
+
+class LocalCache(object):
+    """
+    Small key/value cache on the managed node, shared by subsequent tasks.
+
+    Every entry is a JSON document in its own file below cache_dir/namespace.
+    Entries older than ttl seconds are ignored (0 keeps them forever) and with
+    max_entries set, the oldest entries are removed when the limit is exceeded.
+    The cache is best effort: read and write errors are treated as a miss.
+    """
+
+    def __init__(self, cache_dir, namespace, ttl=0, max_entries=None):
+        self.location = os.path.join(os.path.expanduser(cache_dir), namespace)
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+    def _path(self, key):
+        return os.path.join(self.location, hashlib.sha256(to_bytes(key)).hexdigest() + ".json")
+
+    def get(self, key, default=None):
+        """Return the value stored for key, or default if it is missing or expired."""
+        path = self._path(key)
+        try:
+            if self.ttl and time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                return default
+            with open(path, "r") as cache_file:
+                return json.load(cache_file)
+        except (IOError, OSError, ValueError):
+            return default
+
+    def set(self, key, value):
+        """Store value for key, replacing the file atomically."""
+        tmp_path = None
+        try:
+            if not os.path.isdir(self.location):
+                os.makedirs(self.location, 0o700)
+            fd, tmp_path = tempfile.mkstemp(dir=self.location, suffix=".tmp")
+            with os.fdopen(fd, "w") as cache_file:
+                json.dump(value, cache_file)
+            os.rename(tmp_path, self._path(key))
+        except (IOError, OSError, TypeError, ValueError):
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+
+        if self.max_entries:
+            self._evict()
+        return True
+
+    def delete(self, key):
+        """Remove the entry of key."""
+        try:
+            os.remove(self._path(key))
+        except (IOError, OSError):
+            pass
+
+    def clear(self):
+        """Remove all entries."""
+        for path in self._entries():
+            try:
+                os.remove(path)
+            except (IOError, OSError):
+                pass
+
+    def _entries(self):
+        try:
+            names = os.listdir(self.location)
+        except (IOError, OSError):
+            return []
+        return [os.path.join(self.location, name) for name in names if name.endswith(".json")]
+
+    def _evict(self):
+        entries = []
+        for path in self._entries():
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except (IOError, OSError):
+                pass
+        entries.sort()
+        for dummy, path in entries[:max(0, len(entries) - self.max_entries)]:
+            try:
+                os.remove(path)
+            except (IOError, OSError):
+                pass
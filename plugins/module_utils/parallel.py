@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2022-2026 The Project Contributors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# For a detailed list of copyright holders and contribution history,
+# please refer to the CONTRIBUTORS.md file in the project root.
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import threading
+from collections import deque
+
+
+def parallel_map(function, items, max_workers):
+    """
+    Return [function(item) for item in items], computed by up to max_workers threads.
+
+    Like ThreadPoolExecutor.map, but based on threading only, so it also works on Python 2.7
+    without the futures backport. All items are processed, then the first exception raised,
+    in the order of items, is raised again. With one worker or item, the items are processed
+    in the calling thread.
+    """
+    items = list(items)
+    results = [None] * len(items)
+    errors = [None] * len(items)
+    # deque.popleft() is atomic, so the workers need no lock to take the next item
+    pending = deque(enumerate(items))
+
+    def worker():
+        while True:
+            try:
+                index, item = pending.popleft()
+            except IndexError:
+                return
+            try:
+                results[index] = function(item)
+            except Exception as err:
+                errors[index] = err
+
+    workers = min(max_workers, len(items))
+    if workers <= 1:
+        worker()
+    else:
+        threads = [threading.Thread(target=worker) for dummy in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    for err in errors:
+        if err is not None:
+            raise err
+    return results
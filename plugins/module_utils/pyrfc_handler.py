@@ -22,6 +22,7 @@ __metaclass__ = type
 
 from ansible.module_utils.basic import missing_required_lib
 
+import threading
 import traceback
 
 PYRFC_LIBRARY_IMPORT_ERROR = None
@@ -34,7 +35,90 @@ else:
     HAS_PYRFC_LIBRARY = True
 
 
-def get_connection(module, conn_params):
+# The connection parameters which identify the system, client and user of a logon.
+POOL_KEY_PARAMS = ('ashost', 'mshost', 'msserv', 'sysid', 'group', 'gwhost', 'gwserv', 'saprouter', 'sysnr', 'client', 'user')
+
+
+class ConnectionPool(object):
+    """
+    Logged on RFC connections, reused for the same system, client and user until the pool is closed.
+
+    A connection is taken with acquire() and given back with release(), so it can be used by one
+    caller (or thread) at a time. Connections which are no longer alive are closed and replaced by a
+    new logon. close() ends the logon of all connections, so no session is left to time out on the
+    application server.
+    The connections are opened with the factory given to acquire(), else the one of the pool,
+    else pyrfc.Connection, which is only looked up when the first connection is opened.
+    """
+
+    def __init__(self, factory=None):
+        self._factory = factory
+        self._idle = {}
+        self._open = []
+        self._lock = threading.Lock()
+        self.stats = dict(opened=0, reused=0, closed=0)
+
+    @staticmethod
+    def key(conn_params):
+        return tuple((name, str(conn_params.get(name) or '').upper()) for name in POOL_KEY_PARAMS)
+
+    def acquire(self, conn_params, factory=None):
+        """Return an idle connection of conn_params, or a new one opened with factory."""
+        key = self.key(conn_params)
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                conn = idle.pop()
+                if is_alive(conn):
+                    self.stats['reused'] += 1
+                    return conn
+                self._discard(conn)
+
+        factory = factory or self._factory or pyrfc.Connection
+        conn = factory(**conn_params)
+        with self._lock:
+            self._open.append((key, conn))
+            self.stats['opened'] += 1
+        return conn
+
+    def release(self, conn):
+        """Give conn back to the pool to be reused."""
+        with self._lock:
+            for key, open_conn in self._open:
+                if open_conn is conn:
+                    if is_alive(conn):
+                        self._idle.setdefault(key, []).append(conn)
+                    else:
+                        self._discard(conn)
+                    return
+
+    def close(self):
+        """Close all connections of the pool."""
+        with self._lock:
+            for dummy, conn in list(self._open):
+                self._discard(conn)
+            self._idle = {}
+
+    def _discard(self, conn):
+        self._open = [(key, open_conn) for key, open_conn in self._open if open_conn is not conn]
+        for idle in self._idle.values():
+            idle[:] = [idle_conn for idle_conn in idle if idle_conn is not conn]
+        try:
+            conn.close()
+        except Exception:
+            # The logon has ended already.
+            pass
+        self.stats['closed'] += 1
+
+
+def is_alive(conn):
+    try:
+        return bool(conn.alive)
+    except Exception:
+        return False
+
+
+def get_connection(module, conn_params, pool=None):
     if not HAS_PYRFC_LIBRARY:
         module.fail_json(msg=missing_required_lib(
             "pyrfc"), exception=PYRFC_LIBRARY_IMPORT_ERROR)
@@ -47,7 +131,10 @@ def get_connection(module, conn_params):
     else:
         module.warn("...direct to SAP System")
 
-    conn = pyrfc.Connection(**conn_params)
+    if pool is not None:
+        conn = pool.acquire(conn_params)
+    else:
+        conn = pyrfc.Connection(**conn_params)
 
     module.warn("Verifying connection is open/alive: %s" % conn.alive)
     return conn
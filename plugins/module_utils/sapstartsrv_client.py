@@ -21,50 +21,135 @@ from __future__ import (absolute_import, division, print_function)
 __metaclass__ = type
 
 import traceback
+import threading
 import socket
+import select
+import errno
+import time
 import os
+import re
 
 try:
-    from urllib.request import HTTPHandler
+    from urllib.parse import urlsplit
 except ImportError:
-    from ansible.module_utils.urls import (
-        UnixHTTPHandler as HTTPHandler,
-    )
+    from urlparse import urlsplit
 
 try:
-    from http.client import HTTPConnection
+    from http.client import HTTPConnection, HTTPException, RemoteDisconnected as NoResponseError
 except ImportError:
-    from httplib import HTTPConnection
+    from httplib import HTTPConnection, HTTPException, BadStatusLine as NoResponseError
+
+from io import BytesIO
 
 try:
     from suds.client import Client
-    from suds.sudsobject import asdict
-    from suds.transport.http import HttpAuthenticated, HttpTransport
+    from suds.transport import Reply, TransportError
+    from suds.transport.http import HttpAuthenticated
+    from suds.cache import ObjectCache
+    from suds import MethodNotFound, WebFault
     HAS_SUDS_LIBRARY = True
     SUDS_LIBRARY_IMPORT_ERROR = None
 
-    class LocalSocketHttpAuthenticated(HttpAuthenticated):
-        """Authenticated HTTP transport using Unix domain sockets."""
-        def __init__(self, socketpath, **kwargs):
+    class PooledHttpTransport(HttpAuthenticated):
+        """
+        Authenticated HTTP transport keeping its connections open between requests.
+
+        The WSDL, its imported schemas and all function calls of a client are sent over
+        persistent HTTP/1.1 connections, either TCP or the Unix domain socket socketpath.
+        Other URLs, like file:// for a local WSDL, are opened by the default transport.
+        """
+        def __init__(self, socketpath=None, **kwargs):
             HttpAuthenticated.__init__(self, **kwargs)
             self._socketpath = socketpath
+            self._connections = {}
+            self._lock = threading.Lock()
+
+        def open(self, request):
+            if not request.url.startswith("http://"):
+                return HttpAuthenticated.open(self, request)
+            self.addcredentials(request)
+            status, reason, headers, body = self._request("GET", request.url, None, request.headers, request.timeout)
+            if status != 200:
+                raise TransportError(reason, status, BytesIO(body))
+            return BytesIO(body)
+
+        def send(self, request):
+            self.addcredentials(request)
+            status, reason, headers, body = self._request("POST", request.url, request.message, request.headers,
+                                                          request.timeout)
+            if status in (202, 204):
+                return None
+            if status != 200:
+                raise TransportError(reason, status, BytesIO(body))
+            return Reply(status, headers, body)
+
+        def close(self):
+            """Close all connections kept open."""
+            with self._lock:
+                for idle in self._connections.values():
+                    for conn in idle:
+                        conn.close()
+                self._connections.clear()
+
+        def _request(self, method, url, body, headers, timeout):
+            parts = urlsplit(url)
+            path = parts.path + ("?" + parts.query if parts.query else "")
+            key = self._socketpath or parts.netloc
+            # The lock is only held to take and give back a connection, so the requests of several threads overlap.
+            with self._lock:
+                idle = self._connections.get(key)
+                conn = idle.pop() if idle else None
+
+            # A kept connection may have been closed by the server meanwhile, the request is then sent once more on a
+            # new connection. This is only done if the request could not be sent or no response arrived at all, so a
+            # function like StartSystem is never executed twice because its response was lost.
+            for reused in ([True, False] if conn is not None else [False]):
+                if not reused:
+                    conn = self._connect(parts, timeout or self.options.timeout)
+                try:
+                    conn.request(method, path, body, headers)
+                except (HTTPException, socket.error) as err:
+                    conn.close()
+                    if not reused or isinstance(err, socket.timeout):
+                        raise
+                    continue
+                try:
+                    response = conn.getresponse()
+                except (HTTPException, socket.error) as err:
+                    conn.close()
+                    if not reused or not isinstance(err, NoResponseError):
+                        raise
+                    continue
+                try:
+                    data = response.read()
+                except (HTTPException, socket.error):
+                    conn.close()
+                    raise
+                count_request(reused)
+                if response.will_close:
+                    conn.close()
+                else:
+                    with self._lock:
+                        self._connections.setdefault(key, []).append(conn)
+                return response.status, response.reason, dict(response.getheaders()), data
 
-        def u2handlers(self):
-            handlers = HttpTransport.u2handlers(self)
-            handlers.append(LocalSocketHandler(socketpath=self._socketpath))
-            return handlers
+        def _connect(self, parts, timeout):
+            count_connection()
+            if self._socketpath is not None:
+                return LocalSocketHttpConnection(parts.hostname, timeout=timeout, socketpath=self._socketpath)
+            return HTTPConnection(parts.hostname, parts.port or 80, timeout=timeout)
 
 except ImportError:
     HAS_SUDS_LIBRARY = False
     SUDS_LIBRARY_IMPORT_ERROR = traceback.format_exc()
 
     # Dummy class when suds is not available (keeps imports stable in tests)
-    class LocalSocketHttpAuthenticated(object):
-        def __init__(self, socketpath, **kwargs):
+    class PooledHttpTransport(object):
+        def __init__(self, socketpath=None, **kwargs):
             pass
 
-        def u2handlers(self):
-            return []
+        def close(self):
+            pass
 
 # Constant that defines accepted function prefixes, that are not doing changes.
 READ_ONLY_FUNCTION_PREFIXES = (
@@ -81,6 +166,27 @@ READ_ONLY_FUNCTION_PREFIXES = (
 FORCE_REQUIRED_PREFIXES = ("stop", "restart")
 FORCE_REQUIRED_EXACT = ("shutdown", "instancestop")
 
+# Defaults for the local cache of parsed WSDL definitions.
+DEFAULT_CACHE_DIR = "~/.cache/community.sap_libs"
+DEFAULT_CACHE_TTL = 86400
+
+# SOAP endpoints of the services, used when the WSDL is read from a local file.
+SERVICE_ENDPOINTS = {
+    "sapcontrol": "SAPControl.cgi",
+    "SAPHostControl/": "SAPHostControl.cgi",
+}
+
+# Seconds to wait for the TCP handshake when probing candidate ports.
+PROBE_TIMEOUT = 3
+
+# SOAP clients already created by this process, see shared_connection().
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+
+# HTTP connections opened and requests sent by this process, see connection_stats().
+_STATS = dict(connections=0, requests=0, reused=0)
+_STATS_LOCK = threading.Lock()
+
 
 class LocalSocketHttpConnection(HTTPConnection):
     """HTTP connection class that uses Unix domain sockets."""
@@ -92,17 +198,27 @@ class LocalSocketHttpConnection(HTTPConnection):
     def connect(self):
         """Connect to Unix domain socket."""
         self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not socket._GLOBAL_DEFAULT_TIMEOUT:
+            self.sock.settimeout(self.timeout)
         self.sock.connect(self.socketpath)
 
 
-class LocalSocketHandler(HTTPHandler):
-    """HTTP handler for Unix domain sockets."""
-    def __init__(self, debuglevel=0, socketpath=None):
-        self._debuglevel = debuglevel
-        self._socketpath = socketpath
+def count_connection():
+    with _STATS_LOCK:
+        _STATS['connections'] += 1
+
+
+def count_request(reused):
+    with _STATS_LOCK:
+        _STATS['requests'] += 1
+        if reused:
+            _STATS['reused'] += 1
+
 
-    def http_open(self, req):
-        return self.do_open(LocalSocketHttpConnection, req, socketpath=self._socketpath)
+def connection_stats():
+    """Return the number of HTTP connections opened, requests sent and requests sent over a reused connection."""
+    with _STATS_LOCK:
+        return dict(_STATS)
 
 
 def is_read_only_function(function_name):
@@ -124,29 +240,218 @@ def requires_force(function_name):
 def recursive_dict(suds_object):
     """Convert a suds object to a plain Python dict, recursively.
 
+    The object tree is walked with an explicit stack instead of recursion, and
+    the attributes are read directly from the suds objects instead of building
+    an intermediate dict per node with asdict(). This keeps large replies like
+    ReadLogFile or EnqGetLockTable cheap to convert and is not limited by the
+    recursion depth. Use iter_items() if the rows do not need to be kept.
+
     Example output: ``{'item': [{'name': 'hdbdaemon', 'value': '1'}]}``
     """
-    out = {}
     if isinstance(suds_object, str):
         return suds_object
-    for k, v in asdict(suds_object).items():
-        if hasattr(v, '__keylist__'):
-            out[k] = recursive_dict(v)
-        elif isinstance(v, list):
-            out[k] = []
-            for item in v:
-                if hasattr(item, '__keylist__'):
-                    out[k].append(recursive_dict(item))
-                else:
-                    out[k].append(item)
-        else:
-            out[k] = v
+    out = {}
+    stack = [(suds_object, out)]
+    while stack:
+        source, target = stack.pop()
+        values = source.__dict__
+        for k in source.__keylist__:
+            if k not in values:
+                continue
+            v = values[k]
+            if hasattr(v, '__keylist__'):
+                target[k] = {}
+                stack.append((v, target[k]))
+            elif isinstance(v, list):
+                converted = []
+                for item in v:
+                    if hasattr(item, '__keylist__'):
+                        converted.append({})
+                        stack.append((item, converted[-1]))
+                    else:
+                        converted.append(item)
+                target[k] = converted
+            else:
+                target[k] = v
     return out
 
 
-def connection(service_name, hostname, port, username, password, sysnr=None, is_socket=False):
+def iter_items(suds_object, key='item'):
+    """Yield the rows of a table reply (e.g. GetProcessList) one by one, converted to plain dicts.
+
+    Only the row currently processed is converted, which keeps the memory usage
+    flat for consumers that write or filter the rows instead of keeping them.
+    """
+    rows = getattr(suds_object, key, None)
+    if rows is None:
+        return
+    if not isinstance(rows, list):
+        rows = [rows]
+    for row in rows:
+        yield recursive_dict(row) if hasattr(row, '__keylist__') else row
+
+
+def row_value(row, field):
+    """Return the value of a field of a suds or plain dict row, None if it is missing."""
+    if isinstance(row, dict):
+        return row.get(field)
+    return getattr(row, field, None)
+
+
+def row_matches(row, filters):
+    """Check a row against a list of filters like ``{'field': 'dispstatus', 'op': 'ne', 'value': 'SAPControl-GREEN'}``."""
+    for row_filter in filters:
+        equal = str(row_value(row, row_filter['field'])) == str(row_filter['value'])
+        if equal != (row_filter.get('op', 'eq') == 'eq'):
+            return False
+    return True
+
+
+def select_items(suds_object, filters=None, fields=None, key='item'):
+    """
+    Convert a table reply, keeping only the rows matching all filters and only the given fields.
+
+    The filters are checked on the rows before they are converted, so rows and fields which
+    are not selected are never converted. Replies without rows are converted as a whole.
+
+    Example output: ``{'item': [{'name': 'disp+work', 'dispstatus': 'SAPControl-YELLOW'}]}``
+    """
+    if getattr(suds_object, key, None) is None:
+        return recursive_dict(suds_object)
+
+    rows = getattr(suds_object, key)
+    if not isinstance(rows, list):
+        rows = [rows]
+    selected = []
+    for row in rows:
+        if filters and not row_matches(row, filters):
+            continue
+        if fields:
+            values = [row_value(row, field) for field in fields]
+            row = dict((field, recursive_dict(value) if hasattr(value, '__keylist__') else value)
+                       for field, value in zip(fields, values))
+        elif hasattr(row, '__keylist__'):
+            row = recursive_dict(row)
+        selected.append(row)
+    return {key: selected}
+
+
+def probe_ports(hostname, ports, timeout=PROBE_TIMEOUT):
+    """
+    Start a TCP handshake to all candidate ports at the same time.
+
+    Return the port(s) whose handshake completed first, or an empty list if none
+    completed within timeout. Filtered ports therefore only cost the time the
+    fastest port needs to answer.
+    """
+    pending = {}
+    reachable = []
+    try:
+        for port in ports:
+            try:
+                family, socktype, proto, dummy, address = socket.getaddrinfo(hostname, int(port), 0, socket.SOCK_STREAM)[0]
+                sock = socket.socket(family, socktype, proto)
+            except (socket.error, OSError):
+                continue
+            sock.setblocking(False)
+            if sock.connect_ex(address) in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+                pending[sock] = port
+            else:
+                sock.close()
+
+        deadline = time.time() + timeout
+        while pending and not reachable:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            dummy, writable, dummy = select.select([], list(pending), [], remaining)
+            for sock in writable:
+                port = pending.pop(sock)
+                if sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0:
+                    reachable.append(port)
+                sock.close()
+    finally:
+        for sock in pending:
+            sock.close()
+
+    return [port for port in ports if port in reachable]
+
+
+def is_soap_fault(err):
+    """Return True if the error was raised by the service, which means the endpoint itself works."""
+    return HAS_SUDS_LIBRARY and isinstance(err, WebFault)
+
+
+def call_first_endpoint(call, hostname, ports, endpoint_cache=None, cache_key=None):
+    """
+    Execute call(port) on the first working port of the candidates and return (port, result).
+
+    The port remembered in endpoint_cache is tried first. Otherwise the candidates are
+    probed concurrently and the ones answering first are tried before the others.
+    The working port is stored in endpoint_cache for subsequent tasks.
+    """
+    cached_port = endpoint_cache.get(cache_key) if endpoint_cache is not None else None
+    remaining = list(ports)
+
+    last_error = None
+    if cached_port in remaining:
+        remaining.remove(cached_port)
+        try:
+            return cached_port, call(cached_port)
+        except Exception as err:
+            if is_soap_fault(err):
+                raise
+            last_error = err
+            endpoint_cache.delete(cache_key)
+
+    # The other candidates are only probed once the cached port failed
+    reachable = probe_ports(hostname, remaining) if len(remaining) > 1 else []
+    for port in reachable + [port for port in remaining if port not in reachable]:
+        try:
+            conn_result = call(port)
+        except Exception as err:
+            if is_soap_fault(err):
+                raise
+            last_error = err
+            continue
+
+        if endpoint_cache is not None:
+            endpoint_cache.set(cache_key, port)
+        return port, conn_result
+
+    raise last_error
+
+
+def wsdl_cache(cache_dir, hostname, port, service_name, ttl=DEFAULT_CACHE_TTL):
+    """Return a file-backed suds cache for the WSDL of one sapstartsrv endpoint.
+
+    suds stores the parsed definitions pickled and tagged with its own version,
+    so a hit skips both the WSDL download and the XML schema parse.
+    Entries are kept apart per hostname, port (or socket) and service name,
+    because the socket URL is identical for every instance on a host.
+    """
+    key = re.sub(r'[^A-Za-z0-9.-]+', '_', "{0}_{1}_{2}".format(hostname, port, service_name)).strip('_')
+    location = os.path.join(os.path.expanduser(cache_dir), "wsdl", key)
+    return ObjectCache(location=location, seconds=ttl)
+
+
+def has_function(client, function):
+    """Return True when the service definition of the client knows the function."""
+    try:
+        getattr(client.service, function)
+    except MethodNotFound:
+        return False
+    return True
+
+
+def connection(service_name, hostname, port, username, password, sysnr=None, is_socket=False,
+               cache_dir=None, cache_ttl=DEFAULT_CACHE_TTL, wsdl_path=None):
     """
     Return a SOAP client for the given service (sapcontrol or saphostctrl).
+
+    If cache_dir is set, the parsed WSDL is read from and stored in the local cache.
+    If wsdl_path is set, the service definition is read from that local file instead of
+    the sapstartsrv, which is then only contacted for the function call itself.
     """
     # Prepare connection details before attempting to connect.
     if is_socket:
@@ -158,22 +463,37 @@ def connection(service_name, hostname, port, username, password, sysnr=None, is_
             # saphostctrl: The socket name is fixed
             unix_socket = "/tmp/.sapstream1128"
 
-        connection_url = "http://localhost/{0}?wsdl".format(service_name)
+        service_url = "http://localhost/"
 
     else:
         # Use HTTP connection (original behavior)
-        connection_url = 'http://{0}:{1}/{2}?wsdl'.format(hostname, port, service_name)
+        service_url = 'http://{0}:{1}/'.format(hostname, port)
+
+    connection_url = "{0}{1}?wsdl".format(service_url, service_name)
+
+    client_options = {}
+    if cache_dir is not None:
+        cache_port = os.path.basename(unix_socket) if is_socket else port
+        client_options['cache'] = wsdl_cache(cache_dir, hostname, cache_port, service_name, cache_ttl)
+
+    if wsdl_path is not None:
+        # The endpoint written in a local WSDL belongs to the host it was fetched from.
+        connection_url = "file://{0}".format(os.path.abspath(wsdl_path))
+        client_options['location'] = service_url + SERVICE_ENDPOINTS[service_name]
 
     # Attempt to connect using the appropriate method
     try:
+        if wsdl_path is not None and not os.path.isfile(wsdl_path):
+            raise Exception("WSDL file not found: {0}".format(wsdl_path))
+
         if is_socket:
             if not os.path.exists(unix_socket):
                 raise Exception("SAP control Unix socket not found: {0}".format(unix_socket))
 
-            localsocket = LocalSocketHttpAuthenticated(unix_socket)
-            client = Client(connection_url, transport=localsocket)
+            transport = PooledHttpTransport(socketpath=unix_socket)
         else:
-            client = Client(connection_url, username=username, password=password, timeout=10)
+            transport = PooledHttpTransport(username=username, password=password, timeout=10)
+        client = Client(connection_url, transport=transport, **client_options)
 
         return client
 
@@ -181,15 +501,56 @@ def connection(service_name, hostname, port, username, password, sysnr=None, is_
         raise e
 
 
-def call_sap_control(hostname, port, username, password, function, parameters, sysnr=None, is_socket=False):
-    client = connection(
-        "sapcontrol", hostname, port, username, password, sysnr=sysnr, is_socket=is_socket)
+def shared_connection(service_name, hostname, port, username, password, function, **kwargs):
+    """
+    Return a SOAP client that is able to execute the given function.
+
+    Clients are kept for the lifetime of the process, so several functions executed
+    on the same sapstartsrv within one task share a single client and WSDL load.
+    """
+    key = (service_name, hostname, str(port), username, password, kwargs.get('sysnr'),
+           kwargs.get('is_socket'), kwargs.get('wsdl_path'))
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(key)
+    if client is not None and has_function(client, function):
+        return client
+
+    client = function_connection(service_name, hostname, port, username, password, function, **kwargs)
+    with _CLIENTS_LOCK:
+        _CLIENTS[key] = client
+    return client
+
+
+def function_connection(service_name, hostname, port, username, password, function, **kwargs):
+    """
+    Return a SOAP client that is able to execute the given function.
+
+    A cached or local definition which does not know the function was written by an
+    older sapstartsrv (e.g. before a kernel update). A stale cache is dropped and the
+    definition is fetched again from the sapstartsrv.
+    """
+    client = connection(service_name, hostname, port, username, password, **kwargs)
+    if kwargs.get('cache_dir') is None and kwargs.get('wsdl_path') is None:
+        return client
+
+    if has_function(client, function):
+        return client
+
+    if kwargs.get('wsdl_path') is None:
+        client.options.cache.clear()
+    kwargs['wsdl_path'] = None
+    return connection(service_name, hostname, port, username, password, **kwargs)
+
+
+def call_sap_control(hostname, port, username, password, function, parameters, sysnr=None, is_socket=False, **kwargs):
+    client = shared_connection(
+        "sapcontrol", hostname, port, username, password, function, sysnr=sysnr, is_socket=is_socket, **kwargs)
     return call_function(client, function, parameters)
 
 
-def call_sap_hostctrl(hostname, port, username, password, function, parameters, is_socket=False):
-    client = connection(
-        "SAPHostControl/", hostname, port, username, password, sysnr=None, is_socket=is_socket)
+def call_sap_hostctrl(hostname, port, username, password, function, parameters, is_socket=False, **kwargs):
+    client = shared_connection(
+        "SAPHostControl/", hostname, port, username, password, function, sysnr=None, is_socket=is_socket, **kwargs)
     return call_function(client, function, parameters)
 
 
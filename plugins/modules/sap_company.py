@@ -198,6 +198,7 @@ out:
 '''
 
 from ansible.module_utils.basic import AnsibleModule, missing_required_lib
+from ..module_utils.pyrfc_handler import ConnectionPool
 import traceback
 try:
     from pyrfc import Connection
@@ -208,6 +209,9 @@ else:
     ANOTHER_LIBRARY_IMPORT_ERROR = None
     HAS_PYRFC_LIBRARY = True
 
+# The RFC connections of the task, closed when the module ends.
+RFC_POOL = ConnectionPool()
+
 
 def call_rfc_method(connection, method_name, kwargs):
     # PyRFC call function
@@ -304,7 +308,7 @@ def run_module():
 
     # basic RFC connection with pyrfc
     try:
-        conn = Connection(user=conn_username, passwd=conn_password, ashost=host, sysnr=sysnr, client=client)
+        conn = RFC_POOL.acquire(dict(user=conn_username, passwd=conn_password, ashost=host, sysnr=sysnr, client=client), Connection)
     except Exception as err:
         result['error'] = str(err)
         result['msg'] = 'Something went wrong connecting to the SAP system.'
@@ -334,7 +338,10 @@ def run_module():
 
 
 def main():
-    run_module()
+    try:
+        run_module()
+    finally:
+        RFC_POOL.close()
 
 
 if __name__ == '__main__':
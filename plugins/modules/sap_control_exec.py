@@ -45,8 +45,43 @@ options:
         description:
             - The port number of the sapstartsrv.
             - If provided, the module will use always use http connection instead of local socket.
+            - If not provided and no local socket is used, the ports 5<sysnr>14 and 5<sysnr>13 are probed at the
+              same time and the one answering first is used.
         required: false
         type: int
+    targets:
+        description:
+            - A list of instances to execute the function(s) on concurrently, instead of a single I(sysnr) or I(port).
+            - The results are returned per instance in I(targets).
+            - I(username) and I(password) are used for all instances.
+        required: false
+        type: list
+        elements: dict
+        version_added: "1.8.0"
+        suboptions:
+            hostname:
+                description:
+                    - The hostname of the instance, defaults to I(hostname).
+                required: false
+                type: str
+            sysnr:
+                description:
+                    - The system number of the instance.
+                    - Either I(sysnr) or I(port) must be provided.
+                required: false
+                type: str
+            port:
+                description:
+                    - The port number of the sapstartsrv of the instance.
+                required: false
+                type: int
+    max_workers:
+        description:
+            - The maximum number of instances of I(targets) which are called at the same time.
+        required: false
+        default: 10
+        type: int
+        version_added: "1.8.0"
     username:
         description:
             - The username to connect to the sapstartsrv.
@@ -67,7 +102,8 @@ options:
     function:
         description:
         - The function to execute.
-        required: true
+        - Either I(function) or I(functions) must be provided.
+        required: false
         choices:
         - Start
         - Stop
@@ -141,17 +177,186 @@ options:
             - Specific functions require complex parameters to be defined. See example for InstanceStart.
         required: false
         type: raw
+    functions:
+        description:
+            - A list of functions to execute one after another over the same client, so the WSDL is loaded only once.
+            - The results are returned in I(results), keyed by I(name) or the function name.
+            - A failing function does not stop the execution of the following functions.
+            - Mutually exclusive with I(function) and I(parameter).
+        required: false
+        type: list
+        elements: dict
+        version_added: "1.8.0"
+        suboptions:
+            function:
+                description:
+                    - The function to execute, one of the choices of I(function).
+                required: true
+                type: str
+            parameter:
+                description:
+                    - The parameter to pass to the function.
+                required: false
+                type: raw
+            name:
+                description:
+                    - The key of the function in I(results).
+                    - Required if the same function is listed more than once.
+                required: false
+                type: str
+            filter:
+                description:
+                    - Only return the rows of the function matching all conditions, see I(filter).
+                required: false
+                type: list
+                elements: dict
+                suboptions:
+                    field:
+                        description: The field of the row to compare.
+                        required: true
+                        type: str
+                    value:
+                        description: The value to compare the field with.
+                        required: true
+                        type: raw
+                    op:
+                        description: Whether the field must be equal or not equal to I(value).
+                        required: false
+                        default: eq
+                        choices: [eq, ne]
+                        type: str
+            fields:
+                description:
+                    - Only return these fields of the rows of the function, see I(fields).
+                required: false
+                type: list
+                elements: str
+    filter:
+        description:
+            - Only return the rows of a table reply, for example of C(GetProcessList), C(ABAPGetWPTable),
+              C(EnqGetLockTable) or C(ICMGetConnectionList), matching all conditions.
+            - The rows are checked before they are converted, rows which do not match are never converted.
+            - Replies without rows are returned unchanged.
+        required: false
+        type: list
+        elements: dict
+        version_added: "1.8.0"
+        suboptions:
+            field:
+                description: The field of the row to compare.
+                required: true
+                type: str
+            value:
+                description: The value to compare the field with, compared as string.
+                required: true
+                type: raw
+            op:
+                description: Whether the field must be equal or not equal to I(value).
+                required: false
+                default: eq
+                choices: [eq, ne]
+                type: str
+    fields:
+        description:
+            - Only return these fields of the rows of a table reply.
+            - Missing fields are returned as C(null).
+        required: false
+        type: list
+        elements: str
+        version_added: "1.8.0"
+    wait:
+        description:
+            - Wait until the system reached the requested state after C(StartSystem), C(StopSystem) or C(RestartSystem).
+            - The state of all instances is polled with C(GetSystemInstanceList) over the same connection, the poll
+              interval grows while nothing changes and starts over when an instance changed its state.
+            - C(StartSystem) waits for all instances to be C(SAPControl-GREEN), C(StopSystem) for C(SAPControl-GRAY)
+              and C(RestartSystem) for every instance to leave C(SAPControl-GREEN) and to get back to it.
+        required: false
+        default: false
+        type: bool
+        version_added: "1.8.0"
+    wait_timeout:
+        description:
+            - The number of seconds to wait with I(wait) before the execution fails.
+        required: false
+        default: 600
+        type: int
+        version_added: "1.8.0"
     force:
         description:
             - Forces the execution of the function C(Stop).
         required: false
         default: false
         type: bool
+    cache:
+        description:
+            - Keep the parsed WSDL of the sapstartsrv in a local cache on the managed node and reuse it in
+              subsequent tasks instead of downloading and parsing it for every task.
+            - Cache entries are kept per hostname, port (or local socket) and service.
+            - A cached WSDL which does not contain I(function) is discarded and fetched again.
+            - If no I(port) is given, the port found to work is remembered per hostname as well,
+              so subsequent tasks do not need to probe the candidate ports again.
+        required: false
+        default: false
+        type: bool
+        version_added: "1.8.0"
+    cache_dir:
+        description:
+            - The directory of the local cache on the managed node.
+        required: false
+        default: ~/.cache/community.sap_libs
+        type: path
+        version_added: "1.8.0"
+    cache_ttl:
+        description:
+            - The number of seconds a cached WSDL or port is used before it is determined again.
+            - C(0) keeps cached entries until they are discarded.
+        required: false
+        default: 86400
+        type: int
+        version_added: "1.8.0"
+    wsdl_path:
+        description:
+            - Path to a local copy of the SAPControl WSDL on the managed node.
+            - The client is created from this file, so the WSDL is neither downloaded from nor parsed for the sapstartsrv.
+              Together with I(cache), also the parse of the local file is done only once.
+            - If I(function) is not part of the local WSDL, for example because a newer kernel added it,
+              the WSDL of the sapstartsrv is used instead.
+        required: false
+        type: path
+        version_added: "1.8.0"
+    tail:
+        description:
+            - Only read the end of the log file or trace with I(function) C(ReadLogFile) or C(ReadDeveloperTrace).
+            - The number of entries for C(ReadLogFile) and the number of bytes for C(ReadDeveloperTrace).
+            - Together with I(offset), it limits the amount of new data read.
+        required: false
+        type: int
+        version_added: "1.8.0"
+    offset:
+        description:
+            - Only read what was written after a previous execution with I(function) C(ReadLogFile) or C(ReadDeveloperTrace).
+            - Use the I(offset) returned by the previous execution.
+            - For C(ReadDeveloperTrace) the size of the trace is determined with C(ListDeveloperTraces) first.
+              If the trace was rotated in the meantime, it is read from the start.
+        required: false
+        type: str
+        version_added: "1.8.0"
+    dest:
+        description:
+            - Write the lines of I(function) C(ReadLogFile) or C(ReadDeveloperTrace) to this file instead of returning them in I(out).
+            - The file is on the host executing the module, use C(delegate_to) to store it on the controller.
+            - With I(offset) the lines are appended to the file, else the file is replaced.
+        required: false
+        type: path
+        version_added: "1.8.0"
 author:
     - Rainer Leber (@RainerLeber)
     - Robert Kraemer (@rkpobe)
 notes:
     - Does not support C(check_mode).
+    - The I(offset) of C(ReadDeveloperTrace) is the size of the trace when it was read, lines written while
+      the trace is read can be returned again by the next execution.
 '''
 
 EXAMPLES = r"""
@@ -189,6 +394,95 @@ EXAMPLES = r"""
   become: true
   become_user: "{{ sap_sid | lower }}adm"
 
+- name: GetProcessList reusing the cached WSDL of previous tasks
+  community.sap_libs.sap_control_exec:
+    hostname: 192.168.8.15
+    sysnr: "01"
+    function: GetProcessList
+    cache: true
+
+- name: Store the SAPControl WSDL once on the managed node
+  ansible.builtin.get_url:
+    url: "http://localhost:50013/?wsdl"
+    dest: /var/tmp/sapcontrol.wsdl
+    mode: "0644"
+
+- name: GetVersionInfo using local Unix socket without fetching the WSDL
+  community.sap_libs.sap_control_exec:
+    sysnr: "00"
+    function: GetVersionInfo
+    wsdl_path: /var/tmp/sapcontrol.wsdl
+    cache: true
+  become: true
+
+- name: Health check with several functions over one connection
+  community.sap_libs.sap_control_exec:
+    sysnr: "00"
+    functions:
+      - function: GetProcessList
+      - function: GetInstanceProperties
+      - function: GetAlertTree
+      - function: GetVersionInfo
+      - function: ParameterValue
+        parameter: rdisp/wp_no_dia
+        name: dialog_workprocesses
+  become: true
+
+- name: Name and status of the processes which are not running fine
+  community.sap_libs.sap_control_exec:
+    sysnr: "00"
+    function: GetProcessList
+    filter:
+      - field: dispstatus
+        op: ne
+        value: SAPControl-GREEN
+    fields:
+      - name
+      - dispstatus
+  become: true
+
+- name: Start the system and wait until all instances are running
+  community.sap_libs.sap_control_exec:
+    sysnr: "01"
+    function: StartSystem
+    wait: true
+    wait_timeout: 1200
+  become: true
+
+- name: Process list of all instances of a system in one task
+  community.sap_libs.sap_control_exec:
+    username: s4hadm
+    password: test1234
+    function: GetProcessList
+    targets:
+      - hostname: s4hana-ascs
+        sysnr: "01"
+      - hostname: s4hana-app1
+        sysnr: "00"
+      - hostname: s4hana-app2
+        sysnr: "00"
+    max_workers: 20
+
+- name: Collect the new entries of a log file since the last run
+  community.sap_libs.sap_control_exec:
+    sysnr: "00"
+    function: ReadLogFile
+    parameter:
+      filename: work/available.log
+    offset: "{{ last_run.offset | default(omit) }}"
+    dest: /var/tmp/available.log
+  become: true
+  register: last_run
+
+- name: Read the last 64 KiB of the developer trace of work process 0
+  community.sap_libs.sap_control_exec:
+    sysnr: "00"
+    function: ReadDeveloperTrace
+    parameter: dev_w0
+    tail: 65536
+    dest: /var/tmp/dev_w0
+  become: true
+
 - name: InstanceStart with complex parameter
   community.sap_libs.sap_control_exec:
     sysnr: "00"
@@ -241,15 +535,98 @@ out:
                 }
                 ]
             }]
+connection_stats:
+    description:
+        - The HTTP connections to the sapstartsrv of this task, C(connections) opened, C(requests) sent
+          and C(reused) requests sent over a connection kept open by a previous request.
+    type: dict
+    returned: when the function was executed
+    sample: {"connections": 1, "requests": 4, "reused": 3}
+targets:
+    description:
+        - The outcome per instance when I(targets) is used, in the order of I(targets).
+        - Every entry contains the C(hostname), C(sysnr) and C(port) of the instance, the connection details and
+          C(changed), C(msg), C(out) (or C(results) with I(functions)), C(error) and the execution time C(elapsed) in seconds.
+    type: list
+    elements: dict
+    returned: when I(targets) is used
+    sample: [{
+            "hostname": "s4hana-app1",
+            "sysnr": "00",
+            "port": null,
+            "connection_type": "soap",
+            "connection_url": "http://s4hana-app1:50013/sapcontrol?wsdl",
+            "changed": false,
+            "msg": "Successful execution of function: GetProcessList",
+            "out": [{"item": [{"name": "disp+work", "dispstatus": "SAPControl-GREEN"}]}],
+            "error": "",
+            "elapsed": 0.231
+        }]
+instances:
+    description:
+        - The state of every instance of the system after waiting with I(wait).
+        - C(elapsed) is the number of seconds after which the instance reached the requested state, C(null) if it did not.
+    type: list
+    elements: dict
+    returned: when I(wait) is used
+    sample: [{
+            "hostname": "s4hana-ascs",
+            "instance_nr": 1,
+            "dispstatus": "SAPControl-GREEN",
+            "elapsed": 21.3
+        }]
+offset:
+    description:
+        - The position to continue reading from in the next execution, pass it as I(offset).
+        - The C(endcookie) of C(ReadLogFile) or the size of the trace in bytes for C(ReadDeveloperTrace).
+    type: str
+    returned: when I(tail), I(offset) or I(dest) is used
+    sample: "20240124022354"
+dest:
+    description: The file the lines were written to.
+    type: str
+    returned: when I(dest) is used
+    sample: /var/tmp/dev_w0
+line_count:
+    description: The number of lines read.
+    type: int
+    returned: when I(tail), I(offset) or I(dest) is used
+    sample: 120
+results:
+    description:
+        - The outcome of every function executed with I(functions), keyed by I(name) or the function name.
+        - Every entry contains C(changed), C(msg), C(out), C(error) and the execution time C(elapsed) in seconds.
+    type: dict
+    returned: when I(functions) is used
+    sample: {
+            "GetVersionInfo": {
+                "changed": false,
+                "msg": "Successful execution of function: GetVersionInfo",
+                "out": {"item": [{"Filename": "sapstartsrv", "Time": "2024 01 24 02:23:54", "VersionInfo": "793, patch 200"}]},
+                "error": "",
+                "elapsed": 0.012
+            }
+        }
 '''
 
+import time
+
 from ansible.module_utils.basic import AnsibleModule, missing_required_lib
 
+from ..module_utils.local_cache import LocalCache
+from ..module_utils.parallel import parallel_map
 from ..module_utils.sapstartsrv_client import (
     HAS_SUDS_LIBRARY,
     SUDS_LIBRARY_IMPORT_ERROR,
+    DEFAULT_CACHE_DIR,
+    DEFAULT_CACHE_TTL,
+    call_first_endpoint,
+    connection_stats,
     call_sap_control as connection,
+    is_soap_fault,
+    iter_items,
     recursive_dict,
+    select_items,
     is_read_only_function,
     requires_force,
 )
@@ -271,21 +648,334 @@ def choices():
     return retlist
 
 
+LOG_FUNCTIONS = ("ReadLogFile", "ReadDeveloperTrace")
+SYSTEM_STATES = {"StartSystem": "SAPControl-GREEN", "StopSystem": "SAPControl-GRAY", "RestartSystem": "SAPControl-GREEN"}
+POLL_INTERVAL = 1
+POLL_MAX_INTERVAL = 15
+
+
+def system_parameter(function, parameter):
+    """Return the parameter for the function, *System functions can only be triggered asynchronously."""
+    if function == "StartSystem":
+        return dict(waittimeout=0)
+    if function == "StopSystem" or function == "RestartSystem":
+        return dict(waittimeout=0, softtimeout=0)
+    return parameter
+
+
+def call_instance(result, target, function, parameter, client_options):
+    """
+    Execute a function on the sapstartsrv of the target instance and return the raw output.
+
+    The connection details are added to result. If the port of the target has to be
+    determined, it is stored in the target so following calls use the same endpoint.
+    """
+    hostname = target['hostname']
+    port = target['port']
+    sysnr = target['sysnr']
+    username = target['username']
+    password = target['password']
+
+    # Determine if we should use local Unix socket connection
+    # Use local socket connection if hostname is localhost and no username/password provided
+    # True: Socket connection, False: SOAP connection
+    is_socket = (hostname == "localhost" and
+                 username is None and
+                 password is None and
+                 sysnr is not None)
+
+    if port is not None:
+        result['connection_type'] = 'soap'
+        result['connection_url'] = 'http://{0}:{1}/sapcontrol?wsdl'.format(hostname, port)
+        return connection(hostname, port, username, password, function, parameter, sysnr, is_socket=False, **client_options)
+
+    if is_socket:
+        result['connection_type'] = 'socket'
+        result['connection_url'] = "http://localhost/sapcontrol?wsdl"
+        return connection(hostname, None, username, password, function, parameter, sysnr=sysnr, is_socket=True, **client_options)
+
+    result['connection_type'] = 'soap'
+
+    def call_port(port):
+        result['connection_url'] = 'http://{0}:{1}/sapcontrol?wsdl'.format(hostname, port)
+        return connection(hostname, port, username, password, function, parameter, sysnr, **client_options)
+
+    # Try HTTPS and HTTP ports, the one answering first (or the one that worked last time) is used first
+    endpoint_cache = None
+    if client_options['cache_dir'] is not None:
+        endpoint_cache = LocalCache(client_options['cache_dir'], "endpoints", client_options['cache_ttl'])
+    ports = ["5{0}14".format(str(sysnr).zfill(2)), "5{0}13".format(str(sysnr).zfill(2))]
+    cache_key = "sapcontrol|{0}|{1}".format(hostname, sysnr)
+    target['port'], conn_result = call_first_endpoint(call_port, hostname, ports, endpoint_cache, cache_key)
+    return conn_result
+
+
+def trace_size(result, target, filename, client_options):
+    """Return the current size in bytes of the developer trace, or None if it does not exist."""
+    for trace in iter_items(call_instance(result, target, "ListDeveloperTraces", None, client_options)):
+        if trace.get('filename') == filename:
+            return int(trace['size'])
+    return None
+
+
+def read_log(result, target, function, parameter, window, client_options):
+    """
+    Read a window of a log file or developer trace and report the offset to continue from.
+
+    For ReadLogFile the window is passed as maxentries and statecookie, for ReadDeveloperTrace as the
+    number of bytes from the end of the trace. The lines are written to window['dest'] one by one
+    instead of being returned in out, if set.
+    """
+    tail = window['tail']
+    offset = window['offset']
+    parameter = dict(parameter) if isinstance(parameter, dict) else dict(filename=parameter)
+
+    if function == "ReadLogFile":
+        if tail is not None:
+            parameter['maxentries'] = tail
+        if offset is not None:
+            parameter['statecookie'] = offset
+    else:
+        size = trace_size(result, target, parameter.get('filename'), client_options)
+        read = -1 if tail is None else tail
+        if size is not None and offset is not None and int(offset) <= size:
+            read = size - int(offset) if tail is None else min(size - int(offset), tail)
+        parameter['size'] = read
+        result['offset'] = str(size if size is not None else 0)
+
+    conn_result = None
+    if parameter.get('size') != 0:
+        conn_result = call_instance(result, target, function, parameter, client_options)
+
+    if function == "ReadLogFile":
+        result['offset'] = getattr(conn_result, 'endcookie', None) or offset
+        lines = iter_items(getattr(conn_result, 'fields', None))
+    else:
+        lines = iter_items(getattr(conn_result, 'lines', None))
+
+    result['line_count'] = 0
+    if window['dest'] is None:
+        result['out'] = [recursive_dict(conn_result) if conn_result is not None else conn_result]
+        result['line_count'] = sum(1 for dummy in lines)
+    else:
+        with open(window['dest'], 'a' if offset is not None else 'w') as dest:
+            for line in lines:
+                dest.write(line + "\n")
+                result['line_count'] += 1
+        result['dest'] = window['dest']
+        result['changed'] = result['line_count'] > 0
+    result['msg'] = "Successful execution of function: " + function
+    return result
+
+
+def wait_for_system(result, target, function, timeout, client_options):
+    """
+    Poll GetSystemInstanceList until every instance reached the state requested by function.
+
+    The poll interval grows by half while no instance changes and is reset when one does.
+    Errors other than SOAP faults are expected while instances restart and count as a poll
+    without changes; the last one is raised if it still occurs when the timeout is reached.
+    The instances with their state and the seconds it took to reach it are added to result.
+    Return True if all instances reached the state before the timeout.
+    """
+    state = SYSTEM_STATES[function]
+    started = time.time()
+    deadline = started + timeout
+    interval = POLL_INTERVAL
+    # RestartSystem has to see an instance leave the state before it counts
+    left = set() if function == "RestartSystem" else None
+    instances = {}
+    previous = None
+
+    while True:
+        try:
+            reply = call_instance(result, target, "GetSystemInstanceList", None, client_options)
+        except Exception as err:
+            if is_soap_fault(err) or time.time() >= deadline:
+                raise
+            interval = min(interval * 1.5, POLL_MAX_INTERVAL)
+            time.sleep(max(0, min(interval, deadline - time.time())))
+            continue
+
+        current = {}
+        for row in select_items(reply, fields=['hostname', 'instanceNr', 'dispstatus'])['item']:
+            key = "{0}:{1}".format(row['hostname'], row['instanceNr'])
+            current[key] = row['dispstatus']
+            instance = instances.setdefault(key, dict(hostname=row['hostname'], instance_nr=row['instanceNr'],
+                                                      dispstatus=None, elapsed=None))
+            instance['dispstatus'] = row['dispstatus']
+            if left is not None and row['dispstatus'] != state:
+                left.add(key)
+            if row['dispstatus'] == state and (left is None or key in left):
+                if instance['elapsed'] is None:
+                    instance['elapsed'] = round(time.time() - started, 3)
+            else:
+                instance['elapsed'] = None
+
+        result['instances'] = list(instances.values())
+        if instances and all(instance['elapsed'] is not None for instance in instances.values()):
+            return True
+        if time.time() >= deadline:
+            return False
+
+        interval = POLL_INTERVAL if current != previous else min(interval * 1.5, POLL_MAX_INTERVAL)
+        previous = current
+        time.sleep(max(0, min(interval, deadline - time.time())))
+
+
+def run_function(result, target, function, parameter, client_options, entry=None):
+    """
+    Execute a function and return a dict with changed, msg and the converted output.
+
+    The entry can hold a filter and fields to convert only the matching rows and the given fields,
+    and a wait timeout for the *System functions.
+    """
+    try:
+        conn_result = call_instance(result, target, function, parameter, client_options)
+    except Exception as err:
+        if "already started" not in str(err).lower():
+            raise
+        # Ensure we return same content as Start and Stop functions for consistency
+        already_started_msg = "Function {0} returned that Instance is already started.".format(function)
+        return dict(changed=False, msg=already_started_msg, out=None)
+
+    # Ensure that we run recursive_dict only on results and leave it for idempotent functions.
+    if conn_result is None:
+        returned_data = None
+    elif entry and (entry['filter'] or entry['fields']):
+        returned_data = select_items(conn_result, entry['filter'], entry['fields'])
+    else:
+        returned_data = recursive_dict(conn_result)
+    if entry and entry.get('wait') is not None and function in SYSTEM_STATES:
+        if not wait_for_system(result, target, function, entry['wait'], client_options):
+            raise Exception("Timeout after {0} seconds waiting for all instances to be {1}".format(
+                entry['wait'], SYSTEM_STATES[function]))
+
+    return dict(changed=not is_read_only_function(function),
+                msg="Successful execution of function: " + function,
+                out=returned_data)
+
+
+def run_functions(result, target, functions, client_options):
+    """
+    Execute several functions one after another over the same client.
+
+    Return a dict with one entry per function, a failed function does not stop the others.
+    """
+    results = {}
+    for entry in functions:
+        started = time.time()
+        try:
+            executed = run_function(result, target, entry['function'],
+                                    system_parameter(entry['function'], entry['parameter']), client_options, entry)
+            executed['error'] = ''
+        except Exception as err:
+            executed = dict(changed=False, msg='Function execution has failed. See error for more details.',
+                            out=None, error=str(err))
+        executed['elapsed'] = round(time.time() - started, 3)
+        results[entry['name'] or entry['function']] = executed
+    return results
+
+
+def run_target(result, target, functions, single, client_options):
+    """
+    Execute the functions on one target instance and add the outcome to result.
+
+    With single set, the only function is reported in out like before, else every function is reported in results.
+    """
+    if single:
+        entry = functions[0]
+        try:
+            executed = run_function(result, target, entry['function'],
+                                    system_parameter(entry['function'], entry['parameter']), client_options, entry)
+        except Exception as err:
+            result['error'] = str(err)
+            result['msg'] = 'Function execution has failed. See error for more details.'
+            return result
+
+        result['changed'] = executed['changed']
+        result['msg'] = executed['msg']
+        result['out'] = [executed['out']]
+        return result
+
+    result['results'] = run_functions(result, target, functions, client_options)
+    result['changed'] = any(executed['changed'] for executed in result['results'].values())
+
+    failed = [name for name, executed in result['results'].items() if executed['error']]
+    if failed:
+        result['error'] = "Execution of {0} has failed.".format(", ".join(failed))
+        result['msg'] = 'Function execution has failed. See results for more details.'
+    else:
+        result['msg'] = "Successful execution of functions: " + ", ".join(result['results'])
+    return result
+
+
+def run_targets(targets, functions, single, max_workers, client_options):
+    """Execute the functions on all target instances concurrently and return one result per target."""
+
+    def run(target):
+        target_result = dict(hostname=target['hostname'], sysnr=target['sysnr'], port=target['port'],
+                             changed=False, msg='', out=[], error='')
+        started = time.time()
+        run_target(target_result, target, functions, single, client_options)
+        target_result['elapsed'] = round(time.time() - started, 3)
+        return target_result
+
+    return parallel_map(run, targets, max_workers)
+
+
 def main():
+    filter_spec = dict(
+        field=dict(type='str', required=True),
+        value=dict(type='raw', required=True),
+        op=dict(type='str', default='eq', choices=['eq', 'ne']),
+    )
+
+    function_spec = dict(
+        function=dict(type='str', required=True),
+        parameter=dict(type='raw', required=False),
+        name=dict(type='str', required=False),
+        filter=dict(type='list', elements='dict', options=filter_spec),
+        fields=dict(type='list', elements='str'),
+    )
+
+    target_spec = dict(
+        hostname=dict(type='str', required=False),
+        sysnr=dict(type='str', required=False),
+        port=dict(type='int', required=False),
+    )
+
     module = AnsibleModule(
         argument_spec=dict(
             sysnr=dict(type='str', required=False),
             port=dict(type='int', required=False),
+            targets=dict(type='list', elements='dict', options=target_spec),
+            max_workers=dict(type='int', default=10),
             username=dict(type='str', required=False),
             password=dict(type='str', no_log=True, required=False),
             hostname=dict(type='str', default="localhost"),
-            function=dict(type='str', required=True, choices=choices()),
+            function=dict(type='str', required=False, choices=choices()),
+            functions=dict(type='list', elements='dict', options=function_spec),
             parameter=dict(type='raw', required=False),  # raw will allow dict or string.
+            filter=dict(type='list', elements='dict', options=filter_spec),
+            fields=dict(type='list', elements='str'),
+            wait=dict(type='bool', default=False),
+            wait_timeout=dict(type='int', default=600),
             force=dict(type='bool', default=False),
+            cache=dict(type='bool', default=False),
+            cache_dir=dict(type='path', default=DEFAULT_CACHE_DIR),
+            cache_ttl=dict(type='int', default=DEFAULT_CACHE_TTL),
+            wsdl_path=dict(type='path', required=False),
+            tail=dict(type='int', required=False),
+            offset=dict(type='str', required=False),
+            dest=dict(type='path', required=False),
         ),
         # Remove strict requirements to allow local mode
-        required_one_of=[('sysnr', 'port')],
-        mutually_exclusive=[('sysnr', 'port')],
+        required_one_of=[('sysnr', 'port', 'targets'), ('function', 'functions')],
+        mutually_exclusive=[('sysnr', 'port'), ('sysnr', 'targets'), ('port', 'targets'),
+                            ('function', 'functions'), ('parameter', 'functions'),
+                            ('filter', 'functions'), ('fields', 'functions'), ('wait', 'functions'),
+                            ('targets', 'tail'), ('targets', 'offset'), ('targets', 'dest')],
         supports_check_mode=False,
     )
     result = dict(changed=False, msg='', out=[], error='')  # Default out to list for consistent return type.
@@ -293,12 +983,15 @@ def main():
 
     sysnr = params['sysnr']
     port = params['port']
-    username = params['username']
-    password = params['password']
-    hostname = params['hostname']
+    targets = params['targets']
     function = params['function']
-    parameter = params['parameter']
+    functions = params['functions']
     force = params['force']
+    client_options = dict(
+        cache_dir=params['cache_dir'] if params['cache'] else None,
+        cache_ttl=params['cache_ttl'],
+        wsdl_path=params['wsdl_path'],
+    )
 
     if not HAS_SUDS_LIBRARY:
         module.fail_json(
@@ -306,80 +999,82 @@ def main():
             exception=SUDS_LIBRARY_IMPORT_ERROR)
 
     # Validate arguments
-    if sysnr is None and port is None:
-        module.fail_json(msg="Either 'sysnr' or 'port' must be provided")
+    if targets is None:
+        if sysnr is None and port is None:
+            module.fail_json(msg="Either 'sysnr' or 'port' must be provided")
 
-    if sysnr is not None and port is not None:
-        module.fail_json(msg="'sysnr' and 'port' are mutually exclusive")
+        if sysnr is not None and port is not None:
+            module.fail_json(msg="'sysnr' and 'port' are mutually exclusive")
 
-    if requires_force(function) and force is False:
-        module.fail_json(msg="Function '{0}' requires force: True".format(function))
+        targets = [dict(hostname=params['hostname'], sysnr=sysnr, port=port)]
 
-    if function == "StartSystem":
-        parameter = dict(waittimeout=0)
-    elif function == "StopSystem" or function == "RestartSystem":
-        parameter = dict(waittimeout=0, softtimeout=0)
+    for target in targets:
+        if (target['sysnr'] is None) == (target['port'] is None):
+            module.fail_json(msg="Every target requires either 'sysnr' or 'port'")
+        if target['hostname'] is None:
+            target['hostname'] = params['hostname']
+        target['username'] = params['username']
+        target['password'] = params['password']
 
-    # Determine if we should use local Unix socket connection
-    # Use local socket connection if hostname is localhost and no username/password provided
-    # True: Socket connection, False: SOAP connection
-    is_socket = (hostname == "localhost" and
-                 username is None and
-                 password is None and
-                 sysnr is not None)
+    if params['max_workers'] < 1:
+        module.fail_json(msg="'max_workers' must be greater than 0")
 
-    if port is None:
-        try:
-            if is_socket:
-                result['connection_type'] = 'socket'
-                result['connection_url'] = "http://localhost/sapcontrol?wsdl"
+    if functions is None:
+        functions = [dict(function=function, parameter=params['parameter'], name=None,
+                          filter=params['filter'], fields=params['fields'],
+                          wait=params['wait_timeout'] if params['wait'] else None)]
 
-                result_conn = connection(hostname, None, username, password, function, parameter, sysnr=sysnr, is_socket=True)
-            else:
-                result['connection_type'] = 'soap'
-
-                # Try HTTPS and HTTP ports
-                try:
-                    result['connection_url'] = 'http://{0}:5{1}14/sapcontrol?wsdl'.format(hostname, str(sysnr).zfill(2))
-                    result_conn = connection(hostname, "5{0}14".format((sysnr).zfill(2)), username, password, function, parameter, sysnr)
-                except Exception:
-                    result['connection_url'] = 'http://{0}:5{1}13/sapcontrol?wsdl'.format(hostname, str(sysnr).zfill(2))
-                    result_conn = connection(hostname, "5{0}13".format((sysnr).zfill(2)), username, password, function, parameter, sysnr)
-        except Exception as err:
-            if "already started" in str(err).lower():
-                already_started_msg = "Function {0} returned that Instance is already started.".format(function)
-                result_conn = ({"status": "already_started", "msg": already_started_msg})
-            else:
-                result['error'] = str(err)
-    else:
-        result['connection_type'] = 'soap'
-        result['connection_url'] = 'http://{0}:{1}/sapcontrol?wsdl'.format(hostname, port)
+    names = set()
+    for entry in functions:
+        if entry['function'] not in choices():
+            module.fail_json(msg="Function '{0}' is not supported".format(entry['function']))
+        if requires_force(entry['function']) and force is False:
+            module.fail_json(msg="Function '{0}' requires force: True".format(entry['function']))
+        name = entry['name'] or entry['function']
+        if name in names:
+            module.fail_json(msg="Function '{0}' is listed more than once, use 'name' to tell the calls apart".format(name))
+        names.add(name)
+
+    if params['wait'] and function not in SYSTEM_STATES:
+        module.fail_json(msg="'wait' requires function StartSystem, StopSystem or RestartSystem")
+
+    window = dict(tail=params['tail'], offset=params['offset'], dest=params['dest'])
+    if any(value is not None for value in window.values()):
+        if function not in LOG_FUNCTIONS:
+            module.fail_json(msg="'tail', 'offset' and 'dest' require function ReadLogFile or ReadDeveloperTrace")
+        if function == "ReadDeveloperTrace" and window['offset'] is not None and not window['offset'].isdigit():
+            module.fail_json(msg="'offset' of ReadDeveloperTrace must be a number of bytes")
+        if params['parameter'] is None:
+            module.fail_json(msg="Function '{0}' requires the file name as parameter".format(function))
         try:
-            result_conn = connection(hostname, port, username, password, function, parameter, sysnr, is_socket=False)
+            read_log(result, targets[0], function, params['parameter'], window, client_options)
         except Exception as err:
-            if "already started" in str(err).lower():
-                already_started_msg = "Function {0} returned that Instance is already started.".format(function)
-                result_conn = ({"status": "already_started", "msg": already_started_msg})
-            else:
-                result['error'] = str(err)
+            result['error'] = str(err)
+            result['msg'] = 'Function execution has failed. See error for more details.'
+            result['connection_stats'] = connection_stats()
+            module.fail_json(**result)
+        result['connection_stats'] = connection_stats()
+        module.exit_json(**result)
 
-    if result['error'] != '':
-        result['msg'] = 'Function execution has failed. See error for more details.'
-        module.fail_json(**result)
+    if params['targets'] is None:
+        run_target(result, targets[0], functions, function is not None, client_options)
+        result['connection_stats'] = connection_stats()
+        if result['error'] != '':
+            module.fail_json(**result)
+        module.exit_json(**result)
 
-    conn_result = result_conn
+    result['targets'] = run_targets(targets, functions, function is not None, params['max_workers'], client_options)
+    result['changed'] = any(target_result['changed'] for target_result in result['targets'])
+    result['connection_stats'] = connection_stats()
 
-    # Ensure that we run recursive_dict only on dict and leave it for idempotent functions.
-    if isinstance(conn_result, dict) and conn_result.get('status') == 'already_started':
-        result['changed'] = False
-        result['msg'] = conn_result.get('msg')
-        result['out'] = [None]  # Ensure we return same content as Start and Stop functions for consistency
-    else:
-        result['changed'] = not is_read_only_function(function)
-        result['msg'] = "Successful execution of function: " + function
-        returned_data = recursive_dict(conn_result) if conn_result is not None else conn_result
-        result['out'] = [returned_data]
+    failed = ["{0}:{1}".format(target_result['hostname'], target_result['sysnr'] or target_result['port'])
+              for target_result in result['targets'] if target_result['error']]
+    if failed:
+        result['error'] = "Execution has failed on {0}.".format(", ".join(failed))
+        result['msg'] = 'Function execution has failed. See targets for more details.'
+        module.fail_json(**result)
 
+    result['msg'] = "Successful execution on {0} targets".format(len(result['targets']))
     module.exit_json(**result)
 
 
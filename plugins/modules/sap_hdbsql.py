@@ -64,6 +64,27 @@ options:
     database:
         description: Define the database on which to connect.
         type: str
+    databases:
+        description:
+        - Execute I(query) and I(filepath) on all of these databases at the same time, for example C(SYSTEMDB) and the tenants.
+        - The results are returned per database in I(database_results) instead of I(query_result).
+        - Mutually exclusive with I(database) and I(output_file).
+        type: list
+        elements: str
+        version_added: "1.8.0"
+    discover_databases:
+        description:
+        - Like I(databases), with all active databases listed in C(M_DATABASES) of the system database.
+        - The system database is connected with I(database), which defaults to C(SYSTEMDB) here.
+        type: bool
+        default: false
+        version_added: "1.8.0"
+    max_workers:
+        description:
+        - The maximum number of databases of I(databases) or I(discover_databases) queried at the same time.
+        type: int
+        default: 4
+        version_added: "1.8.0"
     encrypted:
         description: Use encrypted connection.
         type: bool
@@ -81,6 +102,32 @@ options:
         - Must be a string or list containing strings.
         type: list
         elements: path
+    progress_file:
+        description:
+        - Execute the statements of all I(filepath) files in one hdbsql session, reading the files while they are executed,
+          and record every completed statement with its file, number and byte offset as JSON line in this file
+          on the managed node, so the progress can be followed during the execution.
+        - The statements are split at I(statement_separator). The rows returned by the statements are discarded,
+          the files have an empty list in I(query_result).
+        - If a statement fails, the execution stops and I(progress) tells the last completed statement.
+        type: path
+        version_added: "1.8.0"
+    resume:
+        description:
+        - Continue the execution of I(filepath) after the last statement of every file recorded in I(progress_file)
+          by a previous execution, instead of starting from the beginning.
+        - The files must not have been changed before the recorded statements in the meantime.
+        type: bool
+        default: false
+        version_added: "1.8.0"
+    statement_separator:
+        description:
+        - The separator of the statements in the I(filepath) files with I(progress_file).
+        - Separators in quoted strings and comments are ignored. Use a different separator if the files contain
+          procedures with several statements.
+        type: str
+        default: ";"
+        version_added: "1.8.0"
     query:
         description:
         - SQL query to run.
@@ -88,9 +135,162 @@ options:
           It is better to supply a one-element list instead to avoid mangled input.
         type: list
         elements: str
+    load:
+        description:
+        - Load the rows of a local file into a table, instead of executing I(query) or I(filepath).
+        - The rows are inserted in batches of I(load.batch_size) rows, with I(engine=hdbcli) as array inserts of
+          a prepared statement, with hdbsql as one C(INSERT) statement per batch, all in a single session.
+        - The load is done without autocommit, see I(load.commit_interval). If it fails, the rows after the last
+          commit are not loaded.
+        type: dict
+        version_added: "1.8.0"
+        suboptions:
+            src:
+                description:
+                - The file on the managed node with the rows to load.
+                type: path
+                required: true
+            table:
+                description:
+                - The table the rows are inserted into, for example C(MYSCHEMA.MYTABLE).
+                type: str
+                required: true
+            format:
+                description:
+                - The format of I(load.src).
+                - C(csv) must have a header line with the column names, empty values are loaded as C(NULL).
+                - C(jsonl) has one JSON object per line, the keys of the first object are the column names.
+                type: str
+                choices: [csv, jsonl]
+                default: csv
+            batch_size:
+                description:
+                - The number of rows inserted at once.
+                type: int
+                default: 1000
+            commit_interval:
+                description:
+                - Commit after every batch which completes this number of rows.
+                - C(0) commits once after all rows are loaded.
+                type: int
+                default: 0
+    session:
+        description:
+        - Run all I(query) statements in a single hdbsql session instead of one hdbsql process per query,
+          so the login and connection setup is done only once.
+        - The statements are passed to hdbsql as one batch and the output is split back into one result per query.
+        - The execution stops at the first failing statement.
+        - I(filepath) is still executed in a separate session per file.
+        type: bool
+        default: false
+        version_added: "1.8.0"
+    engine:
+        description:
+        - How the I(query) statements are executed.
+        - C(hdbsql) runs the hdbsql binary and returns all values as strings.
+        - C(hdbcli) uses the SAP HANA Python client C(hdbcli) over a single connection for all queries and returns
+          numbers as numbers, C(NULL) as C(null), date and time values in ISO 8601 format and binary values as hex string.
+        - C(auto) uses C(hdbcli) if it is installed, else C(hdbsql).
+        - I(filepath) is always executed with hdbsql.
+        type: str
+        choices: [auto, hdbcli, hdbsql]
+        default: hdbsql
+        version_added: "1.8.0"
+    fetch_size:
+        description:
+        - The number of rows fetched from the database at once with I(engine=hdbcli).
+        type: int
+        default: 1000
+        version_added: "1.8.0"
+    result_format:
+        description:
+        - The format of the result of every query in I(query_result).
+        - C(rows) returns a list with a dict per row.
+        - C(columnar) returns a dict with the C(columns) names and the C(rows) as lists of values in the order of C(columns),
+          so the column names are not repeated for every row.
+        type: str
+        choices: [rows, columnar]
+        default: rows
+        version_added: "1.8.0"
+    output_file:
+        description:
+        - Write the rows of all queries to this file on the managed node instead of returning them in I(query_result).
+        - The output of hdbsql is read and written row by row while the query is running, so large result sets are never
+          kept in memory.
+        - The rows of the queries are written one after another, see I(output_format).
+        type: path
+        version_added: "1.8.0"
+    output_format:
+        description:
+        - The format of I(output_file).
+        - C(jsonl) writes one JSON object per row.
+        - C(csv) writes the rows as CSV, with a header line before the rows of every query.
+        type: str
+        choices: [jsonl, csv]
+        default: jsonl
+        version_added: "1.8.0"
+    max_rows:
+        description:
+        - The maximum number of rows of every query returned in I(query_result) or written to I(output_file).
+        - The output is read while the query is running and if the limit is reached, hdbsql is stopped, or the
+          fetch with I(engine=hdbcli) ends, without reading the remaining rows, unless I(session=true).
+        - If rows are left out of I(query_result), I(truncated) is C(true).
+        type: int
+        version_added: "1.8.0"
+    max_bytes:
+        description:
+        - The maximum size of the rows of all queries in I(query_result), measured as JSON.
+        - Rows are returned until the next one would exceed the limit, the execution of the query is stopped like with
+          I(max_rows) and I(truncated) is C(true).
+        - Guards the module and the controller against unexpectedly large results. Not used with I(output_file).
+        type: int
+        version_added: "1.8.0"
+    statistics:
+        description:
+        - Return the duration and the number of rows of every query and file in I(statement_statistics).
+        - With I(engine=hdbcli), also the server processing time, CPU time and memory usage of every query.
+        - With I(session=true), the statements are not timed one by one.
+        type: bool
+        default: false
+        version_added: "1.8.0"
+    cache:
+        description:
+        - Keep the results of I(query) in a local cache on the managed node and return them from there in subsequent
+          tasks instead of executing the queries again, until I(cache_ttl) has expired.
+        - Only used if all queries are C(SELECT) statements, so the task is not changed, and neither I(filepath),
+          I(output_file), I(max_rows) nor I(max_bytes) is given.
+        - Cache entries are kept per query and all options which affect the connection or the result, like I(host),
+          I(instance), I(database), I(user), I(encrypted), I(properties), I(engine) and I(result_format). The query is
+          compared without surrounding whitespace and trailing semicolon, but otherwise unchanged.
+        type: bool
+        default: false
+        version_added: "1.8.0"
+    cache_dir:
+        description:
+        - The directory of the local cache on the managed node.
+        type: path
+        default: ~/.cache/community.sap_libs
+        version_added: "1.8.0"
+    cache_ttl:
+        description:
+        - The number of seconds a cached result is returned before the query is executed again.
+        - C(0) keeps cached results until they are evicted by I(cache_max_entries).
+        type: int
+        default: 300
+        version_added: "1.8.0"
+    cache_max_entries:
+        description:
+        - The maximum number of cached results, the oldest are removed if it is exceeded.
+        type: int
+        default: 200
+        version_added: "1.8.0"
 notes:
     - Does not support C(check_mode).
     - If filepath is used, changed is true. If query is used, changed is true if it is not a SELECT.
+    - With I(progress_file), changed is only true if a statement other than a SELECT was executed, so a resumed run
+      skipping all statements of the files is not changed.
+    - With I(engine=hdbcli), I(host) defaults to C(localhost) and the port to 3<instance>15, or 3<instance>13 if
+      I(database) is set. I(user) is the key in hdbuserstore if I(userstore=true).
     - Avoid using login shell flags (like 'become_flags' with value of '-i') when become_user is a SAP admin.
     - If a login shell is required, manually reset the environment in the task using the environment keyword.
 author:
@@ -156,6 +356,116 @@ EXAMPLES = r'''
     - select * from users
     autocommit: False
 
+- name: Run many monitoring queries with a single login
+  community.sap_libs.sap_hdbsql:
+    sid: "hdb"
+    instance: "01"
+    user: hdbstoreuser
+    userstore: true
+    session: true
+    query:
+    - select * from m_service_memory
+    - select * from m_cs_tables where memory_size_in_total > 1000000000
+    - select * from m_backup_catalog where entry_type_name = 'complete data backup'
+
+- name: Run queries with the hdbcli driver if installed and get typed values
+  community.sap_libs.sap_hdbsql:
+    sid: "hdb"
+    instance: "01"
+    password: "Test123"
+    engine: auto
+    fetch_size: 10000
+    query:
+    - select host, port, total_memory_used_size from m_service_memory
+
+- name: Return a wide monitoring view without repeating the column names in every row
+  community.sap_libs.sap_hdbsql:
+    sid: "hdb"
+    instance: "01"
+    password: "Test123"
+    result_format: columnar
+    query:
+    - select * from m_load_history_service
+
+- name: Dump the SQL plan cache to a local file
+  community.sap_libs.sap_hdbsql:
+    sid: "hdb"
+    instance: "01"
+    user: hdbstoreuser
+    userstore: true
+    query:
+    - select * from m_sql_plan_cache
+    output_file: /var/tmp/plan_cache.jsonl
+    max_rows: 100000
+
+- name: Run the same query on the system database and all tenants at the same time
+  community.sap_libs.sap_hdbsql:
+    sid: "hdb"
+    instance: "01"
+    user: SYSTEM
+    password: "Test123"
+    discover_databases: true
+    query:
+    - select count(*) as connections from m_connections
+
+- name: Load a CSV file into a table in batches of 5000 rows
+  community.sap_libs.sap_hdbsql:
+    sid: "hdb"
+    instance: "01"
+    user: SYSTEM
+    password: "Test123"
+    engine: auto
+    load:
+      src: /var/tmp/countries.csv
+      table: MYSCHEMA.COUNTRIES
+      batch_size: 5000
+      commit_interval: 50000
+
+- name: Find the slow monitoring queries
+  community.sap_libs.sap_hdbsql:
+    sid: "hdb"
+    instance: "01"
+    userstore: true
+    user: MONITORING
+    engine: hdbcli
+    statistics: true
+    query:
+    - select * from m_service_memory
+    - select * from m_expensive_statements
+  register: monitoring
+
+- name: Return at most 1000 rows and 1 MB of a query with unknown result size
+  community.sap_libs.sap_hdbsql:
+    sid: "hdb"
+    instance: "01"
+    userstore: true
+    user: MONITORING
+    query:
+    - select * from m_expensive_statements
+    max_rows: 1000
+    max_bytes: 1048576
+
+- name: Run a large migration script, continuing after the last completed statement if it is run again
+  community.sap_libs.sap_hdbsql:
+    sid: "hdb"
+    instance: "01"
+    userstore: true
+    user: MIGRATION
+    filepath:
+    - /var/tmp/migration.sql
+    progress_file: /var/tmp/migration.progress
+    resume: true
+
+- name: Read the version, cached for an hour for the following tasks
+  community.sap_libs.sap_hdbsql:
+    sid: "hdb"
+    instance: "01"
+    user: SYSTEM
+    password: "Test123"
+    query: select version from m_database
+    cache: true
+    cache_ttl: 3600
+
 - name: Run query with SQLDBC connect options
   community.sap_libs.sap_hdbsql:
     sid: "hdb"
@@ -169,17 +479,170 @@ EXAMPLES = r'''
 
 RETURN = r'''
 query_result:
-    description: List containing results of all queries executed (one sublist for every query).
+    description:
+    - List containing results of all queries executed (one sublist for every query).
+    - With I(result_format=columnar), one dict for every query with C(columns), the list of column names,
+      and C(rows), the list of rows as lists of values.
     returned: on success
     type: list
-    elements: list
+    elements: raw
     sample: [[{"Column": "Value1"}, {"Column": "Value2"}], [{"Column": "Value1"}, {"Column": "Value2"}]]
+database_results:
+    description:
+    - The outcome per database with I(databases) or I(discover_databases).
+    - Every entry contains the C(query_result) of the database and C(error), empty on success.
+    returned: when I(databases) or I(discover_databases) is used
+    type: dict
+    sample: {"SYSTEMDB": {"query_result": [[{"CONNECTIONS": "42"}]], "error": ""},
+             "HDB": {"query_result": [[{"CONNECTIONS": "120"}]], "error": ""}}
+row_count:
+    description: The number of rows of every query written to I(output_file).
+    returned: when I(output_file) is used
+    type: list
+    elements: int
+    sample: [100000]
+output_file:
+    description: The file the rows were written to.
+    returned: when I(output_file) is used
+    type: str
+    sample: /var/tmp/plan_cache.jsonl
+truncated:
+    description: Whether rows were left out of I(query_result) because of I(max_rows) or I(max_bytes).
+    returned: when I(max_rows) or I(max_bytes) is used without I(output_file)
+    type: bool
+    sample: true
+total_rows:
+    description:
+    - The number of rows of every query, including the rows left out of I(query_result).
+    - C(null) if the query was stopped before all rows were read, so the number is unknown.
+    returned: when I(max_rows) or I(max_bytes) is used without I(output_file)
+    type: list
+    elements: int
+    sample: [1000, null]
+statement_statistics:
+    description:
+    - The statistics of every query and file in the order of execution, also of the statements executed before a failure.
+    - With I(databases) or I(discover_databases), they are returned per database in I(database_results).
+    returned: when I(statistics=true)
+    type: list
+    elements: dict
+    contains:
+        statement:
+            description: The query, or the path of the file.
+            type: str
+        seconds:
+            description:
+            - The wall clock duration of the statement, including the transfer of the result.
+            - C(null) with I(session=true).
+            type: float
+        rows:
+            description: The number of rows returned, or written to I(output_file).
+            type: int
+        server_processing_time:
+            description: The processing time of the statement on the server in microseconds, with I(engine=hdbcli).
+            type: int
+        server_cpu_time:
+            description: The CPU time of the statement on the server in microseconds, with I(engine=hdbcli).
+            type: int
+        server_memory_usage:
+            description: The memory used by the statement on the server in bytes, with I(engine=hdbcli).
+            type: int
+        cached:
+            description: Whether the result was returned from the local cache, with I(cache=true).
+            type: bool
+    sample: [{"statement": "select * from m_services", "seconds": 0.042, "rows": 12}]
+progress:
+    description: The progress of the execution of every I(filepath) file, also returned on failure.
+    returned: when I(progress_file) is used
+    type: list
+    elements: dict
+    contains:
+        file:
+            description: The path of the file.
+            type: str
+        skipped:
+            description: The number of statements skipped because of I(resume).
+            type: int
+        executed:
+            description: The number of statements executed.
+            type: int
+        changed:
+            description: Whether a statement other than C(SELECT) was executed.
+            type: bool
+        statement:
+            description: The number of the last completed statement of the file.
+            type: int
+        offset:
+            description: The byte offset of the end of the last completed statement in the file.
+            type: int
+    sample: [{"file": "/var/tmp/migration.sql", "skipped": 1200, "executed": 3400, "changed": true, "statement": 4600, "offset": 73400320}]
+load_result:
+    description: The statistics of I(load).
+    returned: when I(load) is used
+    type: dict
+    contains:
+        rows:
+            description: The number of rows loaded.
+            type: int
+        batches:
+            description: The number of batches inserted.
+            type: int
+        commits:
+            description: The number of commits.
+            type: int
+        seconds:
+            description: The duration of the load.
+            type: float
+        rows_per_second:
+            description: The number of rows loaded per second.
+            type: float
+    sample: {"rows": 250000, "batches": 50, "commits": 5, "seconds": 12.5, "rows_per_second": 20000.0}
+cache_hits:
+    description: The number of queries whose result was returned from the local cache.
+    returned: when I(cache) is used
+    type: int
+    sample: 1
+engine:
+    description: The engine the queries were executed with, C(hdbsql) or C(hdbcli).
+    returned: on success
+    type: str
+    sample: hdbcli
 '''
 
+import binascii
 import csv
-from ansible.module_utils.basic import AnsibleModule
+import datetime
+import decimal
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from collections import deque
+from itertools import islice
+from ansible.module_utils.basic import AnsibleModule, missing_required_lib
 from io import StringIO
 from ansible.module_utils.common.text.converters import to_native
+from ..module_utils.local_cache import LocalCache
+from ..module_utils.parallel import parallel_map
+
+try:
+    from hdbcli import dbapi
+except ImportError:
+    HAS_HDBCLI_LIBRARY = False
+    HDBCLI_LIBRARY_IMPORT_ERROR = traceback.format_exc()
+else:
+    HAS_HDBCLI_LIBRARY = True
+    HDBCLI_LIBRARY_IMPORT_ERROR = None
+
+
+# The active databases of a multi tenant system, read from the system database.
+DISCOVER_QUERY = "SELECT DATABASE_NAME FROM M_DATABASES WHERE ACTIVE_STATUS = 'YES'"
 
 
 def csv_to_list(raw_csv):
@@ -192,67 +655,690 @@ def csv_to_list(raw_csv):
     return list(reader)
 
 
-def run_hdb_command(module, full_cmd):
-    rc, out_raw, err = module.run_command(full_cmd)
+def csv_to_columns(raw_csv):
+    """Return the CSV output as dict with the column names and the rows as lists of values."""
+    rows = [row for row in csv.reader(StringIO(raw_csv)) if row]
+    if not rows:
+        return dict(columns=[], rows=[])
+    return dict(columns=[to_native(column) for column in rows[0]],
+                rows=[[to_native(value).strip() for value in row] for row in rows[1:]])
 
-    if rc != 0:
-        err_msg = to_native(err).lower()
 
-        if "authentication failed" in err_msg or "invalid username or password" in err_msg:
-            module.fail_json(msg="SAP HANA Authentication Failed. Please check credentials/userstore.", rc=rc, stderr=err)
+def result_rows(query_result):
+    """Return the number of rows of a query_result entry."""
+    return len(query_result['rows'] if isinstance(query_result, dict) else query_result)
+
+
+def error_message(err):
+    """Return the message for a known SAP HANA error, or None."""
+    err_msg = to_native(err).lower()
+
+    if "authentication failed" in err_msg or "invalid username or password" in err_msg:
+        return "SAP HANA Authentication Failed. Please check credentials/userstore."
+
+    if "insufficient privilege" in err_msg or "258:" in err_msg:
+        return "SAP HANA Authorization Error: The user has insufficient privileges to perform this action."
+
+    if "connect failed" in err_msg or "connection failed" in err_msg:
+        return "SAP HANA Connection Failed. Check host, instance, and port."
+
+    return None
+
+
+class ResultList(object):
+    """
+    Collect the rows of every query for I(query_result), as list of dicts or in columnar format.
+
+    With max_rows, at most max_rows rows of every query are collected, with max_bytes, the rows of all queries
+    are collected until their size in JSON exceeds max_bytes. The further rows are not accepted.
+    """
 
-        elif "insufficient privilege" in err_msg or "258:" in err_msg:
-            module.fail_json(msg="SAP HANA Authorization Error: The user has insufficient privileges to perform this action.", rc=rc, stderr=err)
+    def __init__(self, result_format='rows', max_rows=None, max_bytes=None):
+        self.results = []
+        self.truncated = []
+        self.total_rows = []
+        self.limited = max_rows is not None or max_bytes is not None
+        self._columnar = result_format == 'columnar'
+        self._max_rows = max_rows
+        self._max_bytes = max_bytes
+        self._bytes = 0
+        self._rows = None
+        self._columns = None
+        self._offered = 0
 
-        elif "connect failed" in err_msg:
-            module.fail_json(msg="SAP HANA Connection Failed. Check host, instance, and port.", rc=rc, stderr=err)
+    @property
+    def row_counts(self):
+        return [result_rows(query_result) for query_result in self.results]
 
+    def start_query(self, columns):
+        self._columns = [to_native(column) for column in columns]
+        self._rows = []
+
+    def write(self, values):
+        """Add a row, return False if no further rows of the query are accepted."""
+        self._offered += 1
+        if self._max_rows is not None and len(self._rows) >= self._max_rows:
+            return False
+        if self._max_bytes is not None:
+            size = len(json.dumps(values, default=str))
+            if self._bytes + size > self._max_bytes:
+                self._max_bytes = self._bytes
+                return False
+            self._bytes += size
+        self._rows.append(list(values) if self._columnar else dict(zip(self._columns, values)))
+        return True
+
+    def end_query(self, complete=True):
+        """End the rows of the query, complete is False if the reading stopped before all rows were offered."""
+        rows = self._rows or []
+        self.truncated.append(self._offered > len(rows))
+        self.total_rows.append(self._offered if complete else None)
+        if self._columnar:
+            self.results.append(dict(columns=self._columns or [], rows=rows))
+        else:
+            self.results.append(rows)
+        self._rows = None
+        self._columns = None
+        self._offered = 0
+
+
+class ResultWriter(object):
+    """Write the rows of every query to a local file as JSON lines or CSV, with an optional row limit per query."""
+
+    def __init__(self, path, output_format, max_rows=None):
+        self.path = path
+        self.row_counts = []
+        self._file = open(path, 'w')
+        self._csv = csv.writer(self._file) if output_format == 'csv' else None
+        self._max_rows = max_rows
+        self._columns = None
+        self._count = 0
+
+    def start_query(self, columns):
+        self._columns = [to_native(column) for column in columns]
+        if self._csv is not None:
+            self._csv.writerow(self._columns)
+
+    def write(self, values):
+        """Write a row, return False if no further rows of the query are accepted."""
+        if self._max_rows is not None and self._count >= self._max_rows:
+            return False
+        if self._csv is not None:
+            self._csv.writerow(values)
         else:
-            module.fail_json(msg="SQL Execution Error", rc=rc, stderr=err, cmd=full_cmd)
+            self._file.write(json.dumps(dict(zip(self._columns, values))) + "\n")
+        self._count += 1
+        return True
+
+    def end_query(self, complete=True):
+        self.row_counts.append(self._count)
+        self._count = 0
+
+    def close(self):
+        self._file.close()
 
+
+class HdbsqlError(Exception):
+    """An error of the execution, with msg and the further details to fail the module with."""
+
+    def __init__(self, msg, **kwargs):
+        super(HdbsqlError, self).__init__(msg)
+        self.msg = msg
+        self.kwargs = kwargs
+
+
+def check_hdb_result(module, full_cmd, rc, err):
+    if rc != 0:
+        msg = error_message(err)
+        if msg is not None:
+            raise HdbsqlError(msg, rc=rc, stderr=err)
+        raise HdbsqlError("SQL Execution Error", rc=rc, stderr=err, cmd=full_cmd)
+
+
+def run_hdb_command(module, full_cmd):
+    rc, out_raw, err = module.run_command(full_cmd)
+    check_hdb_result(module, full_cmd, rc, err)
     return out_raw
 
 
-def main():
-    module = AnsibleModule(
-        argument_spec=dict(
-            sid=dict(type='str', required=False),
-            bin_path=dict(type='str', required=False),
-            instance=dict(type='str', required=True),
-            encrypted=dict(type='bool', default=False),
-            host=dict(type='str', required=False),
-            user=dict(type='str', default="SYSTEM"),
-            userstore=dict(type='bool', default=False),
-            password=dict(type='str', no_log=True),
-            database=dict(type='str', required=False),
-            query=dict(type='list', elements='str', required=False),
-            filepath=dict(type='list', elements='path', required=False),
-            autocommit=dict(type='bool', default=True),
-            properties=dict(type='list', elements='str', required=False),
-        ),
-        required_one_of=[('query', 'filepath')],
-        required_if=[('userstore', False, ['password'])],
-        supports_check_mode=False,
+def stream_hdb_command(module, full_cmd, sink, marker=None):
+    """
+    Run hdbsql and pass the rows of its CSV output to sink while they are read.
+
+    hdbsql writes its output (-o) to a named pipe, which is read in parallel, so the output
+    is never kept in memory or on disk as a whole.
+    With marker, the output of a batch created by batch_queries() is split per query while reading.
+    Without, the pipe is closed as soon as the sink does not accept further rows, which stops hdbsql.
+    """
+    pipe_dir = tempfile.mkdtemp(dir=module.tmpdir)
+    pipe_path = os.path.join(pipe_dir, 'output')
+    os.mkfifo(pipe_path, 0o600)
+    outcome = {}
+
+    def run():
+        try:
+            outcome['result'] = module.run_command(full_cmd + ['-o', pipe_path])
+        except BaseException as e:
+            outcome['exception'] = e
+        finally:
+            # Unblock the reader, if hdbsql ended without opening the pipe
+            try:
+                os.close(os.open(pipe_path, os.O_WRONLY | os.O_NONBLOCK))
+            except OSError:
+                pass
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    stopped = False
+    try:
+        with io.open(pipe_path, 'r', encoding='utf-8', errors='surrogateescape', newline='') as output:
+            expect_header = True
+            skip = False
+            for row in csv.reader(output):
+                if skip or not row:
+                    # The value row of the marker SELECT, or an empty line.
+                    skip = False
+                elif marker is not None and row == [marker]:
+                    sink.end_query()
+                    expect_header = True
+                    skip = True
+                elif expect_header:
+                    sink.start_query(row)
+                    expect_header = False
+                elif not sink.write([to_native(value).strip() for value in row]) and marker is None:
+                    stopped = True
+                    break
+    finally:
+        thread.join()
+        shutil.rmtree(pipe_dir)
+
+    if 'exception' in outcome:
+        raise outcome['exception']
+    if marker is None:
+        sink.end_query(complete=not stopped)
+    if not stopped:
+        rc, dummy, err = outcome['result']
+        check_hdb_result(module, full_cmd, rc, err)
+
+
+def hdbcli_value(value):
+    """Convert a value returned by hdbcli to a JSON compatible type."""
+    if isinstance(value, decimal.Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if hasattr(value, 'read'):
+        # LOB locator
+        value = value.read()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return to_native(binascii.hexlify(bytes(value))).upper()
+    return value
+
+
+def hdbcli_connect(params):
+    """Open a hdbcli connection with the connection parameters of the module."""
+    host, dummy, port = (params['host'] or 'localhost').partition(':')
+    if not port:
+        port = "3{0}{1}".format(params['instance'], "13" if params['database'] else "15")
+
+    options = dict(address=host, port=int(port), autocommit=params['autocommit'])
+    if params['userstore']:
+        options['key'] = params['user']
+    else:
+        options['user'] = params['user']
+        options['password'] = params['password']
+    if params['database']:
+        options['databaseName'] = params['database']
+    if params['encrypted']:
+        options['encrypt'] = True
+        options['sslValidateCertificate'] = False
+    for prop in params['properties'] or []:
+        key, dummy, value = prop.partition('=')
+        options[key.strip()] = value.strip()
+    return dbapi.connect(**options)
+
+
+def hdbcli_server_statistics(cursor):
+    """Return the server side statistics of the last statement of cursor."""
+    return dict(
+        server_processing_time=cursor.server_processing_time(),
+        server_cpu_time=cursor.server_cpu_time(),
+        server_memory_usage=cursor.server_memory_usage(),
     )
 
-    params = module.params
-    output = []
-    has_changed = False
 
-    # Determine if module will show as changed.
-    # If filepaths are provided, we assume changes will be made, as files typically contain DDL or DML statements.
-    # If only queries are provided, we check if any of them are not SELECT statements. If at least one is not a SELECT, we assume changes will be made.
-    if params['filepath']:
-        has_changed = True
+def run_hdbcli_queries(conn, queries, fetch_size, sink, statistics=None):
+    """
+    Execute the queries over one connection and pass the rows of every query to sink.
 
-    elif params['query']:
-        for q in params['query']:
-            # Strip whitespace and check if it starts with SELECT
-            if not q.strip().upper().startswith("SELECT"):
-                has_changed = True
+    With statistics, a dict with the duration, row count and server statistics of every query is appended to it.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.arraysize = fetch_size
+        for q in queries:
+            start = time.time()
+            rows = 0
+            cursor.execute(q)
+            if cursor.description:
+                sink.start_query([column[0] for column in cursor.description])
+                accepted = True
+                while accepted:
+                    chunk = cursor.fetchmany(fetch_size)
+                    if not chunk:
+                        break
+                    for row in chunk:
+                        accepted = sink.write([hdbcli_value(value) for value in row])
+                        if not accepted:
+                            break
+                        rows += 1
+                sink.end_query(complete=accepted)
+            else:
+                sink.end_query()
+            if statistics is not None:
+                statement_statistics = dict(statement=q, seconds=round(time.time() - start, 3), rows=rows)
+                statement_statistics.update(hdbcli_server_statistics(cursor))
+                statistics.append(statement_statistics)
+    finally:
+        cursor.close()
+
+
+def batch_queries(queries, separator, marker):
+    """
+    Return the queries as one hdbsql batch with the statement separator.
+
+    A SELECT of a column named marker follows every query, so the result set of every
+    query can be found in the output, also for queries which do not return one.
+    """
+    statements = []
+    for q in queries:
+        statements.append(q.strip().rstrip(';'))
+        statements.append('SELECT 1 AS "{0}" FROM DUMMY'.format(marker))
+    return "".join("{0}\n{1}\n".format(statement, separator) for statement in statements)
+
+
+def split_results(out_raw, marker):
+    """Split the output of a batch created with batch_queries() back into the output of every query."""
+    results = []
+    lines = []
+    skip = False
+    for line in to_native(out_raw).splitlines(True):
+        if skip:
+            # The value row of the marker SELECT.
+            skip = False
+        elif line.strip().strip('"') == marker:
+            results.append("".join(lines))
+            lines = []
+            skip = True
+        else:
+            lines.append(line)
+    return results
+
+
+def run_hdb_session(module, command, queries, sink=None):
+    """
+    Run all queries in one hdbsql session and return the raw output of every query.
+
+    With sink, the rows are streamed to sink instead.
+    """
+    token = uuid.uuid4().hex.upper()
+    separator = "ANSIBLE_STATEMENT_{0}".format(token)
+    marker = "ANSIBLE_RESULT_{0}".format(token)
+    fd, batch_path = tempfile.mkstemp(dir=module.tmpdir, suffix=".sql")
+    try:
+        with os.fdopen(fd, 'w') as batch_file:
+            batch_file.write(batch_queries(queries, separator, marker))
+        session_command = command + ['-E', '3', '-m', '-c', separator, '-I', batch_path]
+        if sink is not None:
+            stream_hdb_command(module, session_command, sink, marker)
+            return None
+        out_raw = run_hdb_command(module, session_command)
+    finally:
+        os.remove(batch_path)
+    return split_results(out_raw, marker)
+
+
+def read_load_file(path, file_format):
+    """
+    Return the column names and an iterator over the rows of a file to load.
+
+    The file is read line by line while the rows are consumed, it has to be kept open until then.
+    """
+    load_file = io.open(path, 'r', encoding='utf-8', newline='')
+    if file_format == 'csv':
+        reader = csv.reader(load_file)
+        columns = next(reader, [])
+        rows = ([value if value != '' else None for value in row] for row in reader if row)
+    else:
+        lines = (line for line in load_file if line.strip())
+        first = next(lines, None)
+        first = json.loads(first) if first is not None else {}
+        columns = list(first)
+        rows = jsonl_rows(first, lines, columns)
+    return load_file, columns, rows
+
+
+def jsonl_rows(first, lines, columns):
+    """Return the values of columns of the object first and the objects of the lines."""
+    if first:
+        yield [first.get(column) for column in columns]
+    for line in lines:
+        row = json.loads(line)
+        yield [row.get(column) for column in columns]
+
+
+def load_batches(rows, batch_size):
+    """Return the rows in lists of batch_size rows."""
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def quote_identifier(name):
+    return '"{0}"'.format(name.replace('"', '""'))
+
+
+def sql_literal(value):
+    """Return value as SQL literal for a statement executed with hdbsql."""
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return "'{0}'".format(to_native(value).replace("'", "''"))
+
+
+def insert_statement(table, columns, batch):
+    """Return one INSERT statement with all rows of batch."""
+    selects = " UNION ALL ".join(
+        "SELECT {0} FROM DUMMY".format(", ".join(sql_literal(value) for value in row)) for row in batch)
+    return "INSERT INTO {0} ({1}) {2}".format(table, ", ".join(quote_identifier(c) for c in columns), selects)
+
+
+class LoadCounter(object):
+    """Count the loaded rows and batches and tell when the next commit is due."""
+
+    def __init__(self, commit_interval):
+        self.commit_interval = commit_interval
+        self.rows = 0
+        self.batches = 0
+        self.commits = 0
+        self.uncommitted = 0
+
+    def add(self, batch):
+        """Count batch and return True if it has to be committed."""
+        self.rows += len(batch)
+        self.batches += 1
+        self.uncommitted += len(batch)
+        return bool(self.commit_interval) and self.uncommitted >= self.commit_interval
+
+    def commit(self):
+        self.commits += 1
+        self.uncommitted = 0
+
+    def result(self):
+        return dict(rows=self.rows, batches=self.batches, commits=self.commits)
+
+
+def load_hdbcli(conn, table, columns, rows, batch_size, commit_interval):
+    """Insert the rows with array inserts over conn and return the load statistics."""
+    counter = LoadCounter(commit_interval)
+    statement = "INSERT INTO {0} ({1}) VALUES ({2})".format(
+        table, ", ".join(quote_identifier(c) for c in columns), ", ".join("?" for c in columns))
+    conn.setautocommit(False)
+    cursor = conn.cursor()
+    try:
+        for batch in load_batches(rows, batch_size):
+            cursor.executemany(statement, batch)
+            if counter.add(batch):
+                conn.commit()
+                counter.commit()
+        conn.commit()
+        counter.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return counter.result()
+
+
+def load_hdbsql(module, command, table, columns, rows, batch_size, commit_interval):
+    """
+    Insert the rows with one INSERT statement per batch in one hdbsql session and return the load statistics.
+
+    command must not autocommit, the COMMIT statements are added to the batch.
+    """
+    counter = LoadCounter(commit_interval)
+    separator = "ANSIBLE_STATEMENT_{0}".format(uuid.uuid4().hex.upper())
+    fd, batch_path = tempfile.mkstemp(dir=module.tmpdir, suffix=".sql")
+    try:
+        with os.fdopen(fd, 'w') as batch_file:
+            for batch in load_batches(rows, batch_size):
+                batch_file.write("{0}\n{1}\n".format(insert_statement(table, columns, batch), separator))
+                if counter.add(batch):
+                    batch_file.write("COMMIT\n{0}\n".format(separator))
+                    counter.commit()
+            batch_file.write("COMMIT\n{0}\n".format(separator))
+            counter.commit()
+        run_hdb_command(module, command + ['-E', '3', '-m', '-c', separator, '-I', batch_path])
+    finally:
+        os.remove(batch_path)
+    return counter.result()
+
+
+def load_file(module, params, engine, command):
+    """Load the file of the load option and return the load statistics, errors are raised as HdbsqlError."""
+    load = params['load']
+    start = time.time()
+    try:
+        source, columns, rows = read_load_file(load['src'], load['format'])
+    except (IOError, OSError, ValueError, csv.Error) as e:
+        raise HdbsqlError("Failed to read {0}: {1}".format(load['src'], to_native(e)))
+    try:
+        if not columns:
+            raise HdbsqlError("No column names found in {0}".format(load['src']))
+        if engine == 'hdbcli':
+            try:
+                conn = hdbcli_connect(params)
+            except Exception as e:
+                raise HdbsqlError(error_message(e) or "SAP HANA Connection Failed: {0}".format(to_native(e)))
+            try:
+                result = load_hdbcli(conn, load['table'], columns, rows, load['batch_size'], load['commit_interval'])
+            except (ValueError, csv.Error) as e:
+                raise HdbsqlError("Failed to read {0}: {1}".format(load['src'], to_native(e)))
+            except Exception as e:
+                raise HdbsqlError(error_message(e) or "SQL Execution Error", stderr=to_native(e))
+            finally:
+                conn.close()
+        else:
+            try:
+                result = load_hdbsql(module, command, load['table'], columns, rows, load['batch_size'], load['commit_interval'])
+            except (ValueError, csv.Error) as e:
+                raise HdbsqlError("Failed to read {0}: {1}".format(load['src'], to_native(e)))
+    finally:
+        source.close()
+
+    result['seconds'] = round(time.time() - start, 3)
+    result['rows_per_second'] = round(result['rows'] / result['seconds'], 1) if result['seconds'] else float(result['rows'])
+    return result
+
+
+def split_statements(sql_file, separator=';', offset=0):
+    """
+    Read the statements of a SQL file opened in binary mode line by line.
+
+    Yields every statement without separator and comments together with the byte offset after it, starting at offset.
+    Separators in quoted strings, quoted identifiers and comments are ignored, and statements consisting only of
+    comments are skipped, so they are neither executed nor counted.
+    """
+    statement = []
+    quote = None
+    block_comment = False
+    for line in sql_file:
+        text = line.decode('utf-8')
+        start = 0
+        i = 0
+        while i < len(text):
+            if block_comment:
+                if text.startswith('*/', i):
+                    block_comment = False
+                    i += 1
+                    start = i + 1
+            elif quote is not None:
+                if text[i] == quote:
+                    quote = None
+            elif text.startswith('--', i):
+                statement.append(text[start:i])
+                start = len(text.rstrip('\r\n'))
                 break
+            elif text.startswith('/*', i):
+                statement.append(text[start:i] + ' ')
+                block_comment = True
+                i += 1
+            elif text[i] in '\'"':
+                quote = text[i]
+            elif text.startswith(separator, i):
+                statement.append(text[start:i])
+                start = i + len(separator)
+                i = start
+                sql = "".join(statement).strip()
+                statement = []
+                if sql:
+                    yield sql, offset + len(text[:start].encode('utf-8'))
+                continue
+            i += 1
+        if not block_comment:
+            statement.append(text[start:])
+        offset += len(line)
+
+    sql = "".join(statement).strip()
+    if sql:
+        yield sql, offset
+
+
+def read_progress(path):
+    """Return the number and end offset of the last statement executed of every file recorded in a progress file."""
+    progress = {}
+    try:
+        with open(path) as progress_file:
+            for line in progress_file:
+                try:
+                    entry = json.loads(line)
+                    progress[entry['file']] = (entry['statement'], entry['offset'])
+                except (ValueError, KeyError, TypeError):
+                    # A line not completely written when the execution was aborted.
+                    pass
+    except (IOError, OSError):
+        pass
+    return progress
+
+
+class ProgressLog(object):
+    """
+    Record every statement of a streamed file execution when it has been completed, as JSON line in a file.
+
+    Used as sink of stream_hdb_command(), the rows of the statements are discarded.
+    """
+
+    def __init__(self, path, pending, append):
+        self._file = open(path, 'a' if append else 'w')
+        self._pending = pending
+
+    def start_query(self, columns):
+        pass
+
+    def write(self, values):
+        return True
+
+    def end_query(self, complete=True):
+        file_progress, statement, offset, changes = self._pending.popleft()
+        file_progress.update(statement=statement, offset=offset, executed=file_progress['executed'] + 1,
+                             changed=file_progress['changed'] or changes)
+        self._file.write(json.dumps(dict(file=file_progress['file'], statement=statement, offset=offset, time=time.time())) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def run_hdb_files(module, command, paths, separator, progress_path, resume):
+    """
+    Execute the statements of the files in one hdbsql session, reading the files while they are executed.
+
+    Every completed statement is recorded in the progress file. With resume, the statements recorded
+    there by a previous execution are skipped. Returns the progress of every file.
+    """
+    previous = read_progress(progress_path) if resume else {}
+    progress = []
+    for path in paths:
+        statement, offset = previous.get(path, (0, 0))
+        progress.append(dict(file=path, skipped=statement, executed=0, statement=statement, offset=offset, changed=False))
+
+    token = uuid.uuid4().hex.upper()
+    hdb_separator = "ANSIBLE_STATEMENT_{0}".format(token)
+    marker = "ANSIBLE_RESULT_{0}".format(token)
+    pipe_dir = tempfile.mkdtemp(dir=module.tmpdir)
+    input_path = os.path.join(pipe_dir, 'input')
+    os.mkfifo(input_path, 0o600)
+    pending = deque()
+    stop = threading.Event()
+    outcome = {}
+
+    def feed():
+        try:
+            with open(input_path, 'w') as batch:
+                for file_progress in progress:
+                    with io.open(file_progress['file'], 'rb') as sql_file:
+                        sql_file.seek(file_progress['offset'])
+                        statements = split_statements(sql_file, separator, file_progress['offset'])
+                        for number, (statement, offset) in enumerate(statements, file_progress['skipped'] + 1):
+                            if stop.is_set():
+                                return
+                            pending.append((file_progress, number, offset, not is_select(statement)))
+                            batch.write(batch_queries([statement], hdb_separator, marker))
+                            batch.flush()
+        except (IOError, OSError, ValueError) as e:
+            outcome['exception'] = e
+
+    feeder = threading.Thread(target=feed)
+    feeder.start()
+    log = None
+    try:
+        log = ProgressLog(progress_path, pending, resume)
+        stream_hdb_command(module, command + ['-E', '3', '-m', '-c', hdb_separator, '-I', input_path], log, marker)
+    except HdbsqlError as e:
+        e.kwargs['progress'] = progress
+        raise
+    except (IOError, OSError) as e:
+        raise HdbsqlError("Failed to write progress file {0}: {1}".format(progress_path, to_native(e)), progress=progress)
+    finally:
+        # Unblock the feeder, if hdbsql ended before reading all statements
+        stop.set()
+        fd = os.open(input_path, os.O_RDONLY | os.O_NONBLOCK)
+        try:
+            while feeder.is_alive():
+                try:
+                    os.read(fd, 65536)
+                except OSError:
+                    pass
+                feeder.join(0.05)
+        finally:
+            os.close(fd)
+        if log is not None:
+            log.close()
+        shutil.rmtree(pipe_dir)
 
-    # Construct Binary Path
+    if 'exception' in outcome:
+        raise HdbsqlError("Failed to read the statements: {0}".format(to_native(outcome['exception'])), progress=progress)
+    return progress
+
+
+def hdbsql_binary(module, params):
+    """Return the path of the hdbsql binary, fail if it is not found."""
     bin_path = params['bin_path']
     if bin_path is None:
         if not params['sid']:
@@ -264,11 +1350,15 @@ def main():
         )
 
     try:
-        command = [module.get_bin_path(bin_path, required=True)]
+        return module.get_bin_path(bin_path, required=True)
     except Exception as e:
         module.fail_json(msg='Executable binary hdbsql not found at {0}: {1}'.format(bin_path, to_native(e)))
 
-    # Build Base Command
+
+def hdbsql_command(binary, params):
+    """Return the hdbsql command with the connection options, the statements are added by the caller."""
+    command = [binary]
+
     if params['encrypted']:
         # -e: Enforce encryption (don't fall back)
         # -ssltrustcert: Trust the server certificate
@@ -294,28 +1384,340 @@ def main():
     else:
         command.extend(['-x', '-i', params['instance'], '-u', params['user'], '-p', params['password']])
 
-    # Process Queries
-    if params['query']:
+    return command
+
+
+def execute(module, params, engine, command, sink, writer, statistics=None):
+    """
+    Execute the queries and files of params on one database and return the results for query_result.
+
+    The rows are passed to writer instead, if set. Errors are raised as HdbsqlError.
+    With statistics, a dict with the duration and row count of every query and file is appended to it.
+    """
+    output = []
+    csv_to_result = csv_to_columns if params['result_format'] == 'columnar' else csv_to_list
+    # The output of hdbsql is read while it is running if it is written to a file or limited,
+    # else it is parsed after hdbsql has finished.
+    stream = writer is not None or sink.limited
+
+    def record(statement, start, rows):
+        if statistics is not None:
+            statistics.append(dict(statement=statement, seconds=round(time.time() - start, 3) if start else None, rows=rows))
+
+    if engine == 'hdbcli' and params['query']:
+        try:
+            conn = hdbcli_connect(params)
+        except Exception as e:
+            raise HdbsqlError(error_message(e) or "SAP HANA Connection Failed: {0}".format(to_native(e)))
+        try:
+            run_hdbcli_queries(conn, params['query'], params['fetch_size'], sink, statistics)
+        except Exception as e:
+            raise HdbsqlError(error_message(e) or "SQL Execution Error", stderr=to_native(e))
+        finally:
+            conn.close()
+
+    # Process Queries, unless already executed with hdbcli
+    # The statements of a session are not timed one by one
+    if engine == 'hdbsql' and params['query'] and stream:
+        if params['session']:
+            run_hdb_session(module, command, params['query'], sink)
+            for q, rows in zip(params['query'], sink.row_counts):
+                record(q, None, rows)
+        else:
+            for q in params['query']:
+                start = time.time()
+                stream_hdb_command(module, command + [q], sink)
+                record(q, start, sink.row_counts[-1])
+
+    elif engine == 'hdbsql' and params['query'] and params['session']:
+        for q, out_raw in zip(params['query'], run_hdb_session(module, command, params['query'])):
+            try:
+                output.append(csv_to_result(out_raw))
+            except Exception as e:
+                raise HdbsqlError("Failed to parse CSV output: {0}".format(to_native(e)))
+            record(q, None, result_rows(output[-1]))
+
+    elif engine == 'hdbsql' and params['query']:
         for q in params['query']:
+            start = time.time()
             query_command = command + [q]
             out_raw = run_hdb_command(module, query_command)
             try:
-                output.append(csv_to_list(out_raw))
+                output.append(csv_to_result(out_raw))
             except Exception as e:
-                module.fail_json(msg="Failed to parse CSV output: {0}".format(to_native(e)))
+                raise HdbsqlError("Failed to parse CSV output: {0}".format(to_native(e)))
+            record(q, start, result_rows(output[-1]))
 
-    # Process Files
+    # The results of hdbcli and of the streamed queries are collected by sink
+    if writer is None and (engine == 'hdbcli' or stream):
+        output = sink.results
+
+    # Process Files, unless they are streamed with a progress file
     # Note: File processing adds extra arguments so it has to execute after query processing.
-    if params['filepath']:
+    if params['filepath'] and not params['progress_file']:
         for p in params['filepath']:
+            start = time.time()
             file_query_command = command + ['-E', '3', '-I', p]
+            if stream:
+                stream_hdb_command(module, file_query_command, sink)
+                record(p, start, sink.row_counts[-1])
+                continue
             out_raw = run_hdb_command(module, file_query_command)
             try:
-                output.append(csv_to_list(out_raw))
+                output.append(csv_to_result(out_raw))
             except Exception as e:
-                module.fail_json(msg="Failed to parse output from file {0}: {1}".format(p, to_native(e)))
+                raise HdbsqlError("Failed to parse output from file {0}: {1}".format(p, to_native(e)))
+            record(p, start, result_rows(output[-1]))
+
+    return output
+
+
+# The comments and whitespace in front of a statement.
+LEADING_COMMENTS = re.compile(r'^(?:\s+|--[^\n]*(?:\n|$)|/\*.*?\*/)*', re.DOTALL)
+
+
+def is_select(query):
+    """Return True if query is a SELECT statement, which does not change anything."""
+    return LEADING_COMMENTS.sub('', query).upper().startswith("SELECT")
+
+
+# The parameters which can change the result of a query, besides the query and the engine.
+CACHE_KEY_PARAMS = ('sid', 'bin_path', 'instance', 'host', 'database', 'user', 'userstore', 'encrypted',
+                    'properties', 'autocommit', 'session', 'result_format')
+
+
+def query_cache_key(params, engine, query):
+    """
+    Return the key of the cached result of query with the connection and result options of params.
+
+    Only the whitespace around the query and a trailing semicolon are removed, the query itself,
+    including string literals, is compared as it is.
+    """
+    key = dict((name, params[name]) for name in CACHE_KEY_PARAMS)
+    key.update(engine=engine, query=query.strip().rstrip(';').rstrip())
+    return "hdbsql|" + json.dumps(key, sort_keys=True)
+
+
+def execute_cached(module, params, engine, command, cache, statistics=None):
+    """
+    Like execute for the queries of params, but return the results found in cache and only execute the others.
+
+    Returns the results for query_result and the number of results found in cache.
+    """
+    keys = [query_cache_key(params, engine, q) for q in params['query']]
+    output = [cache.get(key) for key in keys]
+    missing = [index for index, cached in enumerate(output) if cached is None]
+    query_statistics = [dict(statement=q, seconds=0.0, rows=result_rows(query_result), cached=True) if query_result is not None else None
+                        for q, query_result in zip(params['query'], output)]
+
+    if missing:
+        missing_params = dict(params, query=[params['query'][index] for index in missing])
+        missing_statistics = []
+        results = execute(module, missing_params, engine, command, ResultList(params['result_format']), None, missing_statistics)
+        for index, query_result, executed in zip(missing, results, missing_statistics):
+            output[index] = query_result
+            query_statistics[index] = dict(executed, cached=False)
+            cache.set(keys[index], query_result)
+
+    if statistics is not None:
+        statistics.extend(query_statistics)
+    return output, len(keys) - len(missing)
+
+
+def discover_databases(module, params, engine, binary):
+    """Return the names of all active databases, read from M_DATABASES of the system database."""
+    discover_params = dict(params, query=[DISCOVER_QUERY], filepath=None, session=False, result_format='rows',
+                           database=params['database'] or 'SYSTEMDB')
+    command = hdbsql_command(binary, discover_params) if binary else None
+    output = execute(module, discover_params, engine, command, ResultList(), None)
+    return [row['DATABASE_NAME'] for row in output[0]]
+
+
+def execute_databases(module, params, engine, binary, databases, cache):
+    """Execute the queries and files on all databases concurrently and return the outcome keyed by database."""
+
+    def run(database):
+        db_params = dict(params, database=database)
+        command = hdbsql_command(binary, db_params) if binary else None
+        statistics = [] if params['statistics'] else None
+        sink = ResultList(params['result_format'], params['max_rows'], params['max_bytes'])
+        try:
+            if cache is not None:
+                outcome = dict(query_result=execute_cached(module, db_params, engine, command, cache, statistics)[0], error='')
+            else:
+                outcome = dict(query_result=execute(module, db_params, engine, command, sink, None, statistics), error='')
+        except HdbsqlError as e:
+            outcome = dict(query_result=[], error=e.msg, stderr=to_native(e.kwargs.get('stderr', '')))
+        if sink.limited:
+            outcome.update(truncated=any(sink.truncated), total_rows=sink.total_rows)
+        if statistics is not None:
+            outcome['statement_statistics'] = statistics
+        return outcome
+
+    return dict(zip(databases, parallel_map(run, databases, params['max_workers'])))
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            sid=dict(type='str', required=False),
+            bin_path=dict(type='str', required=False),
+            instance=dict(type='str', required=True),
+            encrypted=dict(type='bool', default=False),
+            host=dict(type='str', required=False),
+            user=dict(type='str', default="SYSTEM"),
+            userstore=dict(type='bool', default=False),
+            password=dict(type='str', no_log=True),
+            database=dict(type='str', required=False),
+            databases=dict(type='list', elements='str', required=False),
+            discover_databases=dict(type='bool', default=False),
+            max_workers=dict(type='int', default=4),
+            query=dict(type='list', elements='str', required=False),
+            filepath=dict(type='list', elements='path', required=False),
+            load=dict(type='dict', required=False, options=dict(
+                src=dict(type='path', required=True),
+                table=dict(type='str', required=True),
+                format=dict(type='str', default='csv', choices=['csv', 'jsonl']),
+                batch_size=dict(type='int', default=1000),
+                commit_interval=dict(type='int', default=0),
+            )),
+            autocommit=dict(type='bool', default=True),
+            properties=dict(type='list', elements='str', required=False),
+            session=dict(type='bool', default=False),
+            engine=dict(type='str', default='hdbsql', choices=['auto', 'hdbcli', 'hdbsql']),
+            fetch_size=dict(type='int', default=1000),
+            result_format=dict(type='str', default='rows', choices=['rows', 'columnar']),
+            output_file=dict(type='path', required=False),
+            output_format=dict(type='str', default='jsonl', choices=['jsonl', 'csv']),
+            max_rows=dict(type='int', required=False),
+            max_bytes=dict(type='int', required=False),
+            progress_file=dict(type='path', required=False),
+            resume=dict(type='bool', default=False),
+            statement_separator=dict(type='str', default=';'),
+            statistics=dict(type='bool', default=False),
+            cache=dict(type='bool', default=False),
+            cache_dir=dict(type='path', default='~/.cache/community.sap_libs'),
+            cache_ttl=dict(type='int', default=300),
+            cache_max_entries=dict(type='int', default=200),
+        ),
+        required_one_of=[('query', 'filepath', 'load')],
+        required_if=[('userstore', False, ['password'])],
+        mutually_exclusive=[('database', 'databases'), ('databases', 'discover_databases'),
+                            ('output_file', 'databases'), ('output_file', 'discover_databases'),
+                            ('load', 'query'), ('load', 'filepath'), ('load', 'databases'), ('load', 'discover_databases'),
+                            ('load', 'output_file'), ('progress_file', 'databases'), ('progress_file', 'discover_databases')],
+        required_by={'progress_file': 'filepath'},
+        supports_check_mode=False,
+    )
+
+    params = module.params
+    has_changed = False
+
+    # Determine if module will show as changed.
+    # If filepaths are provided, we assume changes will be made, as files typically contain DDL or DML statements.
+    # If only queries are provided, we check if any of them are not SELECT statements. If at least one is not a SELECT, we assume changes will be made.
+    # With a progress file, the statements actually executed decide, so resuming a completed file is not a change.
+    if (params['filepath'] and not params['progress_file']) or params['load']:
+        has_changed = True
+
+    elif params['query']:
+        for q in params['query']:
+            if not is_select(q):
+                has_changed = True
+                break
+
+    engine = params['engine']
+    if engine == 'auto':
+        engine = 'hdbcli' if HAS_HDBCLI_LIBRARY else 'hdbsql'
+    if engine == 'hdbcli' and not HAS_HDBCLI_LIBRARY:
+        module.fail_json(msg=missing_required_lib('hdbcli'), exception=HDBCLI_LIBRARY_IMPORT_ERROR)
+    if params['fetch_size'] < 1:
+        module.fail_json(msg="'fetch_size' must be greater than 0")
+    if params['max_rows'] is not None and params['max_rows'] < 0:
+        module.fail_json(msg="'max_rows' must not be negative")
+    if params['max_bytes'] is not None and params['max_bytes'] < 0:
+        module.fail_json(msg="'max_bytes' must not be negative")
+    if params['resume'] and not params['progress_file']:
+        module.fail_json(msg="'resume' requires 'progress_file'")
+    if not params['statement_separator'].strip():
+        module.fail_json(msg="'statement_separator' must not be empty")
+    if params['max_workers'] < 1:
+        module.fail_json(msg="'max_workers' must be greater than 0")
+    if params['load'] and params['load']['batch_size'] < 1:
+        module.fail_json(msg="'load.batch_size' must be greater than 0")
+
+    # Only the results of read-only queries are cached
+    cache = None
+    if (params['cache'] and params['query'] and not has_changed and not params['filepath'] and not params['output_file']
+            and params['max_rows'] is None and params['max_bytes'] is None):
+        cache = LocalCache(params['cache_dir'], "hdbsql", params['cache_ttl'], params['cache_max_entries'])
+
+    # hdbsql is needed for all statements, or only for the files with hdbcli
+    binary = None
+    if engine == 'hdbsql' or params['filepath']:
+        binary = hdbsql_binary(module, params)
+
+    if params['load']:
+        try:
+            load_result = load_file(module, params, engine, hdbsql_command(binary, dict(params, autocommit=False)) if binary else None)
+        except HdbsqlError as e:
+            module.fail_json(msg=e.msg, **e.kwargs)
+        module.exit_json(changed=load_result['rows'] > 0, query_result=[], load_result=load_result, engine=engine)
+
+    if params['databases'] or params['discover_databases']:
+        databases = params['databases']
+        if not databases:
+            try:
+                databases = discover_databases(module, params, engine, binary)
+            except HdbsqlError as e:
+                module.fail_json(msg="Failed to discover the databases: {0}".format(e.msg), **e.kwargs)
+
+        database_results = execute_databases(module, params, engine, binary, databases, cache)
+        result = dict(changed=has_changed, query_result=[], database_results=database_results, engine=engine)
+        failed = [database for database, outcome in database_results.items() if outcome['error']]
+        if failed:
+            module.fail_json(msg="Execution has failed on {0}. See database_results for more details.".format(
+                ", ".join(failed)), **result)
+        module.exit_json(**result)
+
+    # The rows are either collected for query_result or written to output_file
+    writer = None
+    if params['output_file']:
+        try:
+            writer = ResultWriter(params['output_file'], params['output_format'], params['max_rows'])
+        except (IOError, OSError) as e:
+            module.fail_json(msg="Failed to open output file {0}: {1}".format(params['output_file'], to_native(e)))
+
+    command = hdbsql_command(binary, params) if binary else None
+    cache_hits = None
+    statistics = [] if params['statistics'] else None
+    sink = writer or ResultList(params['result_format'], params['max_rows'], params['max_bytes'])
+    try:
+        if cache is not None:
+            output, cache_hits = execute_cached(module, params, engine, command, cache, statistics)
+        else:
+            output = execute(module, params, engine, command, sink, writer, statistics)
+        if params['filepath'] and params['progress_file']:
+            progress = run_hdb_files(module, command, params['filepath'], params['statement_separator'],
+                                     params['progress_file'], params['resume'])
+    except HdbsqlError as e:
+        if statistics is not None:
+            e.kwargs['statement_statistics'] = statistics
+        module.fail_json(msg=e.msg, **e.kwargs)
 
-    module.exit_json(changed=has_changed, query_result=output)
+    result = dict(changed=has_changed, query_result=output, engine=engine)
+    if statistics is not None:
+        result['statement_statistics'] = statistics
+    if cache_hits is not None:
+        result['cache_hits'] = cache_hits
+    if writer is None and sink.limited:
+        result.update(truncated=any(sink.truncated), total_rows=sink.total_rows)
+    if params['filepath'] and params['progress_file']:
+        result.update(progress=progress, changed=has_changed or any(file_progress['changed'] for file_progress in progress))
+    if writer is not None:
+        writer.close()
+        result.update(row_count=writer.row_counts, output_file=writer.path)
+    module.exit_json(**result)
 
 
 if __name__ == '__main__':
@@ -40,6 +40,8 @@ options:
         description:
             - The port number of the sapstartsrv (usually 1128 and 1129).
             - If provided, the module will use always use http connection instead of local socket.
+            - If not provided and no local socket is used, the ports 1129 and 1128 are probed at the
+              same time and the one answering first is used.
         required: false
         type: int
     username:
@@ -116,6 +118,43 @@ options:
         required: false
         default: false
         type: bool
+    cache:
+        description:
+            - Keep the parsed WSDL of the sapstartsrv in a local cache on the managed node and reuse it in
+              subsequent tasks instead of downloading and parsing it for every task.
+            - Cache entries are kept per hostname, port (or local socket) and service.
+            - A cached WSDL which does not contain I(function) is discarded and fetched again.
+            - If no I(port) is given, the port found to work is remembered per hostname as well,
+              so subsequent tasks do not need to probe the candidate ports again.
+        required: false
+        default: false
+        type: bool
+        version_added: "1.8.0"
+    cache_dir:
+        description:
+            - The directory of the local cache on the managed node.
+        required: false
+        default: ~/.cache/community.sap_libs
+        type: path
+        version_added: "1.8.0"
+    cache_ttl:
+        description:
+            - The number of seconds a cached WSDL or port is used before it is determined again.
+            - C(0) keeps cached entries until they are discarded.
+        required: false
+        default: 86400
+        type: int
+        version_added: "1.8.0"
+    wsdl_path:
+        description:
+            - Path to a local copy of the SAPHostControl WSDL on the managed node.
+            - The client is created from this file, so the WSDL is neither downloaded from nor parsed for the sapstartsrv.
+              Together with I(cache), also the parse of the local file is done only once.
+            - If I(function) is not part of the local WSDL, for example because a newer kernel added it,
+              the WSDL of the sapstartsrv is used instead.
+        required: false
+        type: path
+        version_added: "1.8.0"
 author:
     - Rainer Leber (@RainerLeber)
     - Robert Kraemer (@rkpobe)
@@ -132,6 +171,14 @@ EXAMPLES = r"""
     function: ListDatabases
     port: 1128
 
+- name: ListDatabases reusing the cached WSDL of previous tasks
+  community.sap_libs.sap_hostctrl_exec:
+    hostname: 192.168.8.15
+    function: ListDatabases
+    port: 1128
+    cache: true
+    cache_ttl: 3600
+
 - name: ListInstances using local Unix socket (requires become)
   community.sap_libs.sap_hostctrl_exec:
     function: ListInstances
@@ -257,13 +304,25 @@ out:
                     "mSystemNumber": "00"
                 }]
             }]
+connection_stats:
+    description:
+        - The HTTP connections to the SAP Host Agent of this task, C(connections) opened, C(requests) sent
+          and C(reused) requests sent over a connection kept open by a previous request.
+    type: dict
+    returned: when the function was executed
+    sample: {"connections": 1, "requests": 4, "reused": 3}
 '''
 
 from ansible.module_utils.basic import AnsibleModule, missing_required_lib
 
+from ..module_utils.local_cache import LocalCache
 from ..module_utils.sapstartsrv_client import (
     HAS_SUDS_LIBRARY,
     SUDS_LIBRARY_IMPORT_ERROR,
+    DEFAULT_CACHE_DIR,
+    DEFAULT_CACHE_TTL,
+    call_first_endpoint,
+    connection_stats,
     recursive_dict,
     call_sap_hostctrl as connection,
     is_read_only_function,
@@ -292,6 +351,10 @@ def main():
             function=dict(type='str', required=True, choices=choices()),
             parameters=dict(type='dict', required=False),
             force=dict(type='bool', default=False),
+            cache=dict(type='bool', default=False),
+            cache_dir=dict(type='path', default=DEFAULT_CACHE_DIR),
+            cache_ttl=dict(type='int', default=DEFAULT_CACHE_TTL),
+            wsdl_path=dict(type='path', required=False),
         ),
         supports_check_mode=False,
     )
@@ -305,6 +368,11 @@ def main():
     function = params['function']
     parameters = params['parameters']
     force = params['force']
+    client_options = dict(
+        cache_dir=params['cache_dir'] if params['cache'] else None,
+        cache_ttl=params['cache_ttl'],
+        wsdl_path=params['wsdl_path'],
+    )
 
     if not HAS_SUDS_LIBRARY:
         module.fail_json(
@@ -328,27 +396,31 @@ def main():
                 result['connection_type'] = 'socket'
                 result['connection_url'] = "http://localhost/SAPHostControl/?wsdl"
 
-                result_conn = connection(hostname, None, username, password, function, parameters, is_socket=True)
+                result_conn = connection(hostname, None, username, password, function, parameters, is_socket=True, **client_options)
             else:
                 result['connection_type'] = 'soap'
 
-                # Try HTTPS and HTTP ports
-                try:
-                    result['connection_url'] = 'http://{0}:1129/SAPHostControl/?wsdl'.format(hostname)
-                    result_conn = connection(hostname, "1129", username, password, function, parameters)
-                except Exception:
-                    result['connection_url'] = 'http://{0}:1128/SAPHostControl/?wsdl'.format(hostname)
-                    result_conn = connection(hostname, "1128", username, password, function, parameters)
+                def call_port(port):
+                    result['connection_url'] = 'http://{0}:{1}/SAPHostControl/?wsdl'.format(hostname, port)
+                    return connection(hostname, port, username, password, function, parameters, **client_options)
+
+                # Try HTTPS and HTTP ports, the one answering first (or the one that worked last time) is used first
+                endpoint_cache = None
+                if client_options['cache_dir'] is not None:
+                    endpoint_cache = LocalCache(client_options['cache_dir'], "endpoints", client_options['cache_ttl'])
+                cache_key = "SAPHostControl|{0}".format(hostname)
+                dummy, result_conn = call_first_endpoint(call_port, hostname, ["1129", "1128"], endpoint_cache, cache_key)
         except Exception as err:
             result['error'] = str(err)
     else:
         result['connection_type'] = 'soap'
         result['connection_url'] = 'http://{0}:{1}/SAPHostControl/?wsdl'.format(hostname, port)
         try:
-            result_conn = connection(hostname, port, username, password, function, parameters, is_socket=False)
+            result_conn = connection(hostname, port, username, password, function, parameters, is_socket=False, **client_options)
         except Exception as err:
             result['error'] = str(err)
 
+    result['connection_stats'] = connection_stats()
     if result['error'] != '':
         result['msg'] = 'Function execution has failed. See error for more details.'
         module.fail_json(**result)
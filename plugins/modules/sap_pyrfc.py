@@ -115,7 +115,7 @@ result:
 
 import traceback
 from ansible.module_utils.basic import AnsibleModule, missing_required_lib
-from ..module_utils.pyrfc_handler import get_connection
+from ..module_utils.pyrfc_handler import ConnectionPool, get_connection
 
 try:
     from pyrfc import ABAPApplicationError, ABAPRuntimeError, CommunicationError, LogonError
@@ -126,6 +126,9 @@ else:
     PYRFC_LIBRARY_IMPORT_ERROR = None
     HAS_PYRFC_LIBRARY = True
 
+# The RFC connections of the task, closed when the module ends.
+RFC_POOL = ConnectionPool()
+
 
 def main():
     msg = None
@@ -166,7 +169,7 @@ def main():
         module.exit_json(msg=msg, changed=True)
 
     try:
-        conn = get_connection(module, conn_params)
+        conn = get_connection(module, conn_params, RFC_POOL)
         result = conn.call(function, **func_params)
         error_msg = None
     except CommunicationError as err:
@@ -183,6 +186,8 @@ def main():
         error_msg = err
     else:
         module.exit_json(changed=True, result=result)
+    finally:
+        RFC_POOL.close()
 
     if msg:
         module.fail_json(msg=msg, exception=error_msg)
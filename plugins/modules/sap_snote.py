@@ -86,6 +86,28 @@ options:
         - Upload SNOTES to the System is only available if C(snote_path) is provided.
         required: false
         type: str
+    cache:
+        description:
+        - Keep the numbers of the implemented SNOTES in a local cache on the managed node, so subsequent tasks on the same
+          host, system number and client do not read them from the SAP system again, until I(cache_ttl) has expired.
+        - The cache is renewed whenever a SNOTE is implemented or deimplemented by this module.
+        - SNOTES implemented or deimplemented outside of this module are only noticed after I(cache_ttl).
+        type: bool
+        default: false
+        version_added: "1.8.0"
+    cache_dir:
+        description:
+        - The directory of the local cache on the managed node.
+        type: path
+        default: ~/.cache/community.sap_libs
+        version_added: "1.8.0"
+    cache_ttl:
+        description:
+        - The number of seconds the cached SNOTES are used before they are read from the SAP system again.
+        - C(0) keeps them until a SNOTE is implemented or deimplemented by this module.
+        type: int
+        default: 300
+        version_added: "1.8.0"
 
 requirements:
     - pyrfc >= 2.4.0
@@ -121,6 +143,19 @@ EXAMPLES = r'''
       state: absent
       snote: 0002949148
 
+- name: implement several SNOTES, reading the implemented SNOTES only once
+  community.sap_libs.sap_snote:
+    conn_username: 'DDIC'
+    conn_password: 'Passwd1234'
+    host: 192.168.1.100
+    sysnr: '01'
+    client: '000'
+    snote_path: "{{ item }}"
+    cache: true
+  loop:
+    - /usr/sap/trans/tmp/0002949148.txt
+    - /usr/sap/trans/tmp/0002980265.txt
+
 '''
 
 RETURN = r'''
@@ -145,6 +180,8 @@ out:
 '''
 
 from ansible.module_utils.basic import AnsibleModule, missing_required_lib
+from ..module_utils.local_cache import LocalCache
+from ..module_utils.pyrfc_handler import ConnectionPool
 from os import path as os_path
 import traceback
 try:
@@ -156,18 +193,59 @@ else:
     ANOTHER_LIBRARY_IMPORT_ERROR = None
     HAS_PYRFC_LIBRARY = True
 
+# The RFC connections of the task, closed when the module ends.
+RFC_POOL = ConnectionPool()
+
 
 def call_rfc_method(connection, method_name, kwargs):
     # PyRFC call function
     return connection.call(method_name, **kwargs)
 
 
-def check_implementation(conn, snote):
-    check_implemented = call_rfc_method(conn, 'SCWB_API_GET_NOTES_IMPLEMENTED', {})
-    for snote_list in check_implemented['ET_NOTES_IMPL']:
-        if snote in snote_list['NUMM']:
-            return True
-    return False
+def note_number(snote):
+    """Return the SNOTE number without leading zeros, to compare 2949148 with 0002949148."""
+    return str(snote).strip().lstrip('0')
+
+
+class ImplementedNotes(object):
+    """
+    The numbers of the SNOTES implemented in the SAP system.
+
+    They are read once with SCWB_API_GET_NOTES_IMPLEMENTED, or taken from cache
+    under key, and read again after invalidate().
+    """
+
+    def __init__(self, conn, cache=None, key=None):
+        self.conn = conn
+        self.cache = cache
+        self.key = key
+        self._numbers = None
+
+    def numbers(self):
+        if self._numbers is None:
+            cached = self.cache.get(self.key) if self.cache is not None else None
+            if cached is None:
+                implemented = call_rfc_method(self.conn, 'SCWB_API_GET_NOTES_IMPLEMENTED', {})
+                cached = [note_number(snote['NUMM']) for snote in implemented['ET_NOTES_IMPL']]
+                if self.cache is not None:
+                    self.cache.set(self.key, cached)
+            self._numbers = set(cached)
+        return self._numbers
+
+    def invalidate(self):
+        """Forget the numbers, after a SNOTE was implemented or deimplemented."""
+        self._numbers = None
+        if self.cache is not None:
+            self.cache.delete(self.key)
+
+    def __contains__(self, snote):
+        return note_number(snote) in self.numbers()
+
+
+def check_implementation(conn, snote, notes=None):
+    if notes is None:
+        notes = ImplementedNotes(conn)
+    return snote in notes
 
 
 def run_module():
@@ -181,6 +259,9 @@ def run_module():
             client=dict(type='str', default="000"),
             snote_path=dict(type='str', required=False),
             snote=dict(type='str', required=False),
+            cache=dict(type='bool', default=False),
+            cache_dir=dict(type='path', default='~/.cache/community.sap_libs'),
+            cache_ttl=dict(type='int', default=300),
         ),
         required_one_of=[('snote_path', 'snote')],
         supports_check_mode=False,
@@ -212,7 +293,7 @@ def run_module():
 
     # basic RFC connection with pyrfc
     try:
-        conn = Connection(user=conn_username, passwd=conn_password, ashost=host, sysnr=sysnr, client=client)
+        conn = RFC_POOL.acquire(dict(user=conn_username, passwd=conn_password, ashost=host, sysnr=sysnr, client=client), Connection)
     except Exception as err:
         result['error'] = str(err)
         result['msg'] = 'Something went wrong connecting to the SAP system.'
@@ -227,9 +308,15 @@ def run_module():
             result['msg'] = 'The path must include the extracted snote file and ends with txt.'
             module.fail_json(**result)
 
-    pre_check = check_implementation(conn, snote)
+    cache = None
+    if params['cache']:
+        cache = LocalCache(params['cache_dir'], "snote", params['cache_ttl'])
+    notes = ImplementedNotes(conn, cache, '{0}/{1}/{2}'.format(host, sysnr, client))
+
+    pre_check = check_implementation(conn, snote, notes)
 
     if state == "absent" and pre_check:
+        notes.invalidate()
         raw = call_rfc_method(conn, 'SCWB_API_NOTES_DEIMPLEMENT', {'IT_NOTES': [snote]})
 
     if state == "present" and not pre_check:
@@ -240,6 +327,7 @@ def run_module():
                 result['msg'] = raw_upload['ES_MSG']['MSGTXT']
                 module.fail_json(**result)
 
+        notes.invalidate()
         raw = call_rfc_method(conn, 'SCWB_API_NOTES_IMPLEMENT', {'IT_NOTES': [snote]})
         queued = call_rfc_method(conn, 'SCWB_API_CINST_QUEUE_GET', {})
 
@@ -248,7 +336,7 @@ def run_module():
 
     if raw:
         if raw['EV_RC'] == 0:
-            post_check = check_implementation(conn, snote)
+            post_check = check_implementation(conn, snote, notes)
             if post_check and state == "present":
                 result['changed'] = True
                 result['msg'] = 'SNOTE "{0}" implemented.'.format(snote)
@@ -266,7 +354,10 @@ def run_module():
 
 
 def main():
-    run_module()
+    try:
+        run_module()
+    finally:
+        RFC_POOL.close()
 
 
 if __name__ == '__main__':
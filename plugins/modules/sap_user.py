@@ -83,8 +83,9 @@ options:
     username:
         description:
           - The username.
+          - Either I(username) or I(users) is required.
         type: str
-        required: true
+        required: false
     firstname:
         description:
           - The Firstname of the user in the SAP system.
@@ -137,10 +138,70 @@ options:
     roles:
         description:
           - Assign roles to the user.
+          - The roles and profiles are only assigned if they differ from the roles valid today and the profiles
+            the user has already, which replaces all assignments of the user.
         type: list
         elements: str
         default: ['']
         required: false
+    users:
+        description:
+          - Manage several users in one task, with one logon to the SAP system for all of them.
+          - Every entry takes the options of a single user, the options not given for an entry are taken
+            from the options of the module, so common values like I(company) or I(roles) can be given once.
+          - The result of every user is returned in I(users), the task fails if one of the users failed,
+            after all other users have been processed.
+        type: list
+        elements: dict
+        required: false
+        version_added: "1.8.0"
+        suboptions:
+            state:
+                description: The decision what to do with the user, see I(state).
+                type: str
+                choices: ['present', 'absent', 'lock', 'unlock']
+            username:
+                description: The username.
+                type: str
+                required: true
+            firstname:
+                description: The Firstname of the user in the SAP system.
+                type: str
+            lastname:
+                description: The lastname of the user in the SAP system.
+                type: str
+            email:
+                description: The email address of the user in the SAP system.
+                type: str
+            password:
+                description: The password for the user in the SAP system.
+                type: str
+            useralias:
+                description: The alias for the user in the SAP system.
+                type: str
+            user_type:
+                description: The type for the user in the SAP system, see I(user_type).
+                type: str
+                choices: ['A', 'B', 'C', 'S', 'L']
+            company:
+                description: The specific company the user belongs to.
+                type: str
+            profiles:
+                description: Assign profiles to the user.
+                type: list
+                elements: str
+            roles:
+                description: Assign roles to the user.
+                type: list
+                elements: str
+    max_connections:
+        description:
+          - The number of RFC connections the I(users) are processed with in parallel.
+          - Every connection is a logon and uses a dialog work process of the SAP system while users are processed.
+        type: int
+        default: 1
+        required: false
+        version_added: "1.8.0"
 
 requirements:
     - pyrfc >= 2.4.0
@@ -188,6 +249,32 @@ EXAMPLES = r'''
     roles:
       - "SAP_ALL"
 
+- name: Create several SAP Users over two RFC connections
+  community.sap_libs.sap_user:
+    conn_username: 'DDIC'
+    conn_password: 'Test123'
+    host: 192.168.1.150
+    sysnr: '01'
+    client: '000'
+    company: DEFAULT_COMPANY
+    roles:
+      - "Z_EMPLOYEE"
+    max_connections: 2
+    users:
+      - username: JDOE
+        firstname: John
+        lastname: Doe
+        useralias: JDOE
+        password: Test123456
+      - username: MMUSTER
+        firstname: Max
+        lastname: Muster
+        useralias: MMUSTER
+        password: Test123456
+        roles:
+          - "Z_EMPLOYEE"
+          - "Z_APPROVER"
+
 - name: Delete SAP User
   community.sap_libs.sap_user:
     conn_username: 'DDIC'
@@ -242,8 +329,19 @@ out:
             }
           ],
           "SAPUSER_UUID_HIST": []}]
+users:
+  description:
+    - The result of every user of I(users), in the same order.
+    - Every entry contains the C(username), C(state), whether it was C(changed) or C(failed),
+      the C(msg) and the C(out) of the last BAPI call for the user.
+  type: list
+  elements: dict
+  returned: when I(users) is used
+  sample: [{"username": "JDOE", "state": "present", "changed": true, "failed": false, "msg": "User JDOE created", "out": {}}]
 '''
 from ansible.module_utils.basic import AnsibleModule, missing_required_lib
+from ..module_utils.parallel import parallel_map
+from ..module_utils.pyrfc_handler import ConnectionPool
 import traceback
 import datetime
 try:
@@ -255,6 +353,9 @@ else:
     PYRFC_LIBRARY_IMPORT_ERROR = None
     HAS_PYRFC_LIBRARY = True
 
+# The RFC connections of the task, closed when the module ends.
+RFC_POOL = ConnectionPool()
+
 
 def add_to_dict(target_dict, target_key, value):
     # Adds the given value to a dict as the key
@@ -354,6 +455,28 @@ def user_profile_assignment_build_rfc_params(profiles, username):
     }
 
 
+def valid_to(row):
+    """Return the end of the validity of an assignment row of BAPI_USER_GET_DETAIL as date."""
+    to_dat = row.get('TO_DAT')
+    if isinstance(to_dat, datetime.date):
+        return to_dat
+    try:
+        return datetime.datetime.strptime(str(to_dat), '%Y%m%d').date()
+    except ValueError:
+        return datetime.date.max
+
+
+def assigned_roles(user_detail):
+    """Return the names of the roles assigned to the user and valid today."""
+    today = datetime.date.today()
+    return set(row['AGR_NAME'].upper() for row in user_detail.get('ACTIVITYGROUPS') or [] if valid_to(row) >= today)
+
+
+def assigned_profiles(user_detail):
+    """Return the names of the profiles assigned to the user."""
+    return set(row['BAPIPROF'].upper() for row in user_detail.get('PROFILES') or [])
+
+
 def check_user(user_detail):
     if len(user_detail['RETURN']) > 0:
         for sub in user_detail['RETURN']:
@@ -382,7 +505,100 @@ def return_analysis(raw):
     return [{"change": change}, {"failed": failed}]
 
 
+def manage_user(conn, user, force):
+    """Bring one user into its state and return the result of the last BAPI call, or '' if nothing was called."""
+    raw = ""
+    state = user['state']
+    username = (user['username']).upper()
+    useralias = user['useralias'].upper() if user['useralias'] is not None else None
+    user_type = (user['user_type']).upper()
+
+    # user details
+    user_detail = call_rfc_method(conn, 'BAPI_USER_GET_DETAIL', {'USERNAME': username})
+    user_exists = check_user(user_detail)
+
+    if state == "absent":
+        if user_exists:
+            raw = call_rfc_method(conn, 'BAPI_USER_DELETE', {'USERNAME': username})
+
+    if state == "present":
+        user_params = build_rfc_user_params(username, user['firstname'], user['lastname'], user['email'], user['password'],
+                                            useralias, user_type, user['company'], user_exists, force)
+        if not user_exists:
+            raw = call_rfc_method(conn, 'BAPI_USER_CREATE1', user_params)
+
+        if user_exists:
+            # check for address changes when user exists
+            user_no_changes = all((user_detail.get('ADDRESS')).get(k) == v for k, v in (user_params.get('ADDRESS')).items())
+            if not user_no_changes or force:
+                raw = call_rfc_method(conn, 'BAPI_USER_CHANGE', user_params)
+
+        # the assignments are only replaced if they differ, a new user has none
+        roles = set(role.upper() for role in user['roles'] if role)
+        if roles != (assigned_roles(user_detail) if user_exists else set()):
+            raw_assign = call_rfc_method(conn, 'BAPI_USER_ACTGROUPS_ASSIGN', user_role_assignment_build_rfc_params(user['roles'], username))
+            raw = raw or raw_assign
+
+        profiles = set(profile.upper() for profile in user['profiles'] if profile)
+        if profiles != (assigned_profiles(user_detail) if user_exists else set()):
+            raw_assign = call_rfc_method(conn, 'BAPI_USER_PROFILES_ASSIGN', user_profile_assignment_build_rfc_params(user['profiles'], username))
+            raw = raw or raw_assign
+
+    if state == "unlock":
+        if user_exists:
+            raw = call_rfc_method(conn, 'BAPI_USER_UNLOCK', {'USERNAME': username})
+
+    if state == "lock":
+        if user_exists:
+            raw = call_rfc_method(conn, 'BAPI_USER_LOCK', {'USERNAME': username})
+
+    return raw
+
+
+def user_report(raw):
+    """Analyse the result of manage_user() and return changed, failed, msg and out of the user."""
+    if raw == '':
+        return dict(changed=False, failed=False, msg="No changes where made.", out='')
+
+    analysed = return_analysis(raw)
+    return dict(changed=analysed[0]['change'], failed=analysed[1]['failed'],
+                msg='\n'.join(msgs['MESSAGE'] for msgs in raw['RETURN']), out=raw)
+
+
+def manage_users(conn_params, users, force, max_connections):
+    """Bring all users into their state over up to max_connections RFC connections and return a report per user."""
+
+    def provision(user):
+        report = dict(username=user['username'].upper(), state=user['state'])
+        conn = None
+        try:
+            # A failed logon, e.g. because of the logon limit, only fails this user
+            conn = RFC_POOL.acquire(conn_params, Connection)
+            report.update(user_report(manage_user(conn, user, force)))
+        except Exception as err:
+            report.update(changed=False, failed=True, msg=str(err), out='')
+        finally:
+            if conn is not None:
+                RFC_POOL.release(conn)
+        return report
+
+    return parallel_map(provision, users, max_connections)
+
+
 def run_module():
+    user_spec = dict(
+        state=dict(choices=['absent', 'present', 'lock', 'unlock']),
+        username=dict(type='str', required=True),
+        firstname=dict(type='str', required=False),
+        lastname=dict(type='str', required=False),
+        email=dict(type='str', required=False),
+        password=dict(type='str', required=False, no_log=True),
+        useralias=dict(type='str', required=False),
+        user_type=dict(choices=['A', 'B', 'C', 'S', 'L']),
+        company=dict(type='str', required=False),
+        profiles=dict(type='list', elements='str'),
+        roles=dict(type='list', elements='str'),
+    )
     module = AnsibleModule(
         argument_spec=dict(
             # logical values
@@ -396,7 +612,7 @@ def run_module():
             sysnr=dict(type='str', default="00"),
             client=dict(type='str', default="000"),
             # values for the new or existing user
-            username=dict(type='str', required=True),
+            username=dict(type='str', required=False),
             firstname=dict(type='str', required=False),
             lastname=dict(type='str', required=False),
             email=dict(type='str', required=False),
@@ -410,36 +626,34 @@ def run_module():
             profiles=dict(type='list', elements='str', default=[""]),
             # values for roles must a list
             roles=dict(type='list', elements='str', default=[""]),
+            # several users at once, the values above are their defaults
+            users=dict(type='list', elements='dict', options=user_spec),
+            max_connections=dict(type='int', default=1),
         ),
         supports_check_mode=False,
-        required_if=[('state', 'present', ['useralias', 'company'])]
+        required_one_of=[('username', 'users')],
+        mutually_exclusive=[('username', 'users')],
     )
     result = dict(changed=False, msg='', out='')
-    count = 0
-    raw = ""
 
     params = module.params
 
-    state = params['state']
-    conn_username = (params['conn_username']).upper()
-    conn_password = params['conn_password']
-    host = params['host']
-    sysnr = params['sysnr']
-    client = params['client']
-
-    username = (params['username']).upper()
-    firstname = params['firstname']
-    lastname = params['lastname']
-    email = params['email']
-    password = params['password']
+    conn_params = dict(user=(params['conn_username']).upper(), passwd=params['conn_password'],
+                       ashost=params['host'], sysnr=params['sysnr'], client=params['client'])
     force = params['force']
-    if not params['useralias'] is None:
-        useralias = (params['useralias']).upper()
-    user_type = (params['user_type']).upper()
-    company = params['company']
 
-    profiles = params['profiles']
-    roles = params['roles']
+    # every user takes the values not given for it from the module parameters
+    defaults = dict((key, params[key]) for key in user_spec)
+    users = [dict((key, user[key] if user[key] is not None else defaults[key]) for key in user_spec)
+             for user in params['users'] or [defaults]]
+    for user in users:
+        missing = [key for key in ('useralias', 'company') if user['state'] == 'present' and user[key] is None]
+        if missing:
+            module.fail_json(msg="state is present but all of the following are missing for user {0}: {1}".format(
+                user['username'], ', '.join(missing)))
+
+    if params['max_connections'] < 1:
+        module.fail_json(msg="'max_connections' must be greater than 0")
 
     if not HAS_PYRFC_LIBRARY:
         module.fail_json(
@@ -448,66 +662,37 @@ def run_module():
 
     # basic RFC connection with pyrfc
     try:
-        conn = Connection(user=conn_username, passwd=conn_password, ashost=host, sysnr=sysnr, client=client)
+        conn = RFC_POOL.acquire(conn_params, Connection)
     except Exception as err:
         result['error'] = str(err)
         result['msg'] = 'Something went wrong connecting to the SAP system.'
         module.fail_json(**result)
 
-    # user details
-    user_detail = call_rfc_method(conn, 'BAPI_USER_GET_DETAIL', {'USERNAME': username})
-    user_exists = check_user(user_detail)
-
-    if state == "absent":
-        if user_exists:
-            raw = call_rfc_method(conn, 'BAPI_USER_DELETE', {'USERNAME': username})
-
-    if state == "present":
-        user_params = build_rfc_user_params(username, firstname, lastname, email, password, useralias, user_type, company, user_exists, force)
-        if not user_exists:
-            raw = call_rfc_method(conn, 'BAPI_USER_CREATE1', user_params)
-
-        if user_exists:
-            # check for address changes when user exists
-            user_no_changes = all((user_detail.get('ADDRESS')).get(k) == v for k, v in (user_params.get('ADDRESS')).items())
-            if not user_no_changes or force:
-                raw = call_rfc_method(conn, 'BAPI_USER_CHANGE', user_params)
-
-        call_rfc_method(conn, 'BAPI_USER_ACTGROUPS_ASSIGN', user_role_assignment_build_rfc_params(roles, username))
-
-        call_rfc_method(conn, 'BAPI_USER_PROFILES_ASSIGN', user_profile_assignment_build_rfc_params(profiles, username))
-
-    if state == "unlock":
-        if user_exists:
-            raw = call_rfc_method(conn, 'BAPI_USER_UNLOCK', {'USERNAME': username})
-
-    if state == "lock":
-        if user_exists:
-            raw = call_rfc_method(conn, 'BAPI_USER_LOCK', {'USERNAME': username})
+    if params['users']:
+        RFC_POOL.release(conn)
+        reports = manage_users(conn_params, users, force, params['max_connections'])
+        failed = [report['username'] for report in reports if report['failed']]
+        result.update(changed=any(report['changed'] for report in reports), users=reports,
+                      msg="{0} of {1} users changed.".format(len([report for report in reports if report['changed']]), len(reports)))
+        if failed:
+            result['msg'] = "Failed for users: {0}".format(", ".join(failed))
+            module.fail_json(**result)
+        module.exit_json(**result)
 
     # analyse return value
-    if raw != '':
-        analysed = return_analysis(raw)
-
-        result['out'] = raw
-
-        result['changed'] = analysed[0]['change']
-        for msgs in raw['RETURN']:
-            if count > 0:
-                result['msg'] = result['msg'] + '\n'
-            result['msg'] = result['msg'] + msgs['MESSAGE']
-            count = count + 1
-
-        if analysed[1]['failed']:
-            module.fail_json(**result)
-    else:
-        result['msg'] = "No changes where made."
+    report = user_report(manage_user(conn, users[0], force))
+    result.update(changed=report['changed'], msg=report['msg'], out=report['out'])
+    if report['failed']:
+        module.fail_json(**result)
 
     module.exit_json(**result)
 
 
 def main():
-    run_module()
+    try:
+        run_module()
+    finally:
+        RFC_POOL.close()
 
 
 if __name__ == '__main__':
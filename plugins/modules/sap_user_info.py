@@ -0,0 +1,363 @@
+#!/usr/bin/python
+
+# Copyright (c) 2022-2026 The Project Contributors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# For a detailed list of copyright holders and contribution history,
+# please refer to the CONTRIBUTORS.md file in the project root.
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: sap_user_info
+short_description: This module reads all users of a client of a SAP S4/HANA environment
+version_added: "1.8.0"
+description:
+  - The M(community.sap_libs.sap_user_info) module depends on C(pyrfc) Python library (version 2.4.0 and upwards).
+    Depending on distribution you are using, you may need to install additional packages to
+    have these available.
+  - This module reads the users of the client with their address, lock state, roles and profiles at once,
+    for example to compare them with the users to be managed with M(community.sap_libs.sap_user).
+  - With I(method=detail), it uses the following user BAPIs.
+    - C(BAPI_USER_GETLIST)
+    - C(BAPI_USER_GET_DETAIL)
+  - With I(method=table), it reads the tables C(USR02), C(AGR_USERS), C(UST04) and, for the addresses,
+    C(USR21), C(ADRP) and C(ADR6) with C(RFC_READ_TABLE).
+options:
+    conn_username:
+        description: The required username for the SAP system.
+        required: true
+        type: str
+    conn_password:
+        description: The required password for the SAP system.
+        required: true
+        type: str
+    host:
+        description: The required host for the SAP system. Can be either an FQDN or IP Address.
+        required: true
+        type: str
+    sysnr:
+        description:
+          - The system number of the SAP system.
+          - You must quote the value to ensure retaining the leading zeros.
+        default: '00'
+        type: str
+    client:
+        description:
+          - The client number to connect to.
+          - You must quote the value to ensure retaining the leading zeros.
+        default: '000'
+        type: str
+    usernames:
+        description:
+          - Only return the users matching one of these names. Shell-style wildcards like C(Z*) can be used.
+          - All users of the client are returned if not given.
+        type: list
+        elements: str
+        required: false
+    method:
+        description:
+          - How the users are read.
+          - C(detail) lists the users with C(BAPI_USER_GETLIST) and reads every user with C(BAPI_USER_GET_DETAIL),
+            spread over I(max_connections) RFC connections.
+          - C(table) reads all users with one C(RFC_READ_TABLE) call per table and 10000 rows, which is much faster
+            for many users, but requires the authorization to display these tables.
+        type: str
+        default: detail
+        choices: ['detail', 'table']
+    addresses:
+        description:
+          - Read the first name, last name and email address of the users.
+          - With I(method=table), the address tables contain the addresses of all persons of the client,
+            not only of the users, so reading them can take long.
+        type: bool
+        default: true
+    max_connections:
+        description:
+          - The number of RFC connections the users are read with in parallel with I(method=detail).
+        type: int
+        default: 1
+
+requirements:
+    - pyrfc >= 2.4.0
+author:
+    - Rainer Leber (@rainerleber)
+notes:
+    - Supports C(check_mode), nothing is changed in the SAP system.
+'''
+
+EXAMPLES = r'''
+- name: Read all users of the client
+  community.sap_libs.sap_user_info:
+    conn_username: 'DDIC'
+    conn_password: 'Test123'
+    host: 192.168.1.150
+    sysnr: '01'
+    client: '100'
+    method: table
+  register: sap_users
+
+- name: Lock the users which are not in the list of employees
+  community.sap_libs.sap_user:
+    conn_username: 'DDIC'
+    conn_password: 'Test123'
+    host: 192.168.1.150
+    sysnr: '01'
+    client: '100'
+    state: lock
+    users: "{{ sap_users.users | dict2items | rejectattr('key', 'in', employees) | rejectattr('value.locked')
+               | map(attribute='key') | map('community.general.dict_kv', 'username') }}"
+
+- name: Read the users starting with Z over four RFC connections
+  community.sap_libs.sap_user_info:
+    conn_username: 'DDIC'
+    conn_password: 'Test123'
+    host: 192.168.1.150
+    sysnr: '01'
+    client: '100'
+    usernames:
+      - "Z*"
+    max_connections: 4
+'''
+
+RETURN = r'''
+users:
+  description:
+    - The users keyed by username.
+    - C(valid_from) and C(valid_to) are in the format C(YYYY-MM-DD), or C(null) if not set.
+    - C(roles) are the roles valid today, C(profiles) the profiles assigned to the user.
+    - C(firstname), C(lastname) and C(email) are only returned with I(addresses=true).
+  type: dict
+  returned: on success
+  sample: {"ADMIN": {"user_type": "A", "locked": false, "valid_from": "2024-01-24", "valid_to": "2099-12-31",
+                     "firstname": "first_admin", "lastname": "last_admin", "email": "admin@test.de",
+                     "roles": ["SAP_BC_BASIS_ADMIN"], "profiles": ["SAP_ALL"]}}
+msg:
+  description: A small execution description.
+  type: str
+  returned: always
+  sample: '42 users read.'
+'''
+
+from ansible.module_utils.basic import AnsibleModule, missing_required_lib
+from ..module_utils.parallel import parallel_map
+from ..module_utils.pyrfc_handler import ConnectionPool
+from fnmatch import fnmatchcase
+import datetime
+import traceback
+try:
+    from pyrfc import Connection
+except ImportError:
+    HAS_PYRFC_LIBRARY = False
+    PYRFC_LIBRARY_IMPORT_ERROR = traceback.format_exc()
+else:
+    PYRFC_LIBRARY_IMPORT_ERROR = None
+    HAS_PYRFC_LIBRARY = True
+
+# The RFC connections of the task, closed when the module ends.
+RFC_POOL = ConnectionPool()
+
+# The number of rows read with one RFC_READ_TABLE call.
+READ_TABLE_ROWS = 10000
+
+
+def call_rfc_method(connection, method_name, kwargs):
+    # PyRFC call function
+    return connection.call(method_name, **kwargs)
+
+
+def to_date(value):
+    """Return a date of RFC as date, or None if it is not set."""
+    if isinstance(value, datetime.date):
+        return value
+    try:
+        return datetime.datetime.strptime(str(value), '%Y%m%d').date()
+    except ValueError:
+        return None
+
+
+def iso_date(value):
+    date = to_date(value)
+    return date.isoformat() if date is not None else None
+
+
+def valid_roles(rows, name_field='AGR_NAME'):
+    """Return the sorted names of the role assignments valid today."""
+    today = datetime.date.today()
+    return sorted(set(row[name_field] for row in rows if (to_date(row.get('TO_DAT')) or datetime.date.max) >= today))
+
+
+def read_table(conn, table, fields):
+    """Read the fields of all rows of table with RFC_READ_TABLE, in chunks of READ_TABLE_ROWS rows."""
+    rows = []
+    skip = 0
+    while True:
+        raw = call_rfc_method(conn, 'RFC_READ_TABLE', {'QUERY_TABLE': table, 'FIELDS': [{'FIELDNAME': field} for field in fields],
+                                                       'ROWSKIPS': skip, 'ROWCOUNT': READ_TABLE_ROWS})
+        # The values are at the offsets of the fields in every line
+        positions = [(field['FIELDNAME'], int(field['OFFSET']), int(field['OFFSET']) + int(field['LENGTH'])) for field in raw['FIELDS']]
+        for line in raw['DATA']:
+            rows.append(dict((name, line['WA'][start:end].strip()) for name, start, end in positions))
+        if len(raw['DATA']) < READ_TABLE_ROWS:
+            return rows
+        skip += READ_TABLE_ROWS
+
+
+def group_by(rows, key):
+    grouped = {}
+    for row in rows:
+        grouped.setdefault(row[key], []).append(row)
+    return grouped
+
+
+def read_users_table(conn, addresses):
+    """Read all users of the client from the user tables."""
+    roles = group_by(read_table(conn, 'AGR_USERS', ['UNAME', 'AGR_NAME', 'TO_DAT']), 'UNAME')
+    profiles = group_by(read_table(conn, 'UST04', ['BNAME', 'PROFILE']), 'BNAME')
+    users = {}
+    for row in read_table(conn, 'USR02', ['BNAME', 'USTYP', 'UFLAG', 'GLTGV', 'GLTGB']):
+        users[row['BNAME']] = dict(
+            user_type=row['USTYP'],
+            # UFLAG is 0 if the user is not locked, else the reasons of the lock
+            locked=int(row['UFLAG'] or 0) != 0,
+            valid_from=iso_date(row['GLTGV']),
+            valid_to=iso_date(row['GLTGB']),
+            roles=valid_roles(roles.get(row['BNAME'], [])),
+            profiles=sorted(profile['PROFILE'] for profile in profiles.get(row['BNAME'], [])),
+        )
+
+    if addresses:
+        persons = dict((row['PERSNUMBER'], row) for row in read_table(conn, 'ADRP', ['PERSNUMBER', 'NAME_FIRST', 'NAME_LAST']))
+        emails = {}
+        for row in read_table(conn, 'ADR6', ['PERSNUMBER', 'SMTP_ADDR']):
+            emails.setdefault(row['PERSNUMBER'], row['SMTP_ADDR'])
+        for row in read_table(conn, 'USR21', ['BNAME', 'PERSNUMBER']):
+            if row['BNAME'] in users:
+                person = persons.get(row['PERSNUMBER'], {})
+                users[row['BNAME']].update(firstname=person.get('NAME_FIRST', ''), lastname=person.get('NAME_LAST', ''),
+                                           email=emails.get(row['PERSNUMBER'], ''))
+        for user in users.values():
+            user.setdefault('firstname', '')
+            user.setdefault('lastname', '')
+            user.setdefault('email', '')
+    return users
+
+
+def user_from_detail(user_detail, addresses):
+    """Return the user of a BAPI_USER_GET_DETAIL result."""
+    islocked = user_detail.get('ISLOCKED') or {}
+    logondata = user_detail.get('LOGONDATA') or {}
+    user = dict(
+        user_type=logondata.get('USTYP', ''),
+        locked=any(islocked.get(lock) == 'L' for lock in ('LOCAL_LOCK', 'GLOB_LOCK', 'WRNG_LOGON')),
+        valid_from=iso_date(logondata.get('GLTGV')),
+        valid_to=iso_date(logondata.get('GLTGB')),
+        roles=valid_roles(user_detail.get('ACTIVITYGROUPS') or []),
+        profiles=sorted(row['BAPIPROF'] for row in user_detail.get('PROFILES') or []),
+    )
+    if addresses:
+        address = user_detail.get('ADDRESS') or {}
+        user.update(firstname=address.get('FIRSTNAME', ''), lastname=address.get('LASTNAME', ''), email=address.get('E_MAIL', ''))
+    return user
+
+
+def read_users_detail(conn, conn_params, usernames, addresses, max_connections):
+    """List the users of the client and read the details of the users matching usernames in parallel."""
+    raw = call_rfc_method(conn, 'BAPI_USER_GETLIST', {'MAX_ROWS': 0})
+    names = [row['USERNAME'] for row in raw['USERLIST'] if matches(row['USERNAME'], usernames)]
+    # The listing connection is reused for the details
+    RFC_POOL.release(conn)
+
+    def read(username):
+        user_conn = RFC_POOL.acquire(conn_params, Connection)
+        try:
+            return user_from_detail(call_rfc_method(user_conn, 'BAPI_USER_GET_DETAIL', {'USERNAME': username}), addresses)
+        finally:
+            RFC_POOL.release(user_conn)
+
+    return dict(zip(names, parallel_map(read, names, max_connections)))
+
+
+def matches(username, patterns):
+    return not patterns or any(fnmatchcase(username, pattern.upper()) for pattern in patterns)
+
+
+def run_module():
+    module = AnsibleModule(
+        argument_spec=dict(
+            # values for connection
+            conn_username=dict(type='str', required=True),
+            conn_password=dict(type='str', required=True, no_log=True),
+            host=dict(type='str', required=True),
+            sysnr=dict(type='str', default="00"),
+            client=dict(type='str', default="000"),
+            # values for the selection
+            usernames=dict(type='list', elements='str', required=False),
+            method=dict(default='detail', choices=['detail', 'table']),
+            addresses=dict(type='bool', default=True),
+            max_connections=dict(type='int', default=1),
+        ),
+        supports_check_mode=True,
+    )
+    result = dict(changed=False, msg='', users={})
+
+    params = module.params
+
+    conn_params = dict(user=(params['conn_username']).upper(), passwd=params['conn_password'],
+                       ashost=params['host'], sysnr=params['sysnr'], client=params['client'])
+
+    if params['max_connections'] < 1:
+        module.fail_json(msg="'max_connections' must be greater than 0")
+
+    if not HAS_PYRFC_LIBRARY:
+        module.fail_json(
+            msg=missing_required_lib('pyrfc'),
+            exception=PYRFC_LIBRARY_IMPORT_ERROR)
+
+    # basic RFC connection with pyrfc
+    try:
+        conn = RFC_POOL.acquire(conn_params, Connection)
+    except Exception as err:
+        result['error'] = str(err)
+        result['msg'] = 'Something went wrong connecting to the SAP system.'
+        module.fail_json(**result)
+
+    try:
+        if params['method'] == 'table':
+            users = read_users_table(conn, params['addresses'])
+            RFC_POOL.release(conn)
+            users = dict((username, user) for username, user in users.items() if matches(username, params['usernames']))
+        else:
+            users = read_users_detail(conn, conn_params, params['usernames'], params['addresses'], params['max_connections'])
+    except Exception as err:
+        result['error'] = str(err)
+        result['msg'] = 'Something went wrong reading the users.'
+        module.fail_json(**result)
+
+    result['users'] = users
+    result['msg'] = '{0} users read.'.format(len(users))
+    module.exit_json(**result)
+
+
+def main():
+    try:
+        run_module()
+    finally:
+        RFC_POOL.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2022-2026 The Project Contributors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# For a detailed list of copyright holders and contribution history,
+# please refer to the CONTRIBUTORS.md file in the project root.
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+import threading
+import unittest
+
+from ansible_collections.community.sap_libs.plugins.module_utils.parallel import parallel_map
+
+
+class TestParallelMap(unittest.TestCase):
+
+    def test_order(self):
+        """Test that the results are returned in the order of the items."""
+        self.assertEqual(parallel_map(lambda item: item * 2, range(20), 4), [item * 2 for item in range(20)])
+        self.assertEqual(parallel_map(lambda item: item, [], 4), [])
+
+    def test_concurrent(self):
+        """Test that max_workers items are processed at the same time."""
+        barrier = threading.Barrier(3, timeout=5)
+
+        def wait(item):
+            barrier.wait()
+            return threading.current_thread()
+
+        threads = parallel_map(wait, range(3), 3)
+        self.assertEqual(len(set(threads)), 3)
+        self.assertNotIn(threading.current_thread(), threads)
+
+    def test_serial(self):
+        """Test that a single worker processes the items in the calling thread."""
+        self.assertEqual(parallel_map(lambda item: threading.current_thread(), range(3), 1), [threading.current_thread()] * 3)
+        self.assertEqual(parallel_map(lambda item: threading.current_thread(), [1], 10), [threading.current_thread()])
+
+    def test_error(self):
+        """Test that all items are processed before the first error in the order of the items is raised."""
+        processed = []
+
+        def check(item):
+            processed.append(item)
+            if item in (2, 4):
+                raise ValueError(item)
+            return item
+
+        for max_workers in (1, 3):
+            processed[:] = []
+            with self.assertRaises(ValueError) as error:
+                parallel_map(check, range(6), max_workers)
+            self.assertEqual(error.exception.args, (2,))
+            self.assertEqual(sorted(processed), list(range(6)))
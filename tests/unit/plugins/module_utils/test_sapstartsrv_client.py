@@ -0,0 +1,343 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2022-2026 The Project Contributors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# For a detailed list of copyright holders and contribution history,
+# please refer to the CONTRIBUTORS.md file in the project root.
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import importlib.util
+import socket
+import sys
+import threading
+import unittest
+from http.client import IncompleteRead, RemoteDisconnected
+from unittest.mock import patch
+
+import pytest
+
+from ansible_collections.community.sap_libs.plugins.module_utils import sapstartsrv_client as mocked_client
+
+
+def load_client():
+    """
+    Return a private copy of sapstartsrv_client using the suds library, and the suds modules.
+
+    The module tests replace suds by mocks in sys.modules, so the shared module
+    never defines the suds based classes like PooledHttpTransport. suds imports
+    some modules when it is used, so the tests put the returned modules back in
+    sys.modules.
+    """
+    with patch.dict(sys.modules):
+        for name in [name for name in sys.modules if name == 'suds' or name.startswith('suds.')]:
+            del sys.modules[name]
+        pytest.importorskip('suds.transport')
+        spec = importlib.util.spec_from_file_location('sapstartsrv_client_suds', mocked_client.__file__)
+        client = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(client)
+        # Load the modules suds only imports when requests are made
+        pytest.importorskip('suds.transport.http')
+        suds_modules = dict((name, module) for name, module in sys.modules.items() if name == 'suds' or name.startswith('suds.'))
+    return client, suds_modules
+
+
+sapstartsrv_client, SUDS_MODULES = load_client()
+suds_transport = SUDS_MODULES['suds.transport']
+sudsobject = SUDS_MODULES['suds.sudsobject']
+
+
+def recursive_dict_reference(suds_object):
+    """The former recursive implementation of recursive_dict, which the iterative one must match."""
+    out = {}
+    if isinstance(suds_object, str):
+        return suds_object
+    for k, v in sudsobject.asdict(suds_object).items():
+        if hasattr(v, '__keylist__'):
+            out[k] = recursive_dict_reference(v)
+        elif isinstance(v, list):
+            out[k] = []
+            for item in v:
+                if hasattr(item, '__keylist__'):
+                    out[k].append(recursive_dict_reference(item))
+                else:
+                    out[k].append(item)
+        else:
+            out[k] = v
+    return out
+
+
+def suds_object(classname, **values):
+    return sudsobject.Factory.object(classname, values)
+
+
+class FakeResponse(object):
+
+    def __init__(self, status=200, body=b'<reply/>', will_close=False, reason='OK'):
+        self.status = status
+        self.reason = reason
+        self.will_close = will_close
+        self._body = body
+
+    def read(self):
+        if isinstance(self._body, Exception):
+            raise self._body
+        return self._body
+
+    def getheaders(self):
+        return [('Content-Type', 'text/xml')]
+
+
+class SendError(object):
+    """The error the request is failing with while it is sent."""
+
+    def __init__(self, error):
+        self.error = error
+
+
+class FakeConnection(object):
+    """HTTPConnection answering with the given responses, or raising them if they are exceptions or send errors."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+        self.closed = False
+
+    def request(self, method, path, body, headers):
+        if isinstance(self.responses[0], SendError):
+            raise self.responses.pop(0).error
+        self.requests.append((method, path, body))
+
+    def getresponse(self):
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    def close(self):
+        self.closed = True
+
+
+class TestPooledHttpTransport(unittest.TestCase):
+
+    def setUp(self):
+        self.assertTrue(sapstartsrv_client.HAS_SUDS_LIBRARY)
+        patcher = patch.dict(sys.modules, SUDS_MODULES)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.connections = []
+
+    def transport(self, *scripts):
+        """Return a transport whose new connections answer with the responses of scripts, one per connection."""
+        scripts = list(scripts)
+
+        def connect(host, port, timeout=None):
+            conn = FakeConnection(scripts.pop(0))
+            self.connections.append(conn)
+            return conn
+
+        patcher = patch.object(sapstartsrv_client, 'HTTPConnection', side_effect=connect)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return sapstartsrv_client.PooledHttpTransport(username='admin', password='secret')
+
+    @staticmethod
+    def request(message=b'<call/>'):
+        return suds_transport.Request('http://s4hana:50013/SAPControl.cgi', message)
+
+    def test_connection_reused(self):
+        """Test that subsequent requests are sent over the same connection."""
+        transport = self.transport([FakeResponse(), FakeResponse(body=b'<second/>')])
+
+        self.assertEqual(transport.send(self.request()).message, b'<reply/>')
+        self.assertEqual(transport.send(self.request()).message, b'<second/>')
+
+        self.assertEqual(len(self.connections), 1)
+        self.assertEqual([path for method, path, body in self.connections[0].requests], ['/SAPControl.cgi'] * 2)
+        self.assertFalse(self.connections[0].closed)
+        transport.close()
+        self.assertTrue(self.connections[0].closed)
+
+    def test_connection_closed_by_server(self):
+        """Test that a request is not sent over a connection the server closed."""
+        transport = self.transport([FakeResponse(will_close=True)], [FakeResponse()])
+
+        transport.send(self.request())
+        transport.send(self.request())
+
+        self.assertEqual(len(self.connections), 2)
+        self.assertTrue(self.connections[0].closed)
+
+    def test_stale_connection_retried(self):
+        """Test that a request without any response on a kept connection is sent once more on a new connection."""
+        transport = self.transport([FakeResponse(), RemoteDisconnected('Remote end closed connection without response')],
+                                   [FakeResponse(body=b'<retried/>')])
+
+        transport.send(self.request())
+        self.assertEqual(transport.send(self.request()).message, b'<retried/>')
+
+        self.assertEqual(len(self.connections), 2)
+        self.assertTrue(self.connections[0].closed)
+        self.assertEqual(len(self.connections[1].requests), 1)
+
+    def test_send_failure_retried(self):
+        """Test that a request which could not be sent on a kept connection is sent on a new connection."""
+        transport = self.transport([FakeResponse(), SendError(socket.error(32, 'Broken pipe'))], [FakeResponse(body=b'<retried/>')])
+
+        transport.send(self.request())
+        self.assertEqual(transport.send(self.request()).message, b'<retried/>')
+
+        self.assertEqual(len(self.connections), 2)
+        self.assertEqual(len(self.connections[0].requests), 1)
+
+    def test_incomplete_response_not_retried(self):
+        """Test that a request is not sent again if its response broke off, as the server executed it already."""
+        transport = self.transport([FakeResponse(), FakeResponse(body=IncompleteRead(b'<rep'))], [FakeResponse()])
+
+        transport.send(self.request())
+        with self.assertRaises(IncompleteRead):
+            transport.send(self.request(b'<StartSystem/>'))
+
+        self.assertEqual(len(self.connections), 1)
+        self.assertTrue(self.connections[0].closed)
+
+    def test_reset_while_reading_response_not_retried(self):
+        """Test that a request is not sent again if the connection was reset while the response was read."""
+        transport = self.transport([FakeResponse(), socket.error(104, 'Connection reset by peer')], [FakeResponse()])
+
+        transport.send(self.request())
+        with self.assertRaises(socket.error):
+            transport.send(self.request(b'<InstanceStop/>'))
+
+        self.assertEqual(len(self.connections), 1)
+
+    def test_concurrent_requests(self):
+        """Test that requests of several threads are sent at the same time over their own connections."""
+        barrier = threading.Barrier(2, timeout=5)
+
+        class WaitingConnection(FakeConnection):
+            def getresponse(self):
+                barrier.wait()
+                return FakeConnection.getresponse(self)
+
+        patcher = patch.object(sapstartsrv_client, 'HTTPConnection', side_effect=lambda *args, **kwargs: WaitingConnection([FakeResponse()]))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        transport = sapstartsrv_client.PooledHttpTransport(username='admin', password='secret')
+        replies = []
+        threads = [threading.Thread(target=lambda: replies.append(transport.send(self.request()))) for dummy in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(replies), 2)
+        self.assertEqual(len(transport._connections['s4hana:50013']), 2)
+
+    def test_failure_on_new_connection_not_retried(self):
+        """Test that a request failing on a new connection is not retried."""
+        transport = self.transport([socket.error('Connection reset')], [FakeResponse()])
+
+        with self.assertRaises(socket.error):
+            transport.send(self.request())
+        self.assertEqual(len(self.connections), 1)
+
+    def test_timeout_not_retried(self):
+        """Test that a timeout on a kept connection is raised without sending the request again."""
+        transport = self.transport([FakeResponse(), socket.timeout('timed out')], [FakeResponse()])
+
+        transport.send(self.request())
+        with self.assertRaises(socket.timeout):
+            transport.send(self.request())
+
+        self.assertEqual(len(self.connections), 1)
+        self.assertTrue(self.connections[0].closed)
+
+    def test_no_content(self):
+        """Test that 202 and 204 responses return no reply."""
+        transport = self.transport([FakeResponse(status=202, body=b''), FakeResponse(status=204, body=b'')])
+
+        self.assertIsNone(transport.send(self.request()))
+        self.assertIsNone(transport.send(self.request()))
+
+    def test_error_status(self):
+        """Test that a status other than 200 raises TransportError with the status and body."""
+        transport = self.transport([FakeResponse(status=500, body=b'<fault/>', reason='Internal Server Error')])
+
+        with self.assertRaises(suds_transport.TransportError) as error:
+            transport.send(self.request())
+
+        self.assertEqual(error.exception.httpcode, 500)
+        self.assertEqual(error.exception.fp.read(), b'<fault/>')
+
+    def test_open_error_status(self):
+        """Test that a WSDL download with a status other than 200 raises TransportError."""
+        transport = self.transport([FakeResponse(status=401, body=b'', reason='Unauthorized')])
+
+        with self.assertRaises(suds_transport.TransportError) as error:
+            transport.open(suds_transport.Request('http://s4hana:50013/sapcontrol?wsdl'))
+
+        self.assertEqual(error.exception.httpcode, 401)
+        self.assertEqual(self.connections[0].requests[0][:2], ('GET', '/sapcontrol?wsdl'))
+
+
+class TestRecursiveDict(unittest.TestCase):
+
+    def setUp(self):
+        process = suds_object('OSProcess', name='disp+work', description='Dispatcher', dispstatus='SAPControl-GREEN',
+                              textstatus=None, starttime='2026 10 17 08:00:00', elapsedtime='1:00:00', pid=4711)
+        empty = suds_object('OSProcess', name='igswd_mt', description=None, dispstatus='SAPControl-GRAY',
+                            textstatus='Stopped', starttime=None, elapsedtime=None, pid=0)
+        nested = suds_object('Instance', hostname='s4hana', instanceNr=1,
+                             features=suds_object('Features', item=['ABAP', 'GATEWAY', None]),
+                             processes=suds_object('ProcessList', item=[process, empty]),
+                             mixed=[process, 'text', None, 42, suds_object('Empty')])
+        self.reply = suds_object('Reply', item=[nested, suds_object('Instance', hostname='s4hana2', instanceNr=2,
+                                                                    features=None, processes=None, mixed=[])],
+                                 single=process, count=2, name=None)
+
+    def test_equivalent_to_recursive(self):
+        """Test that nested objects, lists and None or scalar leaves are converted like the recursive implementation."""
+        expected = recursive_dict_reference(self.reply)
+
+        self.assertEqual(sapstartsrv_client.recursive_dict(self.reply), expected)
+        self.assertEqual(list(expected), list(sapstartsrv_client.recursive_dict(self.reply)))
+        self.assertEqual(expected['item'][0]['mixed'][1:4], ['text', None, 42])
+        self.assertEqual(expected['item'][0]['mixed'][4], {})
+        self.assertIsNone(expected['item'][1]['features'])
+
+    def test_string(self):
+        """Test that strings are returned unchanged."""
+        self.assertEqual(sapstartsrv_client.recursive_dict('SAPControl-GREEN'), recursive_dict_reference('SAPControl-GREEN'))
+
+    def test_iter_items(self):
+        """Test that iter_items yields the rows converted like the recursive implementation."""
+        rows = list(sapstartsrv_client.iter_items(self.reply))
+
+        self.assertEqual(rows, [recursive_dict_reference(row) for row in self.reply.item])
+        self.assertEqual(list(sapstartsrv_client.iter_items(self.reply, 'single')), [recursive_dict_reference(self.reply.single)])
+        self.assertEqual(list(sapstartsrv_client.iter_items(self.reply, 'missing')), [])
+
+    def test_deep_nesting(self):
+        """Test that objects nested deeper than the recursion limit are converted."""
+        reply = leaf = suds_object('Node', value=0)
+        for depth in range(sys.getrecursionlimit() + 100):
+            reply = suds_object('Node', value=depth + 1, child=reply)
+
+        converted = sapstartsrv_client.recursive_dict(reply)
+        while 'child' in converted:
+            converted = converted['child']
+        self.assertEqual(converted, recursive_dict_reference(leaf))
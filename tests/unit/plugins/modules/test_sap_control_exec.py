@@ -20,7 +20,11 @@
 from __future__ import (absolute_import, division, print_function)
 __metaclass__ = type
 
+import shutil
+import socket
 import sys
+import tempfile
+from types import SimpleNamespace
 from unittest.mock import patch, MagicMock, Mock
 from ansible_collections.community.sap_libs.tests.unit.plugins.modules.utils import AnsibleExitJson, AnsibleFailJson, ModuleTestCase, set_module_args
 
@@ -29,6 +33,10 @@ sys.modules['suds.sudsobject'] = MagicMock()
 sys.modules['suds'] = MagicMock()
 
 from ansible_collections.community.sap_libs.plugins.modules import sap_control_exec
+from ansible_collections.community.sap_libs.plugins.module_utils import sapstartsrv_client
+
+# The tests patch probe_ports, keep the function itself for testing it
+probe_ports = sapstartsrv_client.probe_ports
 
 
 class TestSapcontrolModule(ModuleTestCase):
@@ -39,9 +47,14 @@ class TestSapcontrolModule(ModuleTestCase):
         # Patch HAS_SUDS_LIBRARY for all tests
         self.patcher_suds = patch.object(self.module, 'HAS_SUDS_LIBRARY', True)
         self.patcher_suds.start()
+        # Do not probe the ports of the test hosts
+        self.patcher_probe = patch('ansible_collections.community.sap_libs.plugins.module_utils.sapstartsrv_client.probe_ports',
+                                   return_value=[])
+        self.mock_probe = self.patcher_probe.start()
 
     def tearDown(self):
         self.patcher_suds.stop()
+        self.patcher_probe.stop()
         super(TestSapcontrolModule, self).tearDown()
 
     def define_rfc_connect(self, mocker):
@@ -206,3 +219,484 @@ class TestSapcontrolModule(ModuleTestCase):
         self.assertTrue(res['changed'])
         self.assertEqual(res['out'], [None])
         self.assertEqual(res['msg'], "Successful execution of function: InstanceStart")
+
+    def test_cache_options(self):
+        """Test that the WSDL cache settings are passed to the client."""
+        args = {
+            "hostname": "192.168.8.15",
+            "port": 50113,
+            "function": "GetVersionInfo",
+            "cache": True,
+            "cache_dir": "/tmp/sap_libs_cache",
+            "cache_ttl": 60,
+        }
+
+        with patch.object(self.module, 'connection') as mock_connection:
+            mock_connection.return_value = None
+
+            with self.assertRaises(AnsibleExitJson):
+                with set_module_args(args):
+                    self.module.main()
+
+        kwargs = mock_connection.call_args[1]
+        self.assertEqual(kwargs['cache_dir'], "/tmp/sap_libs_cache")
+        self.assertEqual(kwargs['cache_ttl'], 60)
+
+    def test_cache_disabled(self):
+        """Test that no cache is used by default."""
+        args = {
+            "hostname": "192.168.8.15",
+            "port": 50113,
+            "function": "GetVersionInfo",
+        }
+
+        with patch.object(self.module, 'connection') as mock_connection:
+            mock_connection.return_value = None
+
+            with self.assertRaises(AnsibleExitJson):
+                with set_module_args(args):
+                    self.module.main()
+
+        self.assertIsNone(mock_connection.call_args[1]['cache_dir'])
+
+    def test_wsdl_path(self):
+        """Test that a local WSDL file is passed to the client."""
+        args = {
+            "sysnr": "00",
+            "function": "GetVersionInfo",
+            "wsdl_path": "/var/tmp/sapcontrol.wsdl",
+        }
+
+        with patch.object(self.module, 'connection') as mock_connection:
+            mock_connection.return_value = None
+
+            with self.assertRaises(AnsibleExitJson) as result:
+                with set_module_args(args):
+                    self.module.main()
+
+        self.assertEqual(result.exception.args[0]['connection_type'], 'socket')
+        self.assertEqual(mock_connection.call_args[1]['wsdl_path'], "/var/tmp/sapcontrol.wsdl")
+
+    def test_success_functions(self):
+        """Test several functions executed in one task."""
+        args = {
+            "sysnr": "00",
+            "functions": [
+                {"function": "GetVersionInfo"},
+                {"function": "ParameterValue", "parameter": "SAPSYSTEMNAME", "name": "sid"},
+            ]
+        }
+
+        with patch.object(self.module, 'connection') as mock_connection:
+            mock_connection.side_effect = [None, 'HDB']
+
+            with self.assertRaises(AnsibleExitJson) as result:
+                with set_module_args(args):
+                    self.module.main()
+
+        res = result.exception.args[0]
+        self.assertEqual(sorted(res['results']), ['GetVersionInfo', 'sid'])
+        self.assertEqual(res['results']['sid']['out'], 'HDB')
+        self.assertIn('elapsed', res['results']['GetVersionInfo'])
+        self.assertEqual(mock_connection.call_args_list[1][0][4:6], ('ParameterValue', 'SAPSYSTEMNAME'))
+
+    def test_error_functions_isolated(self):
+        """Test that a failing function does not stop the following functions."""
+        args = {
+            "sysnr": "00",
+            "functions": [
+                {"function": "GetAlertTree"},
+                {"function": "GetVersionInfo"},
+            ]
+        }
+
+        with patch.object(self.module, 'connection') as mock_connection:
+            mock_connection.side_effect = [Exception('Test'), None]
+
+            with self.assertRaises(AnsibleFailJson) as result:
+                with set_module_args(args):
+                    self.module.main()
+
+        res = result.exception.args[0]
+        self.assertEqual(mock_connection.call_count, 2)
+        self.assertEqual(res['results']['GetAlertTree']['error'], 'Test')
+        self.assertEqual(res['results']['GetVersionInfo']['error'], '')
+        self.assertEqual(res['error'], 'Execution of GetAlertTree has failed.')
+
+    def test_error_functions_duplicate(self):
+        """Fail when a function is listed twice without name."""
+        args = {
+            "sysnr": "00",
+            "functions": [
+                {"function": "ParameterValue", "parameter": "SAPSYSTEMNAME"},
+                {"function": "ParameterValue", "parameter": "SAPSYSTEM"},
+            ]
+        }
+
+        with self.assertRaises(AnsibleFailJson) as result:
+            with set_module_args(args):
+                self.module.main()
+        self.assertIn("listed more than once", result.exception.args[0]['msg'])
+
+    def test_success_targets(self):
+        """Test a function executed on several instances."""
+        args = {
+            "hostname": "s4hana",
+            "username": "s4hadm",
+            "password": "test1234",
+            "function": "GetProcessList",
+            "targets": [
+                {"sysnr": "00"},
+                {"hostname": "s4hana-app1", "port": 50113},
+            ],
+            "max_workers": 2,
+        }
+
+        with patch.object(self.module, 'connection') as mock_connection:
+            mock_connection.side_effect = lambda hostname, port, *args, **kwargs: hostname
+
+            with self.assertRaises(AnsibleExitJson) as result:
+                with set_module_args(args):
+                    self.module.main()
+
+        res = result.exception.args[0]
+        self.assertEqual([target['out'] for target in res['targets']], [['s4hana'], ['s4hana-app1']])
+        self.assertEqual(res['targets'][1]['connection_url'], 'http://s4hana-app1:50113/sapcontrol?wsdl')
+        self.assertEqual(mock_connection.call_count, 2)
+
+    def test_error_targets(self):
+        """Test that a failing instance is reported without hiding the others."""
+        args = {
+            "function": "GetProcessList",
+            "targets": [
+                {"hostname": "s4hana-app1", "port": 50013},
+                {"hostname": "s4hana-app2", "port": 50013},
+            ],
+        }
+
+        def connect(hostname, *args, **kwargs):
+            if hostname == "s4hana-app2":
+                raise Exception('Test')
+            return None
+
+        with patch.object(self.module, 'connection') as mock_connection:
+            mock_connection.side_effect = connect
+
+            with self.assertRaises(AnsibleFailJson) as result:
+                with set_module_args(args):
+                    self.module.main()
+
+        res = result.exception.args[0]
+        self.assertEqual(res['targets'][0]['error'], '')
+        self.assertEqual(res['targets'][1]['error'], 'Test')
+        self.assertEqual(res['error'], 'Execution has failed on s4hana-app2:50013.')
+
+    def test_port_probe_order(self):
+        """Test that the port answering first is used before the other one."""
+        args = {
+            "hostname": "192.168.8.15",
+            "sysnr": "01",
+            "function": "GetProcessList"
+        }
+        self.mock_probe.return_value = ["50113"]
+
+        with patch.object(self.module, 'connection') as mock_connection:
+            mock_connection.return_value = None
+
+            with self.assertRaises(AnsibleExitJson) as result:
+                with set_module_args(args):
+                    self.module.main()
+
+        self.assertEqual(mock_connection.call_count, 1)
+        self.assertEqual(result.exception.args[0]['connection_url'], 'http://192.168.8.15:50113/sapcontrol?wsdl')
+
+    def test_port_cache(self):
+        """Test that the working port is remembered and used without probing."""
+        args = {
+            "hostname": "192.168.8.15",
+            "sysnr": "01",
+            "function": "GetProcessList",
+            "cache": True,
+            "cache_dir": tempfile.mkdtemp(),
+        }
+
+        with patch.object(self.module, 'connection') as mock_connection:
+            mock_connection.side_effect = [Exception('Test'), None, None]
+
+            for dummy in range(2):
+                with self.assertRaises(AnsibleExitJson) as result:
+                    with set_module_args(dict(args)):
+                        self.module.main()
+                self.assertEqual(result.exception.args[0]['connection_url'], 'http://192.168.8.15:50113/sapcontrol?wsdl')
+
+        shutil.rmtree(args['cache_dir'])
+        self.assertEqual(mock_connection.call_count, 3)
+        self.assertEqual(self.mock_probe.call_count, 1)
+
+    def test_read_log_file_offset(self):
+        """Test that ReadLogFile continues after the offset and appends the lines to dest."""
+        dest_dir = tempfile.mkdtemp()
+        args = {
+            "sysnr": "01",
+            "function": "ReadLogFile",
+            "parameter": {"filename": "work/available.log"},
+            "offset": "100",
+            "tail": 50,
+            "dest": dest_dir + "/available.log",
+        }
+        with open(args['dest'], 'w') as dest:
+            dest.write("old\n")
+
+        with patch.object(self.module, 'connection') as mock_connection:
+            mock_connection.return_value = SimpleNamespace(endcookie="200", fields=SimpleNamespace(item=["new 1", "new 2"]))
+            with self.assertRaises(AnsibleExitJson) as result:
+                with set_module_args(args):
+                    self.module.main()
+
+        with open(args['dest']) as dest:
+            content = dest.read()
+        shutil.rmtree(dest_dir)
+        res = result.exception.args[0]
+        self.assertEqual(content, "old\nnew 1\nnew 2\n")
+        self.assertEqual(res['offset'], "200")
+        self.assertEqual(res['line_count'], 2)
+        self.assertEqual(res['out'], [])
+        self.assertEqual(mock_connection.call_args[0][5],
+                         {"filename": "work/available.log", "maxentries": 50, "statecookie": "100"})
+
+    def test_read_developer_trace_offset(self):
+        """Test that ReadDeveloperTrace only reads the bytes written since the offset."""
+        args = {
+            "sysnr": "01",
+            "function": "ReadDeveloperTrace",
+            "parameter": "dev_w0",
+            "offset": "1000",
+        }
+        traces = SimpleNamespace(item=[{"filename": "dev_w0", "size": "1500"}])
+
+        with patch.object(self.module, 'connection') as mock_connection:
+            mock_connection.side_effect = [traces, SimpleNamespace(name="dev_w0", lines=SimpleNamespace(item=["line"]))]
+            with patch.object(self.module, 'recursive_dict', return_value={"lines": ["line"]}):
+                with self.assertRaises(AnsibleExitJson) as result:
+                    with set_module_args(args):
+                        self.module.main()
+
+        res = result.exception.args[0]
+        self.assertEqual(mock_connection.call_args_list[1][0][4:6], ("ReadDeveloperTrace", {"filename": "dev_w0", "size": 500}))
+        self.assertEqual(res['offset'], "1500")
+        self.assertEqual(res['line_count'], 1)
+
+    def test_read_developer_trace_unchanged(self):
+        """Test that an unchanged developer trace is not read again."""
+        args = {
+            "sysnr": "01",
+            "function": "ReadDeveloperTrace",
+            "parameter": "dev_w0",
+            "offset": "1500",
+        }
+        traces = SimpleNamespace(item=[{"filename": "dev_w0", "size": "1500"}])
+
+        with patch.object(self.module, 'connection') as mock_connection:
+            mock_connection.return_value = traces
+            with self.assertRaises(AnsibleExitJson) as result:
+                with set_module_args(args):
+                    self.module.main()
+
+        self.assertEqual(mock_connection.call_count, 1)
+        self.assertEqual(result.exception.args[0]['line_count'], 0)
+
+    def test_error_read_log_function(self):
+        """Test that tail is only accepted for the log functions."""
+        args = {
+            "sysnr": "01",
+            "function": "GetProcessList",
+            "tail": 10,
+        }
+        with self.assertRaises(AnsibleFailJson) as result:
+            with set_module_args(args):
+                self.module.main()
+        self.assertEqual(result.exception.args[0]['msg'],
+                         "'tail', 'offset' and 'dest' require function ReadLogFile or ReadDeveloperTrace")
+
+    def test_filter_fields(self):
+        """Test that only the selected rows and fields are returned."""
+        args = {
+            "sysnr": "01",
+            "function": "GetProcessList",
+            "filter": [{"field": "dispstatus", "op": "ne", "value": "SAPControl-GREEN"}],
+            "fields": ["name", "dispstatus"],
+        }
+        rows = [SimpleNamespace(name="msg_server", dispstatus="SAPControl-GREEN", pid=1),
+                SimpleNamespace(name="disp+work", dispstatus="SAPControl-YELLOW", pid=2)]
+
+        with patch.object(self.module, 'connection') as mock_connection:
+            mock_connection.return_value = SimpleNamespace(item=rows)
+            with self.assertRaises(AnsibleExitJson) as result:
+                with set_module_args(args):
+                    self.module.main()
+
+        self.assertEqual(result.exception.args[0]['out'], [{'item': [{'name': 'disp+work', 'dispstatus': 'SAPControl-YELLOW'}]}])
+
+    def test_filter_functions(self):
+        """Test that the filter of a function entry only applies to that function."""
+        args = {
+            "sysnr": "01",
+            "functions": [
+                {"function": "GetProcessList", "filter": [{"field": "pid", "value": 2}]},
+                {"function": "ParameterValue", "parameter": "SAPSYSTEMNAME"},
+            ],
+        }
+        rows = [{"name": "msg_server", "pid": 1}, {"name": "disp+work", "pid": 2}]
+
+        with patch.object(self.module, 'connection') as mock_connection:
+            mock_connection.side_effect = [SimpleNamespace(item=rows), 'HDB']
+            with self.assertRaises(AnsibleExitJson) as result:
+                with set_module_args(args):
+                    self.module.main()
+
+        results = result.exception.args[0]['results']
+        self.assertEqual(results['GetProcessList']['out'], {'item': [{"name": "disp+work", "pid": 2}]})
+        self.assertEqual(results['ParameterValue']['out'], 'HDB')
+
+    def test_wait_start_system(self):
+        """Test that StartSystem polls the instances until all are GREEN."""
+        args = {
+            "sysnr": "01",
+            "function": "StartSystem",
+            "wait": True,
+        }
+
+        def instances(*states):
+            return SimpleNamespace(item=[SimpleNamespace(hostname="s4hana", instanceNr=nr, dispstatus=state)
+                                         for nr, state in enumerate(states)])
+
+        with patch.object(self.module, 'connection') as mock_connection:
+            mock_connection.side_effect = [None,
+                                           instances("SAPControl-GRAY", "SAPControl-GRAY"),
+                                           instances("SAPControl-GREEN", "SAPControl-YELLOW"),
+                                           instances("SAPControl-GREEN", "SAPControl-GREEN")]
+            with self.assertRaises(AnsibleExitJson) as result:
+                with set_module_args(args):
+                    self.module.main()
+
+        res = result.exception.args[0]
+        self.assertEqual(mock_connection.call_args_list[0][0][4:6], ("StartSystem", {"waittimeout": 0}))
+        self.assertEqual(mock_connection.call_args_list[3][0][4], "GetSystemInstanceList")
+        self.assertEqual([instance['dispstatus'] for instance in res['instances']], ["SAPControl-GREEN"] * 2)
+        self.assertTrue(all(instance['elapsed'] is not None for instance in res['instances']))
+
+    def test_wait_transient_error(self):
+        """Test that a failed poll while the instances restart does not abort the wait."""
+        args = {
+            "sysnr": "01",
+            "function": "StartSystem",
+            "wait": True,
+        }
+        green = SimpleNamespace(item=[SimpleNamespace(hostname="s4hana", instanceNr=1, dispstatus="SAPControl-GREEN")])
+
+        with patch.object(self.module, 'connection') as mock_connection:
+            mock_connection.side_effect = [None, Exception("Connection refused"), green]
+            with patch.object(self.module.time, 'sleep') as mock_sleep:
+                with self.assertRaises(AnsibleExitJson) as result:
+                    with set_module_args(args):
+                        self.module.main()
+
+        res = result.exception.args[0]
+        self.assertEqual(mock_connection.call_count, 3)
+        self.assertEqual(mock_sleep.call_count, 1)
+        self.assertEqual(res['instances'][0]['dispstatus'], "SAPControl-GREEN")
+
+    def test_wait_error_timeout(self):
+        """Test that the last poll error is returned when it still occurs at the timeout."""
+        args = {
+            "sysnr": "01",
+            "function": "StartSystem",
+            "wait": True,
+            "wait_timeout": 0,
+        }
+
+        with patch.object(self.module, 'connection') as mock_connection:
+            mock_connection.side_effect = [None, Exception("Connection refused")]
+            with self.assertRaises(AnsibleFailJson) as result:
+                with set_module_args(args):
+                    self.module.main()
+
+        self.assertEqual(result.exception.args[0]['error'], "Connection refused")
+
+    def test_wait_restart_system_timeout(self):
+        """Test that RestartSystem does not count instances which never left GREEN and fails after the timeout."""
+        args = {
+            "sysnr": "01",
+            "function": "RestartSystem",
+            "force": True,
+            "wait": True,
+            "wait_timeout": 0,
+        }
+
+        with patch.object(self.module, 'connection') as mock_connection:
+            mock_connection.side_effect = [None, SimpleNamespace(item=[{"hostname": "s4hana", "instanceNr": 1,
+                                                                        "dispstatus": "SAPControl-GREEN"}])]
+            with self.assertRaises(AnsibleFailJson) as result:
+                with set_module_args(args):
+                    self.module.main()
+
+        res = result.exception.args[0]
+        self.assertEqual(res['error'], 'Timeout after 0 seconds waiting for all instances to be SAPControl-GREEN')
+        self.assertIsNone(res['instances'][0]['elapsed'])
+
+    def test_connection_stats(self):
+        """Test that the connection statistics are returned."""
+        args = {
+            "sysnr": "01",
+            "function": "GetProcessList",
+        }
+        with patch.object(self.module, 'connection') as mock_connection:
+            mock_connection.return_value = None
+            with patch.object(self.module, 'connection_stats', return_value=dict(connections=1, requests=2, reused=1)):
+                with self.assertRaises(AnsibleExitJson) as result:
+                    with set_module_args(args):
+                        self.module.main()
+
+        self.assertEqual(result.exception.args[0]['connection_stats'], dict(connections=1, requests=2, reused=1))
+
+    def test_probe_ports(self):
+        """Test that only the port accepting connections is returned."""
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        closed = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            listener.bind(("127.0.0.1", 0))
+            listener.listen(1)
+            closed.bind(("127.0.0.1", 0))
+            open_port = str(listener.getsockname()[1])
+            closed_port = str(closed.getsockname()[1])
+            self.assertEqual(probe_ports("127.0.0.1", [closed_port, open_port], timeout=5), [open_port])
+            self.assertEqual(probe_ports("127.0.0.1", [closed_port], timeout=1), [])
+        finally:
+            listener.close()
+            closed.close()
+
+    def test_call_first_endpoint_fallback(self):
+        """Test that the second port is used and remembered if the first one is unreachable."""
+        endpoint_cache = MagicMock()
+        endpoint_cache.get.return_value = None
+        call = Mock(side_effect=[socket.error('Connection refused'), 'result'])
+
+        port, conn_result = sapstartsrv_client.call_first_endpoint(call, "192.168.8.15", ["50013", "50113"], endpoint_cache, "key")
+
+        self.assertEqual((port, conn_result), ("50113", 'result'))
+        self.assertEqual([c[0][0] for c in call.call_args_list], ["50013", "50113"])
+        endpoint_cache.set.assert_called_once_with("key", "50113")
+
+    def test_call_first_endpoint_unreachable(self):
+        """Test that the error of the last port is raised if no port is reachable."""
+        endpoint_cache = MagicMock()
+        endpoint_cache.get.return_value = "50013"
+        call = Mock(side_effect=[socket.error('first'), socket.error('second')])
+
+        with self.assertRaises(socket.error) as error:
+            sapstartsrv_client.call_first_endpoint(call, "192.168.8.15", ["50013", "50113"], endpoint_cache, "key")
+
+        self.assertEqual(str(error.exception), 'second')
+        self.assertEqual([c[0][0] for c in call.call_args_list], ["50013", "50113"])
+        endpoint_cache.delete.assert_called_once_with("key")
+        self.assertEqual(endpoint_cache.set.call_count, 0)
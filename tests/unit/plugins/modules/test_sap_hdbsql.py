@@ -27,7 +27,13 @@ from ansible_collections.community.sap_libs.tests.unit.plugins.modules.utils imp
     ModuleTestCase,
     set_module_args,
 )
-from unittest.mock import patch
+import datetime
+import json
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from unittest.mock import patch, MagicMock
 from ansible.module_utils import basic
 
 
@@ -36,6 +42,28 @@ def get_bin_path(*args, **kwargs):
     return "/usr/sap/HDB/HDB01/exe/hdbsql"
 
 
+def streamed_file_runner(executed):
+    """Return a run_command fake of hdbsql reading the statements of a progress_file execution from its input."""
+
+    def run_command(cmd):
+        separator = cmd[cmd.index('-c') + 1]
+        with open(cmd[cmd.index('-I') + 1]) as batch, open(cmd[cmd.index('-o') + 1], 'w') as output:
+            lines = []
+            for line in batch:
+                if line.strip() != separator:
+                    lines.append(line)
+                    continue
+                statement = "".join(lines).strip()
+                lines = []
+                if statement.startswith('SELECT 1 AS "ANSIBLE_RESULT_'):
+                    output.write('{0}\n1\n'.format(statement.split('"')[1]))
+                else:
+                    executed.append(statement)
+        return 0, '', ''
+
+    return run_command
+
+
 class Testsap_hdbsql(ModuleTestCase):
     """Main class for testing sap_hdbsql module."""
 
@@ -218,3 +246,703 @@ class Testsap_hdbsql(ModuleTestCase):
             self.assertIn('-Z', executed_cmd)
             self.assertIn('key1=value1', executed_cmd)
             self.assertIn('key2=value2', executed_cmd)
+
+    def test_session(self):
+        """Verify that all queries run in one hdbsql session and the results are split per query"""
+        args = {
+            'sid': "HDB",
+            'instance': "01",
+            'password': "pwd",
+            'session': True,
+            'query': ["SELECT user_name FROM users;", "UPDATE users SET name='test'", "SELECT 1 AS one FROM DUMMY"]
+        }
+        batches = []
+
+        def run_command(cmd):
+            with open(cmd[cmd.index('-I') + 1]) as batch_file:
+                batches.append(batch_file.read())
+            marker = batches[0].split('"')[1]
+            return 0, ('user_name\n"SYSTEM"\n"ADMIN"\n{0}\n1\n'
+                       '{0}\n1\n'
+                       'ONE\n1\n{0}\n1\n').format(marker), ''
+
+        with patch.object(basic.AnsibleModule, 'run_command', side_effect=run_command) as mock_run:
+            with self.assertRaises(AnsibleExitJson) as result:
+                with set_module_args(args):
+                    self.module.main()
+
+        self.assertEqual(mock_run.call_count, 1)
+        self.assertEqual(batches[0].count("SELECT 1 AS"), 4)
+        self.assertNotIn(";", batches[0])
+        self.assertEqual(result.exception.args[0]['query_result'], [
+            [{'user_name': 'SYSTEM'}, {'user_name': 'ADMIN'}],
+            [],
+            [{'ONE': '1'}],
+        ])
+        self.assertTrue(result.exception.args[0]['changed'])
+
+    def test_engine_hdbcli(self):
+        """Verify that hdbcli runs all queries over one connection and returns typed values"""
+        args = {
+            'instance': "01",
+            'password': "pwd",
+            'engine': 'hdbcli',
+            'fetch_size': 1,
+            'query': ["SELECT * FROM users", "UPDATE users SET name='test'"]
+        }
+        cursor = MagicMock()
+        descriptions = [[('USER_NAME',), ('SIZE',), ('CREATED',), ('HASH',), ('VALID_UNTIL',)], None]
+        cursor.execute.side_effect = lambda q: setattr(cursor, 'description', descriptions.pop(0))
+        cursor.fetchmany.side_effect = [
+            [('SYSTEM', Decimal('10'), datetime.datetime(2024, 1, 24, 2, 23, 54), b'\xab\x01', None)],
+            [('ADMIN', Decimal('1.5'), datetime.datetime(2024, 1, 25), b'', None)],
+            [],
+        ]
+        dbapi = MagicMock()
+        dbapi.connect.return_value.cursor.return_value = cursor
+
+        with patch.object(self.module, 'HAS_HDBCLI_LIBRARY', True):
+            with patch.object(self.module, 'dbapi', dbapi, create=True):
+                with patch.object(basic.AnsibleModule, 'run_command') as run_command:
+                    with self.assertRaises(AnsibleExitJson) as result:
+                        with set_module_args(args):
+                            self.module.main()
+
+        self.assertEqual(run_command.call_count, 0)
+        self.assertEqual(dbapi.connect.call_count, 1)
+        self.assertEqual(dbapi.connect.call_args[1],
+                         dict(address='localhost', port=30115, autocommit=True, user='SYSTEM', password='pwd'))
+        res = result.exception.args[0]
+        self.assertEqual(res['engine'], 'hdbcli')
+        self.assertEqual(res['query_result'], [[
+            {'USER_NAME': 'SYSTEM', 'SIZE': 10, 'CREATED': '2024-01-24T02:23:54', 'HASH': 'AB01', 'VALID_UNTIL': None},
+            {'USER_NAME': 'ADMIN', 'SIZE': 1.5, 'CREATED': '2024-01-25T00:00:00', 'HASH': '', 'VALID_UNTIL': None},
+        ], []])
+
+    def test_engine_auto_fallback(self):
+        """Verify that engine auto uses hdbsql if hdbcli is missing"""
+        args = {
+            'sid': "HDB",
+            'instance': "01",
+            'password': "pwd",
+            'engine': 'auto',
+            'query': ["SELECT 1 FROM DUMMY"]
+        }
+        with patch.object(self.module, 'HAS_HDBCLI_LIBRARY', False):
+            with patch.object(basic.AnsibleModule, 'run_command') as run_command:
+                run_command.return_value = 0, '1\n1', ''
+                with self.assertRaises(AnsibleExitJson) as result:
+                    with set_module_args(args):
+                        self.module.main()
+
+        self.assertEqual(run_command.call_count, 1)
+        self.assertEqual(result.exception.args[0]['engine'], 'hdbsql')
+
+    def test_engine_hdbcli_missing(self):
+        """Verify that engine hdbcli fails if hdbcli is missing"""
+        args = {
+            'instance': "01",
+            'password': "pwd",
+            'engine': 'hdbcli',
+            'query': ["SELECT 1 FROM DUMMY"]
+        }
+        with patch.object(self.module, 'HAS_HDBCLI_LIBRARY', False):
+            with self.assertRaises(AnsibleFailJson) as result:
+                with set_module_args(args):
+                    self.module.main()
+
+        self.assertIn("hdbcli", result.exception.args[0]['msg'])
+
+    def test_output_file(self):
+        """Verify that the rows are streamed to the output file and hdbsql is stopped at max_rows"""
+        tmp_dir = tempfile.mkdtemp()
+        args = {
+            'sid': "HDB",
+            'instance': "01",
+            'password': "pwd",
+            'output_file': os.path.join(tmp_dir, 'users.jsonl'),
+            'max_rows': 2,
+            'query': ["SELECT * FROM users"]
+        }
+
+        def run_command(cmd):
+            with open(cmd[cmd.index('-o') + 1], 'w') as output:
+                output.write('username,name\n"SYSTEM","System user"\n"ADMIN","Admin"\n"OTHER","Other"\n')
+            return -13, '', ''
+
+        with patch.object(basic.AnsibleModule, 'run_command', side_effect=run_command) as mock_run:
+            with self.assertRaises(AnsibleExitJson) as result:
+                with set_module_args(args):
+                    self.module.main()
+
+        with open(args['output_file']) as output_file:
+            lines = [json.loads(line) for line in output_file]
+        shutil.rmtree(tmp_dir)
+        self.assertEqual(mock_run.call_count, 1)
+        self.assertEqual(lines, [{'username': 'SYSTEM', 'name': 'System user'}, {'username': 'ADMIN', 'name': 'Admin'}])
+        self.assertEqual(result.exception.args[0]['row_count'], [2])
+        self.assertEqual(result.exception.args[0]['query_result'], [])
+
+    def test_output_file_session_csv(self):
+        """Verify that the rows of a session are split per query while streaming them to a CSV file"""
+        tmp_dir = tempfile.mkdtemp()
+        args = {
+            'sid': "HDB",
+            'instance': "01",
+            'password': "pwd",
+            'session': True,
+            'output_file': os.path.join(tmp_dir, 'result.csv'),
+            'output_format': 'csv',
+            'query': ["SELECT user_name FROM users", "UPDATE users SET name='test'", "SELECT 1 AS one FROM DUMMY"]
+        }
+
+        def run_command(cmd):
+            with open(cmd[cmd.index('-I') + 1]) as batch_file:
+                marker = batch_file.read().split('"')[1]
+            with open(cmd[cmd.index('-o') + 1], 'w') as output:
+                output.write(('user_name\n"SYSTEM"\n"ADMIN"\n{0}\n1\n'
+                              '{0}\n1\n'
+                              'ONE\n1\n{0}\n1\n').format(marker))
+            return 0, '', ''
+
+        with patch.object(basic.AnsibleModule, 'run_command', side_effect=run_command):
+            with self.assertRaises(AnsibleExitJson) as result:
+                with set_module_args(args):
+                    self.module.main()
+
+        with open(args['output_file']) as output_file:
+            content = output_file.read()
+        shutil.rmtree(tmp_dir)
+        self.assertEqual(content.splitlines(), ['user_name', 'SYSTEM', 'ADMIN', 'ONE', '1'])
+        self.assertEqual(result.exception.args[0]['row_count'], [2, 0, 1])
+
+    def test_result_format_columnar(self):
+        """Verify that the columnar result format returns the column names once"""
+        args = {
+            'sid': "HDB",
+            'instance': "01",
+            'password': "pwd",
+            'result_format': 'columnar',
+            'query': ["SELECT * FROM users", "UPDATE users SET name='test'"]
+        }
+        with patch.object(basic.AnsibleModule, 'run_command') as run_command:
+            run_command.side_effect = [(0, 'username,name\n  testuser,test user  \n myuser, my user   \n', ''), (0, '', '')]
+            with self.assertRaises(AnsibleExitJson) as result:
+                with set_module_args(args):
+                    self.module.main()
+
+        self.assertEqual(result.exception.args[0]['query_result'], [
+            {'columns': ['username', 'name'], 'rows': [['testuser', 'test user'], ['myuser', 'my user']]},
+            {'columns': [], 'rows': []},
+        ])
+
+    def test_result_format_columnar_hdbcli(self):
+        """Verify that the columnar result format is built while fetching with hdbcli"""
+        args = {
+            'instance': "01",
+            'password': "pwd",
+            'engine': 'hdbcli',
+            'result_format': 'columnar',
+            'query': ["SELECT * FROM users"]
+        }
+        dbapi = MagicMock()
+        cursor = dbapi.connect.return_value.cursor.return_value
+        cursor.description = [('USER_NAME',), ('SIZE',)]
+        cursor.fetchmany.side_effect = [[('SYSTEM', 1), ('ADMIN', 2)], []]
+
+        with patch.object(self.module, 'HAS_HDBCLI_LIBRARY', True):
+            with patch.object(self.module, 'dbapi', dbapi, create=True):
+                with self.assertRaises(AnsibleExitJson) as result:
+                    with set_module_args(args):
+                        self.module.main()
+
+        self.assertEqual(result.exception.args[0]['query_result'], [
+            {'columns': ['USER_NAME', 'SIZE'], 'rows': [['SYSTEM', 1], ['ADMIN', 2]]},
+        ])
+
+    def test_databases(self):
+        """Check that the queries run on every database and the results are keyed by database."""
+        args = {
+            'sid': "HDB",
+            'instance': "01",
+            'password': "pwd",
+            'databases': ["SYSTEMDB", "HDB"],
+            'max_workers': 2,
+            'query': ["SELECT COUNT(*) AS CONNECTIONS FROM M_CONNECTIONS"]
+        }
+
+        def run_command(cmd, **kwargs):
+            database = cmd[cmd.index('-d') + 1]
+            return 0, 'CONNECTIONS\n{0}\n'.format(len(database)), ''
+
+        with patch.object(basic.AnsibleModule, 'run_command', side_effect=run_command):
+            with self.assertRaises(AnsibleExitJson) as result:
+                with set_module_args(args):
+                    self.module.main()
+        self.assertEqual(result.exception.args[0]['database_results'], {
+            'SYSTEMDB': {'query_result': [[{'CONNECTIONS': '8'}]], 'error': ''},
+            'HDB': {'query_result': [[{'CONNECTIONS': '3'}]], 'error': ''},
+        })
+
+    def test_discover_databases_failure(self):
+        """Check that the databases are discovered and a failed database fails the module."""
+        args = {
+            'sid': "HDB",
+            'instance': "01",
+            'password': "pwd",
+            'discover_databases': True,
+            'query': ["SELECT 1 AS ONE FROM DUMMY"]
+        }
+
+        def run_command(cmd, **kwargs):
+            database = cmd[cmd.index('-d') + 1]
+            if cmd[-1] == sap_hdbsql.DISCOVER_QUERY:
+                self.assertEqual(database, 'SYSTEMDB')
+                return 0, 'DATABASE_NAME\nSYSTEMDB\nHDB\nQAS\n', ''
+            if database == 'QAS':
+                return 1, '', '* 258: insufficient privilege'
+            return 0, 'ONE\n1\n', ''
+
+        with patch.object(basic.AnsibleModule, 'run_command', side_effect=run_command):
+            with self.assertRaises(AnsibleFailJson) as result:
+                with set_module_args(args):
+                    self.module.main()
+        self.assertIn("QAS", result.exception.args[0]['msg'])
+        database_results = result.exception.args[0]['database_results']
+        self.assertEqual(sorted(database_results), ['HDB', 'QAS', 'SYSTEMDB'])
+        self.assertEqual(database_results['HDB']['query_result'], [[{'ONE': '1'}]])
+        self.assertEqual(database_results['QAS']['error'], "SAP HANA Authorization Error: The user has insufficient privileges to perform this action.")
+
+    def test_cache(self):
+        """Check that SELECT results are returned from the cache and only the missing queries are executed."""
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        args = {
+            'sid': "HDB",
+            'instance': "01",
+            'password': "pwd",
+            'cache': True,
+            'cache_dir': cache_dir,
+            'query': ["SELECT VERSION FROM M_DATABASE;"]
+        }
+        with patch.object(basic.AnsibleModule, 'run_command') as run_command:
+            run_command.return_value = 0, 'VERSION\n2.00.070\n', ''
+            with self.assertRaises(AnsibleExitJson) as result:
+                with set_module_args(args):
+                    self.module.main()
+            self.assertEqual(result.exception.args[0]['cache_hits'], 0)
+
+            args['query'] = ["select  VERSION from M_DATABASE", "SELECT * FROM M_SERVICES"]
+            run_command.return_value = 0, 'SERVICE_NAME\nindexserver\n', ''
+            with self.assertRaises(AnsibleExitJson) as result:
+                with set_module_args(args):
+                    self.module.main()
+        self.assertEqual(result.exception.args[0]['cache_hits'], 0)
+        self.assertEqual(run_command.call_count, 3)
+
+        args['query'] = ["SELECT VERSION FROM M_DATABASE", "SELECT * FROM M_SERVICES"]
+        with patch.object(basic.AnsibleModule, 'run_command') as run_command:
+            with self.assertRaises(AnsibleExitJson) as result:
+                with set_module_args(args):
+                    self.module.main()
+        run_command.assert_not_called()
+        self.assertEqual(result.exception.args[0]['cache_hits'], 2)
+        self.assertEqual(result.exception.args[0]['query_result'], [[{'VERSION': '2.00.070'}], [{'SERVICE_NAME': 'indexserver'}]])
+
+    def test_cache_key(self):
+        """Check that string literals and connection options are part of the cache key."""
+        params = dict((name, None) for name in self.module.CACHE_KEY_PARAMS)
+        params.update(instance="01", user="SYSTEM", result_format="rows")
+        key = self.module.query_cache_key(params, 'hdbsql', "SELECT * FROM T WHERE X = 'a b'")
+
+        self.assertEqual(self.module.query_cache_key(params, 'hdbsql', "  SELECT * FROM T WHERE X = 'a b' ;\n"), key)
+        self.assertNotEqual(self.module.query_cache_key(params, 'hdbsql', "SELECT * FROM T WHERE X = 'a  b'"), key)
+        self.assertNotEqual(self.module.query_cache_key(params, 'hdbcli', "SELECT * FROM T WHERE X = 'a b'"), key)
+        for name, value in (('encrypted', True), ('properties', ['locale=de_DE']), ('database', 'HDB'), ('host', 'hana:30015')):
+            self.assertNotEqual(self.module.query_cache_key(dict(params, **{name: value}), 'hdbsql', "SELECT * FROM T WHERE X = 'a b'"), key)
+        self.assertEqual(self.module.query_cache_key(dict(params, password='other'), 'hdbsql', "SELECT * FROM T WHERE X = 'a b'"), key)
+
+    def test_cache_not_used_for_changes(self):
+        """Check that nothing is cached if a query is not a SELECT."""
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        args = {
+            'sid': "HDB",
+            'instance': "01",
+            'password': "pwd",
+            'cache': True,
+            'cache_dir': cache_dir,
+            'query': ["SELECT 1 FROM DUMMY", "DELETE FROM T"]
+        }
+        with patch.object(basic.AnsibleModule, 'run_command') as run_command:
+            run_command.return_value = 0, '1\n1\n', ''
+            with self.assertRaises(AnsibleExitJson) as result:
+                with set_module_args(args):
+                    self.module.main()
+        self.assertNotIn('cache_hits', result.exception.args[0])
+        self.assertEqual(os.listdir(cache_dir), [])
+
+    def test_cache_not_used_with_filepath(self):
+        """Check that nothing is cached if files are executed, also with a progress file."""
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        script = os.path.join(cache_dir, 'report.sql')
+        with open(script, 'w') as f:
+            f.write("SELECT 2 FROM DUMMY;\n")
+        args = {
+            'sid': "HDB",
+            'instance': "01",
+            'password': "pwd",
+            'cache': True,
+            'cache_dir': os.path.join(cache_dir, 'cache'),
+            'query': ["SELECT 1 AS one FROM DUMMY"],
+            'filepath': [script],
+            'progress_file': os.path.join(cache_dir, 'report.progress'),
+        }
+        executed = []
+        run_file = streamed_file_runner(executed)
+
+        def run_command(cmd):
+            if '-E' in cmd:
+                return run_file(cmd)
+            return 0, 'ONE\n1\n', ''
+
+        for dummy in range(2):
+            with patch.object(basic.AnsibleModule, 'run_command', side_effect=run_command) as mock_run:
+                with self.assertRaises(AnsibleExitJson) as result:
+                    with set_module_args(args):
+                        self.module.main()
+            self.assertEqual(mock_run.call_count, 2)
+            self.assertNotIn('cache_hits', result.exception.args[0])
+            self.assertEqual(result.exception.args[0]['query_result'], [[{'ONE': '1'}]])
+        self.assertFalse(os.path.exists(args['cache_dir']))
+
+    def test_load_hdbsql(self):
+        """Verify that a CSV file is loaded with one INSERT per batch and the commits in one hdbsql session"""
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        src = os.path.join(tmp_dir, 'countries.csv')
+        with open(src, 'w') as f:
+            f.write('CODE,NAME,POPULATION\nDE,Germany,83\nFR,France,68\nIT,"Italy, Republic",\n')
+        args = {
+            'sid': "HDB",
+            'instance': "01",
+            'password': "pwd",
+            'load': {'src': src, 'table': 'MYSCHEMA.COUNTRIES', 'batch_size': 2, 'commit_interval': 2},
+        }
+        batches = []
+
+        def run_command(cmd, **kwargs):
+            with open(cmd[cmd.index('-I') + 1]) as f:
+                batches.append(f.read())
+            return 0, '', ''
+
+        with patch.object(basic.AnsibleModule, 'run_command', side_effect=run_command) as mock_run:
+            with self.assertRaises(AnsibleExitJson) as result:
+                with set_module_args(args):
+                    self.module.main()
+
+        cmd = mock_run.call_args[0][0]
+        self.assertIn('-z', cmd)
+        separator = cmd[cmd.index('-c') + 1]
+        statements = [s.strip() for s in batches[0].split(separator) if s.strip()]
+        self.assertEqual(statements, [
+            'INSERT INTO MYSCHEMA.COUNTRIES ("CODE", "NAME", "POPULATION") '
+            "SELECT 'DE', 'Germany', '83' FROM DUMMY UNION ALL SELECT 'FR', 'France', '68' FROM DUMMY",
+            'COMMIT',
+            'INSERT INTO MYSCHEMA.COUNTRIES ("CODE", "NAME", "POPULATION") '
+            "SELECT 'IT', 'Italy, Republic', NULL FROM DUMMY",
+            'COMMIT',
+        ])
+        res = result.exception.args[0]
+        self.assertTrue(res['changed'])
+        self.assertEqual(res['load_result']['rows'], 3)
+        self.assertEqual(res['load_result']['batches'], 2)
+        self.assertEqual(res['load_result']['commits'], 2)
+        self.assertIn('rows_per_second', res['load_result'])
+
+    def test_load_hdbcli(self):
+        """Verify that a JSON lines file is loaded with array inserts over hdbcli"""
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        src = os.path.join(tmp_dir, 'countries.jsonl')
+        with open(src, 'w') as f:
+            f.write('{"CODE": "DE", "POPULATION": 83}\n\n{"CODE": "FR", "POPULATION": 68}\n{"CODE": "IT"}\n')
+        args = {
+            'instance': "01",
+            'password': "pwd",
+            'engine': 'hdbcli',
+            'load': {'src': src, 'table': 'COUNTRIES', 'format': 'jsonl', 'batch_size': 2},
+        }
+        dbapi = MagicMock()
+        conn = dbapi.connect.return_value
+        cursor = conn.cursor.return_value
+
+        with patch.object(self.module, 'HAS_HDBCLI_LIBRARY', True):
+            with patch.object(self.module, 'dbapi', dbapi, create=True):
+                with self.assertRaises(AnsibleExitJson) as result:
+                    with set_module_args(args):
+                        self.module.main()
+
+        conn.setautocommit.assert_called_once_with(False)
+        self.assertEqual([c[0] for c in cursor.executemany.call_args_list], [
+            ('INSERT INTO COUNTRIES ("CODE", "POPULATION") VALUES (?, ?)', [['DE', 83], ['FR', 68]]),
+            ('INSERT INTO COUNTRIES ("CODE", "POPULATION") VALUES (?, ?)', [['IT', None]]),
+        ])
+        self.assertEqual(conn.commit.call_count, 1)
+        self.assertEqual(result.exception.args[0]['load_result']['rows'], 3)
+
+    def test_statistics(self):
+        """Verify that the duration and row count of every query are returned"""
+        args = {
+            'sid': "HDB",
+            'instance': "01",
+            'password': "pwd",
+            'statistics': True,
+            'query': ["SELECT * FROM M_SERVICES", "UPDATE T SET A = 1"]
+        }
+        with patch.object(basic.AnsibleModule, 'run_command') as run_command:
+            run_command.side_effect = [(0, 'SERVICE_NAME\nindexserver\nnameserver\n', ''), (0, '', '')]
+            with self.assertRaises(AnsibleExitJson) as result:
+                with set_module_args(args):
+                    self.module.main()
+
+        statistics = result.exception.args[0]['statement_statistics']
+        self.assertEqual([(s['statement'], s['rows']) for s in statistics],
+                         [("SELECT * FROM M_SERVICES", 2), ("UPDATE T SET A = 1", 0)])
+        self.assertTrue(all(isinstance(s['seconds'], float) for s in statistics))
+
+    def test_statistics_hdbcli(self):
+        """Verify that the server statistics of every query are returned with hdbcli"""
+        args = {
+            'instance': "01",
+            'password': "pwd",
+            'engine': 'hdbcli',
+            'statistics': True,
+            'query': ["SELECT * FROM M_SERVICES"]
+        }
+        cursor = MagicMock()
+        cursor.description = [('SERVICE_NAME',)]
+        cursor.fetchmany.side_effect = [[('indexserver',), ('nameserver',)], []]
+        cursor.server_processing_time.return_value = 1500
+        cursor.server_cpu_time.return_value = 1200
+        cursor.server_memory_usage.return_value = 65536
+        dbapi = MagicMock()
+        dbapi.connect.return_value.cursor.return_value = cursor
+
+        with patch.object(self.module, 'HAS_HDBCLI_LIBRARY', True):
+            with patch.object(self.module, 'dbapi', dbapi, create=True):
+                with self.assertRaises(AnsibleExitJson) as result:
+                    with set_module_args(args):
+                        self.module.main()
+
+        statistics = result.exception.args[0]['statement_statistics']
+        self.assertEqual(len(statistics), 1)
+        self.assertEqual(statistics[0]['rows'], 2)
+        self.assertEqual(statistics[0]['server_processing_time'], 1500)
+        self.assertEqual(statistics[0]['server_cpu_time'], 1200)
+        self.assertEqual(statistics[0]['server_memory_usage'], 65536)
+
+    def test_max_rows_query_result(self):
+        """Verify that query_result is truncated at max_rows and hdbsql is stopped"""
+        args = {
+            'sid': "HDB",
+            'instance': "01",
+            'password': "pwd",
+            'max_rows': 2,
+            'query': ["SELECT * FROM users", "SELECT 1 AS ONE FROM DUMMY"]
+        }
+
+        def run_command(cmd):
+            with open(cmd[cmd.index('-o') + 1], 'w') as output:
+                if 'users' in cmd[-3]:
+                    output.write('username\n"SYSTEM"\n"ADMIN"\n"OTHER"\n"LAST"\n')
+                else:
+                    output.write('ONE\n1\n')
+            return 0, '', ''
+
+        with patch.object(basic.AnsibleModule, 'run_command', side_effect=run_command) as mock_run:
+            with self.assertRaises(AnsibleExitJson) as result:
+                with set_module_args(args):
+                    self.module.main()
+
+        self.assertEqual(mock_run.call_count, 2)
+        res = result.exception.args[0]
+        self.assertEqual(res['query_result'], [[{'username': 'SYSTEM'}, {'username': 'ADMIN'}], [{'ONE': '1'}]])
+        self.assertTrue(res['truncated'])
+        self.assertEqual(res['total_rows'], [None, 1])
+
+    def test_max_bytes_session(self):
+        """Verify that query_result is truncated at max_bytes and the total rows are counted in a session"""
+        args = {
+            'sid': "HDB",
+            'instance': "01",
+            'password': "pwd",
+            'session': True,
+            'max_bytes': 25,
+            'query': ["SELECT user_name FROM users", "SELECT 1 AS one FROM DUMMY"]
+        }
+
+        def run_command(cmd):
+            with open(cmd[cmd.index('-I') + 1]) as batch_file:
+                marker = batch_file.read().split('"')[1]
+            with open(cmd[cmd.index('-o') + 1], 'w') as output:
+                output.write(('user_name\n"SYSTEM"\n"ADMIN"\n"OTHER"\n{0}\n1\n'
+                              'ONE\n1\n{0}\n1\n').format(marker))
+            return 0, '', ''
+
+        with patch.object(basic.AnsibleModule, 'run_command', side_effect=run_command):
+            with self.assertRaises(AnsibleExitJson) as result:
+                with set_module_args(args):
+                    self.module.main()
+
+        res = result.exception.args[0]
+        self.assertEqual(res['query_result'], [[{'user_name': 'SYSTEM'}, {'user_name': 'ADMIN'}], []])
+        self.assertTrue(res['truncated'])
+        self.assertEqual(res['total_rows'], [3, 1])
+
+    def test_progress_file_comments(self):
+        """Verify that comments between and after the statements are neither executed nor counted"""
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        script = os.path.join(tmp_dir, 'report.sql')
+        with open(script, 'w') as f:
+            f.write("-- header\nSELECT 1 FROM DUMMY;\n-- between\n/* block ; */\n;\n"
+                    "/* leading */ SELECT 'a -- b' FROM DUMMY; -- trailing\n-- end of script\n")
+        args = {
+            'sid': "HDB",
+            'instance': "01",
+            'password': "pwd",
+            'filepath': [script],
+            'progress_file': os.path.join(tmp_dir, 'report.progress'),
+        }
+        executed = []
+
+        with patch.object(basic.AnsibleModule, 'run_command', side_effect=streamed_file_runner(executed)):
+            with self.assertRaises(AnsibleExitJson) as result:
+                with set_module_args(args):
+                    self.module.main()
+
+        self.assertEqual(executed, ["SELECT 1 FROM DUMMY", "SELECT 'a -- b' FROM DUMMY"])
+        self.assertFalse(result.exception.args[0]['changed'])
+        progress = result.exception.args[0]['progress'][0]
+        self.assertEqual((progress['executed'], progress['statement']), (2, 2))
+
+        args['resume'] = True
+        executed[:] = []
+        with patch.object(basic.AnsibleModule, 'run_command', side_effect=streamed_file_runner(executed)):
+            with self.assertRaises(AnsibleExitJson) as result:
+                with set_module_args(args):
+                    self.module.main()
+
+        self.assertEqual(executed, [])
+        self.assertEqual(result.exception.args[0]['progress'][0]['skipped'], 2)
+
+    def test_progress_file_resume_changed(self):
+        """Verify that a resumed run is changed if it executes a write statement, and not changed if nothing is left"""
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        script = os.path.join(tmp_dir, 'migration.sql')
+        statements = "SELECT 1 FROM DUMMY;\nUPDATE T SET A = 'x';\n"
+        with open(script, 'w') as f:
+            f.write(statements)
+        progress_path = os.path.join(tmp_dir, 'migration.progress')
+        with open(progress_path, 'w') as f:
+            f.write(json.dumps(dict(file=script, statement=1, offset=statements.index(';') + 1)) + "\n")
+        args = {
+            'sid': "HDB",
+            'instance': "01",
+            'password': "pwd",
+            'filepath': [script],
+            'progress_file': progress_path,
+            'resume': True,
+        }
+        executed = []
+        run_command = streamed_file_runner(executed)
+
+        with patch.object(basic.AnsibleModule, 'run_command', side_effect=run_command):
+            with self.assertRaises(AnsibleExitJson) as result:
+                with set_module_args(args):
+                    self.module.main()
+
+        self.assertEqual(executed, ["UPDATE T SET A = 'x'"])
+        self.assertTrue(result.exception.args[0]['changed'])
+        self.assertEqual(result.exception.args[0]['progress'][0]['executed'], 1)
+
+        executed[:] = []
+        with patch.object(basic.AnsibleModule, 'run_command', side_effect=run_command):
+            with self.assertRaises(AnsibleExitJson) as result:
+                with set_module_args(args):
+                    self.module.main()
+
+        self.assertEqual(executed, [])
+        self.assertFalse(result.exception.args[0]['changed'])
+        self.assertEqual(result.exception.args[0]['progress'][0]['skipped'], 2)
+
+    def test_progress_file_resume(self):
+        """Verify that files are streamed statement by statement with progress and resumed after a failure"""
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        script = os.path.join(tmp_dir, 'migration.sql')
+        statements = ("CREATE TABLE T (A VARCHAR(10));\n"
+                      "INSERT INTO T VALUES ('a;b'); -- comment; here\n"
+                      "/* block ; */ INSERT INTO T VALUES ('c');\n"
+                      "{0};\n" + "".join("INSERT INTO T VALUES ('{0}');\n".format(i) for i in range(3000)))
+        with open(script, 'w') as f:
+            f.write(statements.format("FAIL"))
+        args = {
+            'sid': "HDB",
+            'instance': "01",
+            'password': "pwd",
+            'filepath': [script],
+            'progress_file': os.path.join(tmp_dir, 'migration.progress'),
+        }
+        executed = []
+
+        def run_command(cmd):
+            separator = cmd[cmd.index('-c') + 1]
+            with open(cmd[cmd.index('-I') + 1]) as batch, open(cmd[cmd.index('-o') + 1], 'w') as output:
+                lines = []
+                for line in batch:
+                    if line.strip() != separator:
+                        lines.append(line)
+                        continue
+                    statement = "".join(lines).strip()
+                    lines = []
+                    if statement.startswith('SELECT 1 AS "ANSIBLE_RESULT_'):
+                        output.write('{0}\n1\n'.format(statement.split('"')[1]))
+                    elif statement == 'FAIL':
+                        return 1, '', '* 257: sql syntax error'
+                    else:
+                        executed.append(statement)
+            return 0, '', ''
+
+        with patch.object(basic.AnsibleModule, 'run_command', side_effect=run_command):
+            with self.assertRaises(AnsibleFailJson) as result:
+                with set_module_args(args):
+                    self.module.main()
+
+        progress = result.exception.args[0]['progress']
+        self.assertEqual(executed[:2], ["CREATE TABLE T (A VARCHAR(10))", "INSERT INTO T VALUES ('a;b')"])
+        self.assertTrue(executed[2].endswith("INSERT INTO T VALUES ('c')"))
+        self.assertEqual(len(executed), 3)
+        self.assertEqual(progress[0]['statement'], 3)
+        self.assertEqual(progress[0]['offset'], statements.index("{0};") - 1)
+
+        with open(script, 'w') as f:
+            f.write(statements.format("SELECT 1 FROM DUMMY"))
+        args['resume'] = True
+        executed[:] = []
+        with patch.object(basic.AnsibleModule, 'run_command', side_effect=run_command):
+            with self.assertRaises(AnsibleExitJson) as result:
+                with set_module_args(args):
+                    self.module.main()
+
+        progress = result.exception.args[0]['progress']
+        self.assertTrue(result.exception.args[0]['changed'])
+        self.assertEqual(executed[0], "SELECT 1 FROM DUMMY")
+        self.assertEqual(executed[-1], "INSERT INTO T VALUES ('2999')")
+        self.assertEqual(progress, [{'file': script, 'skipped': 3, 'executed': 3001, 'changed': True, 'statement': 3004,
+                                     'offset': len(statements.format("SELECT 1 FROM DUMMY")) - 1}])
+        with open(args['progress_file']) as progress_file:
+            self.assertEqual(len(progress_file.readlines()), 3 + 3001)
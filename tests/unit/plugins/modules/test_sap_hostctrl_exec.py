@@ -39,9 +39,14 @@ class TestSapcontrolModule(ModuleTestCase):
         # Patch HAS_SUDS_LIBRARY for all tests
         self.patcher_suds = patch.object(self.module, 'HAS_SUDS_LIBRARY', True)
         self.patcher_suds.start()
+        # Do not probe the ports of the test hosts
+        self.patcher_probe = patch('ansible_collections.community.sap_libs.plugins.module_utils.sapstartsrv_client.probe_ports',
+                                   return_value=[])
+        self.mock_probe = self.patcher_probe.start()
 
     def tearDown(self):
         self.patcher_suds.stop()
+        self.patcher_probe.stop()
         super(TestSapcontrolModule, self).tearDown()
 
     def define_rfc_connect(self, mocker):
@@ -192,3 +197,22 @@ class TestSapcontrolModule(ModuleTestCase):
                     with set_module_args(args):
                         self.module.main()
         self.assertEqual(result.exception.args[0]['out'], [ret_dict])
+
+    def test_cache_options(self):
+        """Test that the WSDL cache settings are passed to the client."""
+        args = {
+            "hostname": "192.168.8.15",
+            "port": 1128,
+            "function": "ListInstances",
+            "cache": True,
+            "cache_dir": "/tmp/sap_libs_cache",
+        }
+        with patch.object(self.module, 'connection') as mock_connection:
+            mock_connection.return_value = None
+            with self.assertRaises(AnsibleExitJson):
+                with set_module_args(args):
+                    self.module.main()
+
+        kwargs = mock_connection.call_args[1]
+        self.assertEqual(kwargs['cache_dir'], "/tmp/sap_libs_cache")
+        self.assertEqual(kwargs['cache_ttl'], 86400)
@@ -28,6 +28,7 @@ from ansible_collections.community.sap_libs.tests.unit.plugins.modules.utils imp
 sys.modules['pyrfc'] = MagicMock()
 sys.modules['pyrfc.Connection'] = MagicMock()
 from ansible_collections.community.sap_libs.plugins.modules import sap_pyrfc
+from ansible_collections.community.sap_libs.plugins.module_utils.pyrfc_handler import ConnectionPool
 
 
 class TestSAPRfcModule(ModuleTestCase):
@@ -85,3 +86,48 @@ class TestSAPRfcModule(ModuleTestCase):
                 with set_module_args(args):
                     self.module.main()
         self.assertEqual(result.exception.args[0]['changed'], True)
+
+    def test_connection_pool(self):
+        """tests that the pool reuses alive connections per logon and closes all of them"""
+        connections = []
+
+        def factory(**conn_params):
+            conn = MagicMock(alive=True)
+            connections.append(conn)
+            return conn
+
+        pool = ConnectionPool(factory)
+        params = {"ashost": "s4hana.poc.cloud", "sysnr": "01", "client": "400", "user": "DDIC", "passwd": "Password1"}
+
+        first = pool.acquire(params)
+        second = pool.acquire(params)
+        self.assertIsNot(first, second)
+        pool.release(first)
+        self.assertIs(pool.acquire(dict(params, user="ddic")), first)
+        pool.release(first)
+        other = pool.acquire(dict(params, client="100"))
+        self.assertIsNot(other, first)
+        self.assertIs(pool.acquire(params), first)
+
+        first.alive = False
+        pool.release(first)
+        self.assertEqual(first.close.call_count, 1)
+        self.assertIsNot(pool.acquire(params), first)
+
+        pool.close()
+        self.assertEqual(len(connections), 4)
+        self.assertTrue(all(conn.close.call_count == 1 for conn in connections))
+        self.assertEqual(pool.stats, dict(opened=4, reused=2, closed=4))
+
+    def test_connection_pool_acquire_factory(self):
+        """tests that the factory given to acquire is used instead of the one of the pool"""
+        pool_factory = MagicMock()
+        factory = MagicMock()
+        pool = ConnectionPool(pool_factory)
+        params = {"ashost": "s4hana.poc.cloud", "sysnr": "01", "client": "400", "user": "DDIC", "passwd": "Password1"}
+
+        conn = pool.acquire(params, factory)
+        self.assertIs(conn, factory.return_value)
+        factory.assert_called_once_with(**params)
+        self.assertEqual(pool_factory.call_count, 0)
+        pool.close()
@@ -20,7 +20,9 @@
 from __future__ import (absolute_import, division, print_function)
 __metaclass__ = type
 
+import shutil
 import sys
+import tempfile
 from unittest.mock import patch, MagicMock, Mock
 from ansible_collections.community.sap_libs.tests.unit.plugins.modules.utils import AnsibleExitJson, AnsibleFailJson, ModuleTestCase, set_module_args
 
@@ -205,3 +207,60 @@ class TestSAPRfcModule(ModuleTestCase):
                         with set_module_args(args):
                             self.module.main()
         self.assertEqual(result.exception.args[0]['msg'], 'SNOTE "000123456" implemented.')
+
+    def test_check_implementation_exact(self):
+        """test SNOTE numbers are compared exactly, without leading zeros"""
+
+        implemented = {'ET_NOTES_IMPL': [{'NUMM': '0029491481'}, {'NUMM': '0002980265'}]}
+        with patch.object(self.module, 'call_rfc_method', return_value=implemented) as call:
+            notes = self.module.ImplementedNotes(MagicMock())
+            self.assertFalse(self.module.check_implementation(None, '2949148', notes))
+            self.assertFalse(self.module.check_implementation(None, '0002949148', notes))
+            self.assertTrue(self.module.check_implementation(None, '2980265', notes))
+            self.assertTrue(self.module.check_implementation(None, '0002980265', notes))
+        self.assertEqual(call.call_count, 1)
+
+    @patch.object(sap_snote, 'HAS_PYRFC_LIBRARY', True)
+    def test_cache(self):
+        """test the implemented SNOTES are read once and renewed after an implementation"""
+
+        tmp_dir = tempfile.mkdtemp()
+        args = {
+            "conn_username": "ADMIN",
+            "conn_password": "Test1234",
+            "host": "10.1.8.9",
+            "state": "present",
+            "snote": "0002980265",
+            "cache": True,
+            "cache_dir": tmp_dir,
+        }
+        responses = {
+            'SCWB_API_GET_NOTES_IMPLEMENTED': [{'ET_NOTES_IMPL': [{'NUMM': '0002980265'}]}],
+            'SCWB_API_NOTES_IMPLEMENT': [{'EV_RC': 0}],
+            'SCWB_API_CINST_QUEUE_GET': [{'ET_MANUAL_ACTIVITIES': ''}],
+        }
+        try:
+            with patch.object(self.module, 'call_rfc_method', side_effect=lambda conn, method, kwargs: responses[method].pop(0)) as call:
+                for dummy in range(2):
+                    with self.assertRaises(AnsibleExitJson) as result:
+                        with set_module_args(args):
+                            self.module.main()
+                    self.assertEqual(result.exception.args[0]['msg'], 'Nothing to do.')
+            self.assertEqual(call.call_count, 1)
+
+            # implementing renews the cached SNOTES for the following tasks
+            args['snote'] = '0002949148'
+            responses['SCWB_API_GET_NOTES_IMPLEMENTED'].append({'ET_NOTES_IMPL': [{'NUMM': '0002980265'}, {'NUMM': '0002949148'}]})
+            with patch.object(self.module, 'call_rfc_method', side_effect=lambda conn, method, kwargs: responses[method].pop(0)) as call:
+                with self.assertRaises(AnsibleExitJson) as result:
+                    with set_module_args(args):
+                        self.module.main()
+                self.assertEqual(result.exception.args[0]['msg'], 'SNOTE "0002949148" implemented.')
+                with self.assertRaises(AnsibleExitJson) as result:
+                    with set_module_args(args):
+                        self.module.main()
+                self.assertEqual(result.exception.args[0]['msg'], 'Nothing to do.')
+            self.assertEqual([c[0][1] for c in call.call_args_list],
+                             ['SCWB_API_NOTES_IMPLEMENT', 'SCWB_API_CINST_QUEUE_GET', 'SCWB_API_GET_NOTES_IMPLEMENTED'])
+        finally:
+            shutil.rmtree(tmp_dir)
@@ -210,3 +210,139 @@ class TestSAPRfcModule(ModuleTestCase):
                     with set_module_args(args):
                         sap_user.main()
         self.assertEqual(result.exception.args[0]['msg'], 'User ADMIN unlocked')
+
+    def test_users(self):
+        """test several users processed with one logon and a report per user"""
+
+        args = {
+            "conn_username": "DDIC",
+            "conn_password": "Test1234",
+            "host": "10.1.8.9",
+            "company": "DEFAULT_COMPANY",
+            "users": [
+                {"username": "jdoe", "useralias": "JDOE", "firstname": "John"},
+                {"username": "mmuster", "useralias": "MMUSTER"},
+                {"username": "old", "state": "absent"},
+            ]
+        }
+
+        def call_rfc_method(conn, method_name, kwargs):
+            if method_name == 'BAPI_USER_GET_DETAIL':
+                number = '124' if kwargs['USERNAME'] == 'JDOE' else '000'
+                return {'RETURN': [{'NUMBER': number}], 'ADDRESS': {'FIRSTNAME': None, 'LASTNAME': None, 'E_MAIL': None}}
+            if method_name == 'BAPI_USER_CREATE1':
+                return {'RETURN': [{'MESSAGE': 'User JDOE created', 'NUMBER': '102', 'TYPE': 'S'}]}
+            if method_name == 'BAPI_USER_DELETE':
+                return {'RETURN': [{'MESSAGE': 'User OLD deleted', 'NUMBER': '102', 'TYPE': 'S'}]}
+            return {'RETURN': []}
+
+        with patch.object(self.module, 'Connection') as connection:
+            with patch.object(self.module, 'call_rfc_method', side_effect=call_rfc_method) as RAW:
+                with self.assertRaises(AnsibleExitJson) as result:
+                    with set_module_args(args):
+                        sap_user.main()
+
+        self.assertEqual(connection.call_count, 1)
+        connection.return_value.close.assert_called_once_with()
+        self.assertIn(('BAPI_USER_CREATE1',), [c[0][1:2] for c in RAW.call_args_list])
+        self.assertTrue(result.exception.args[0]['changed'])
+        self.assertEqual([(u['username'], u['state'], u['changed'], u['failed'], u['msg']) for u in result.exception.args[0]['users']], [
+            ('JDOE', 'present', True, False, 'User JDOE created'),
+            ('MMUSTER', 'present', False, False, 'No changes where made.'),
+            ('OLD', 'absent', True, False, 'User OLD deleted'),
+        ])
+
+    def test_users_failed(self):
+        """test that a failing user fails the task after all users were processed"""
+
+        args = {
+            "conn_username": "DDIC",
+            "conn_password": "Test1234",
+            "host": "10.1.8.9",
+            "state": "lock",
+            "max_connections": 2,
+            "users": [{"username": "A"}, {"username": "B"}]
+        }
+
+        def call_rfc_method(conn, method_name, kwargs):
+            if method_name == 'BAPI_USER_LOCK' and kwargs['USERNAME'] == 'A':
+                raise Exception('RFC_ERROR_SYSTEM_FAILURE')
+            return {'RETURN': [{'MESSAGE': 'User locked', 'NUMBER': '206', 'TYPE': 'S'}]}
+
+        with patch.object(self.module, 'Connection'):
+            with patch.object(self.module, 'call_rfc_method', side_effect=call_rfc_method):
+                with self.assertRaises(AnsibleFailJson) as result:
+                    with set_module_args(args):
+                        sap_user.main()
+
+        self.assertEqual(result.exception.args[0]['msg'], 'Failed for users: A')
+        self.assertEqual([u['failed'] for u in result.exception.args[0]['users']], [True, False])
+
+    def test_users_logon_failed(self):
+        """test that a failing logon only fails the user it was opened for"""
+
+        args = {
+            "conn_username": "DDIC",
+            "conn_password": "Test1234",
+            "host": "10.1.8.9",
+            "state": "lock",
+            "users": [{"username": "A"}, {"username": "B"}]
+        }
+        first = MagicMock(alive=True)
+
+        def call_rfc_method(conn, method_name, kwargs):
+            # the connection is lost with the first user, so the second one needs a new logon
+            conn.alive = False
+            return {'RETURN': [{'MESSAGE': 'User locked', 'NUMBER': '206', 'TYPE': 'S'}]}
+
+        with patch.object(self.module, 'Connection', side_effect=[first, Exception('RFC_ERROR_LOGON_FAILURE')]) as connection:
+            with patch.object(self.module, 'call_rfc_method', side_effect=call_rfc_method):
+                with self.assertRaises(AnsibleFailJson) as result:
+                    with set_module_args(args):
+                        sap_user.main()
+
+        self.assertEqual(connection.call_count, 2)
+        self.assertEqual(result.exception.args[0]['msg'], 'Failed for users: B')
+        self.assertEqual([(u['username'], u['failed'], u['msg']) for u in result.exception.args[0]['users']],
+                         [('A', False, 'User locked'), ('B', True, 'RFC_ERROR_LOGON_FAILURE')])
+
+    def test_assignment_diff(self):
+        """test that roles and profiles are only assigned if they differ from the current assignments"""
+
+        args = {
+            "conn_username": "DDIC",
+            "conn_password": "Test1234",
+            "host": "10.1.8.9",
+            "username": "ADMIN",
+            "useralias": "ADMIN",
+            "company": "DEFAULT_COMPANY",
+            "roles": ["Z_ADMIN", "z_audit"],
+            "profiles": ["SAP_ALL"],
+        }
+        detail = {'RETURN': [], 'ADDRESS': {'FIRSTNAME': None, 'LASTNAME': None, 'E_MAIL': None},
+                  'ACTIVITYGROUPS': [{'AGR_NAME': 'Z_ADMIN', 'TO_DAT': '20991231'},
+                                     {'AGR_NAME': 'Z_AUDIT', 'TO_DAT': self.module.datetime.date(2099, 12, 31)},
+                                     {'AGR_NAME': 'Z_OLD', 'TO_DAT': '20000101'}],
+                  'PROFILES': [{'BAPIPROF': 'SAP_ALL'}]}
+
+        def call_rfc_method(conn, method_name, kwargs):
+            if method_name == 'BAPI_USER_GET_DETAIL':
+                return detail
+            return {'RETURN': [{'MESSAGE': 'Assignment changed', 'NUMBER': '048', 'TYPE': 'S'}]}
+
+        with patch.object(self.module, 'Connection'):
+            with patch.object(self.module, 'call_rfc_method', side_effect=call_rfc_method) as RAW:
+                with self.assertRaises(AnsibleExitJson) as result:
+                    with set_module_args(args):
+                        sap_user.main()
+        self.assertEqual([c[0][1] for c in RAW.call_args_list], ['BAPI_USER_GET_DETAIL'])
+        self.assertFalse(result.exception.args[0]['changed'])
+
+        args['roles'] = ["Z_ADMIN"]
+        with patch.object(self.module, 'Connection'):
+            with patch.object(self.module, 'call_rfc_method', side_effect=call_rfc_method) as RAW:
+                with self.assertRaises(AnsibleExitJson) as result:
+                    with set_module_args(args):
+                        sap_user.main()
+        self.assertEqual([c[0][1] for c in RAW.call_args_list], ['BAPI_USER_GET_DETAIL', 'BAPI_USER_ACTGROUPS_ASSIGN'])
+        self.assertTrue(result.exception.args[0]['changed'])
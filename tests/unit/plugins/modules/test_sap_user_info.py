@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2022-2026 The Project Contributors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# For a detailed list of copyright holders and contribution history,
+# please refer to the CONTRIBUTORS.md file in the project root.
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import sys
+from unittest.mock import patch, MagicMock
+from ansible_collections.community.sap_libs.tests.unit.plugins.modules.utils import AnsibleExitJson, AnsibleFailJson, ModuleTestCase, set_module_args
+
+sys.modules['pyrfc'] = MagicMock()
+sys.modules['pyrfc.Connection'] = MagicMock()
+
+from ansible_collections.community.sap_libs.plugins.modules import sap_user_info
+
+
+def table(fields, rows):
+    """Return a RFC_READ_TABLE result of rows with the fixed width fields."""
+    offsets = []
+    offset = 0
+    for name, length in fields:
+        offsets.append({'FIELDNAME': name, 'OFFSET': str(offset).zfill(6), 'LENGTH': str(length).zfill(6)})
+        offset += length
+    return {'FIELDS': offsets, 'DATA': [{'WA': ''.join(value.ljust(length) for value, (name, length) in zip(row, fields))} for row in rows]}
+
+
+class TestSAPRfcModule(ModuleTestCase):
+
+    def setUp(self):
+        super(TestSAPRfcModule, self).setUp()
+        self.module = sap_user_info
+        self.module.HAS_PYRFC_LIBRARY = True
+
+    def tearDown(self):
+        super(TestSAPRfcModule, self).tearDown()
+
+    def test_without_required_parameters(self):
+        """Failure must occurs when all parameters are missing"""
+        with self.assertRaises(AnsibleFailJson):
+            with set_module_args({}):
+                self.module.main()
+
+    def test_detail(self):
+        """test reading the users with BAPI_USER_GET_DETAIL"""
+
+        args = {
+            "conn_username": "DDIC",
+            "conn_password": "Test1234",
+            "host": "10.1.8.9",
+            "usernames": ["z*"],
+            "max_connections": 2,
+        }
+
+        def call(conn, method, kwargs):
+            if method == 'BAPI_USER_GETLIST':
+                return {'USERLIST': [{'USERNAME': 'DDIC'}, {'USERNAME': 'ZADMIN'}, {'USERNAME': 'ZUSER'}]}
+            return {'ADDRESS': {'FIRSTNAME': 'first', 'LASTNAME': kwargs['USERNAME'], 'E_MAIL': 'test@test.de'},
+                    'LOGONDATA': {'USTYP': 'A', 'GLTGV': '20240124', 'GLTGB': '00000000'},
+                    'ISLOCKED': {'LOCAL_LOCK': 'L' if kwargs['USERNAME'] == 'ZUSER' else 'U', 'GLOB_LOCK': 'U', 'WRNG_LOGON': 'U'},
+                    'ACTIVITYGROUPS': [{'AGR_NAME': 'Z_ROLE', 'TO_DAT': '99991231'}, {'AGR_NAME': 'Z_OLD', 'TO_DAT': '20000101'}],
+                    'PROFILES': [{'BAPIPROF': 'SAP_ALL'}]}
+
+        with set_module_args(args):
+            with patch.object(self.module, 'call_rfc_method', side_effect=call) as call_rfc_method:
+                with self.assertRaises(AnsibleExitJson) as result:
+                    self.module.main()
+        users = result.exception.args[0]['users']
+        self.assertEqual(sorted(users), ['ZADMIN', 'ZUSER'])
+        self.assertEqual(users['ZADMIN'], {'user_type': 'A', 'locked': False, 'valid_from': '2024-01-24', 'valid_to': None,
+                                           'roles': ['Z_ROLE'], 'profiles': ['SAP_ALL'],
+                                           'firstname': 'first', 'lastname': 'ZADMIN', 'email': 'test@test.de'})
+        self.assertTrue(users['ZUSER']['locked'])
+        self.assertFalse(result.exception.args[0]['changed'])
+        self.assertEqual(call_rfc_method.call_count, 3)
+
+    def test_table(self):
+        """test reading the users with RFC_READ_TABLE"""
+
+        args = {
+            "conn_username": "DDIC",
+            "conn_password": "Test1234",
+            "host": "10.1.8.9",
+            "method": "table",
+        }
+
+        tables = {
+            'USR02': table([('BNAME', 12), ('USTYP', 1), ('UFLAG', 3), ('GLTGV', 8), ('GLTGB', 8)],
+                           [('ADMIN', 'A', '0', '20240124', '20991231'), ('LOCKED', 'B', '64', '00000000', '00000000')]),
+            'AGR_USERS': table([('UNAME', 12), ('AGR_NAME', 30), ('TO_DAT', 8)],
+                               [('ADMIN', 'SAP_BC_BASIS_ADMIN', '99991231'), ('ADMIN', 'Z_OLD', '20000101')]),
+            'UST04': table([('BNAME', 12), ('PROFILE', 12)], [('ADMIN', 'SAP_ALL'), ('LOCKED', 'S_A.USER')]),
+            'ADRP': table([('PERSNUMBER', 10), ('NAME_FIRST', 40), ('NAME_LAST', 40)], [('0000000001', 'first_admin', 'last_admin')]),
+            'ADR6': table([('PERSNUMBER', 10), ('SMTP_ADDR', 241)], [('0000000001', 'admin@test.de')]),
+            'USR21': table([('BNAME', 12), ('PERSNUMBER', 10)], [('ADMIN', '0000000001')]),
+        }
+
+        with set_module_args(args):
+            with patch.object(self.module, 'call_rfc_method', side_effect=lambda conn, method, kwargs: tables[kwargs['QUERY_TABLE']]):
+                with self.assertRaises(AnsibleExitJson) as result:
+                    self.module.main()
+        users = result.exception.args[0]['users']
+        self.assertEqual(users['ADMIN'], {'user_type': 'A', 'locked': False, 'valid_from': '2024-01-24', 'valid_to': '2099-12-31',
+                                          'roles': ['SAP_BC_BASIS_ADMIN'], 'profiles': ['SAP_ALL'],
+                                          'firstname': 'first_admin', 'lastname': 'last_admin', 'email': 'admin@test.de'})
+        self.assertEqual(users['LOCKED'], {'user_type': 'B', 'locked': True, 'valid_from': None, 'valid_to': None,
+                                           'roles': [], 'profiles': ['S_A.USER'], 'firstname': '', 'lastname': '', 'email': ''})
+        self.assertEqual(result.exception.args[0]['msg'], '2 users read.')
+
+    def test_read_table_chunks(self):
+        """test reading a table in chunks of READ_TABLE_ROWS rows"""
+
+        chunks = [table([('BNAME', 12)], [('USER1',), ('USER2',)]), table([('BNAME', 12)], [('USER3',)])]
+        with patch.object(self.module, 'READ_TABLE_ROWS', 2):
+            with patch.object(self.module, 'call_rfc_method', side_effect=chunks) as call_rfc_method:
+                rows = self.module.read_table(MagicMock(), 'USR02', ['BNAME'])
+        self.assertEqual(rows, [{'BNAME': 'USER1'}, {'BNAME': 'USER2'}, {'BNAME': 'USER3'}])
+        self.assertEqual(call_rfc_method.call_args_list[1][0][2]['ROWSKIPS'], 2)
+
+    def test_read_table_full_pages(self):
+        """test reading a table whose last page has exactly READ_TABLE_ROWS rows"""
+
+        chunks = [table([('BNAME', 12)], [('USER1',), ('USER2',)]), table([('BNAME', 12)], [('USER3',), ('USER4',)]),
+                  table([('BNAME', 12)], [])]
+        with patch.object(self.module, 'READ_TABLE_ROWS', 2):
+            with patch.object(self.module, 'call_rfc_method', side_effect=chunks) as call_rfc_method:
+                rows = self.module.read_table(MagicMock(), 'USR02', ['BNAME'])
+        self.assertEqual(rows, [{'BNAME': 'USER1'}, {'BNAME': 'USER2'}, {'BNAME': 'USER3'}, {'BNAME': 'USER4'}])
+        self.assertEqual([c[0][2]['ROWSKIPS'] for c in call_rfc_method.call_args_list], [0, 2, 4])
+        self.assertEqual([c[0][2]['ROWCOUNT'] for c in call_rfc_method.call_args_list], [2, 2, 2])
+
+    def test_error_read(self):
+        """test fail to read the users"""
+
+        args = {
+            "conn_username": "DDIC",
+            "conn_password": "Test1234",
+            "host": "10.1.8.9",
+        }
+
+        with set_module_args(args):
+            with patch.object(self.module, 'call_rfc_method', side_effect=Exception('no authorization')):
+                with self.assertRaises(AnsibleFailJson) as result:
+                    self.module.main()
+        self.assertEqual(result.exception.args[0]['msg'], 'Something went wrong reading the users.')
+        self.assertEqual(result.exception.args[0]['error'], 'no authorization')